@@ -1 +1 @@
-python3 src/main.py "/site_generator/"
+python3 src/main.py "/site_generator/" --fingerprint
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from log import logger
+from manifest import hash_file
+from outputs import ADDED, DELETED, MODIFIED
+from sync import list_files, remove_empty_parents, sync_file
+
+HASHES_VERSION = 1
+# hex digits of the content hash put into fingerprinted names
+FINGERPRINT_LENGTH = 8
+# response header for fingerprinted files, whose content never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def fingerprinted_name(name, digest) -> str:
+    # "images/tom.png" -> "images/tom.3f9a1c2b.png"
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def fingerprintable(name) -> bool:
+    # Hidden files (.DS_Store, anything under .well-known/) and files
+    # without an extension are no page's assets, so they only get their
+    # plain copy
+    parts = name.split(os.sep)
+    return os.path.splitext(parts[-1])[1] != "" and not any(part.startswith(".") for part in parts)
+
+
+def asset_files(src) -> list[str]:
+    return [name for name in list_files(src) if fingerprintable(name)]
+
+
+class AssetTable(dict):
+    """Maps root relative asset URLs to their fingerprinted URLs.
+
+    digest identifies the table's contents, so compiled templates can be
+    cached per table without hashing the whole table on every page.
+    """
+
+    def __init__(self, urls=()):
+        super().__init__(urls)
+        self.digest = hashlib.sha256(
+            json.dumps(sorted(self.items())).encode()
+        ).hexdigest()
+
+
+class AssetHashes:
+    """Content hashes of static files, cached by size and mtime.
+
+    A file is only read and hashed again once its size or mtime differs
+    from the ones its cached hash was computed for.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = Path(path)
+        # relative name -> [size, mtime_ns, hash]
+        self.entries = entries if entries is not None else {}
+        # files hashed rather than served from the cache
+        self.hashed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get("version") != HASHES_VERSION:
+            return cls(path)
+
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": HASHES_VERSION, "files": self.entries}
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def get(self, root, name) -> str:
+        stat = os.stat(os.path.join(root, name))
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hash_file(os.path.join(root, name))
+        with self._lock:
+            self.entries[name] = [stat.st_size, stat.st_mtime_ns, digest]
+            self.hashed += 1
+        return digest
+
+    def retain(self, names):
+        for name in set(self.entries) - set(names):
+            del self.entries[name]
+
+
+def asset_table(src, hashes) -> AssetTable:
+    # the table fingerprint_assets returns, without writing any copies
+    return AssetTable(
+        (_asset_url(name), _asset_url(fingerprinted_name(name, hashes.get(src, name))))
+        for name in asset_files(src)
+    )
+
+
+def fingerprint_assets(src, dst, hashes, previous=(), max_workers=None, changes=None):
+    """Link a fingerprinted copy of every asset file under src into dst.
+
+    Returns the AssetTable for the files and the set of fingerprinted names
+    written, which is passed back as previous next time so copies of
+    assets that changed or were deleted are removed. The copies are
+    recorded in changes, an outputs.ChangeSet, when given. A fingerprinted
+    name stands for its content, so a copy in previous is unchanged: its
+    stat can't tell, as it may be a hard link to a source edited since.
+    """
+    files = asset_files(src)
+    hashes.hashed = 0
+
+    def fingerprint_one(name):
+        fingerprinted = fingerprinted_name(name, hashes.get(src, name))
+        dest = os.path.join(dst, fingerprinted)
+        existed = changes is not None and os.path.lexists(dest)
+        sync_file(os.path.join(src, name), dest)
+        if changes is not None:
+            if not existed:
+                status = ADDED
+            elif fingerprinted not in previous:
+                status = MODIFIED
+            else:
+                status = None
+            changes.record(dest, status)
+        return fingerprinted
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        names = list(executor.map(fingerprint_one, files))
+    # the sync of static/ hashes the files left out here too
+    hashes.retain(list_files(src))
+
+    written = set(names)
+    for name in sorted(set(previous) - written):
+        path = os.path.join(dst, name)
+        if os.path.lexists(path):
+            logger.debug("Removing %s", path)
+            os.unlink(path)
+            if changes is not None:
+                changes.record(path, DELETED)
+        remove_empty_parents(path, dst)
+
+    logger.info(
+        "Fingerprinted %d assets in %s (%d hashed, %d unchanged)",
+        len(files), src, hashes.hashed, len(files) - hashes.hashed,
+    )
+    table = AssetTable(
+        (_asset_url(name), _asset_url(fingerprinted)) for name, fingerprinted in zip(files, names)
+    )
+    return table, written
+
+
+def _asset_url(name) -> str:
+    return "/" + name.replace(os.sep, "/")
@@ -0,0 +1,96 @@
+import hashlib
+import marshal
+import os
+
+from pathlib import Path
+from htmlnode import LeafNode, ParentNode, leaf_node
+
+# Bump whenever the parser would produce a different tree for the same
+# markdown, so entries written by an older parser are never reused.
+PARSER_VERSION = 4
+
+_LEAF = 0
+_PARENT = 1
+
+
+def node_to_data(node):
+    # nested tuples of plain values marshal compactly and load quickly
+    if isinstance(node, LeafNode):
+        return (_LEAF, node.tag, node.value, node.attributes)
+    return (_PARENT, node.tag, node.props, [node_to_data(child) for child in node.children])
+
+
+def data_to_node(data):
+    if data[0] == _LEAF:
+        return leaf_node(data[1], data[2], data[3])
+    return ParentNode(data[1], [data_to_node(child) for child in data[3]], data[2])
+
+
+def prune_directory(directory, max_bytes) -> int:
+    # Deletes the least recently used entries of a cache directory laid out
+    # as directory/xx/digest until it holds at most max_bytes. Returns how
+    # many entries were deleted.
+    directory = Path(directory)
+    if not directory.exists():
+        return 0
+
+    entries = []
+    total = 0
+    for path in directory.glob("*/*"):
+        stat = path.stat()
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+
+    return removed
+
+
+class ASTCache:
+    """Persistent cache of parsed markdown trees.
+
+    Entries are keyed by a hash of the markdown and the parser version and
+    stored as marshalled tuples under directory. Reading an entry refreshes
+    its mtime, and prune() deletes the least recently used entries once the
+    cache grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, markdown) -> Path:
+        digest = hashlib.sha256(
+            f"{PARSER_VERSION}:{marshal.version}:".encode() + markdown.encode()
+        ).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def get(self, markdown):
+        path = self._path(markdown)
+        try:
+            with open(path, "rb") as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        os.utime(path)
+        return data_to_node(data)
+
+    def put(self, markdown, node) -> None:
+        path = self._path(markdown)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # workers may store the same entry at once, so write aside and rename
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            marshal.dump(node_to_data(node), f)
+        os.replace(tmp_path, path)
+
+    def prune(self) -> int:
+        return prune_directory(self.directory, self.max_bytes)
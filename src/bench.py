@@ -0,0 +1,508 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import re
+import resource
+import subprocess
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from pathlib import Path
+from blocktype import (
+    BlockType,
+    Outline,
+    block_to_block_type,
+    block_to_html_node,
+    markdown_to_html_node,
+    text_to_html_node,
+)
+from corpus import CorpusGenerator, parse_block_mix
+from htmlnode import (
+    LeafNode,
+    ParentNode,
+    leaf_node,
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_node_to_html_node,
+    text_to_textnodes,
+)
+from main import generate_pages_recursive
+from textnode import TextNode, TextType, markdown_to_blocks
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "template.html"
+
+
+def split_pipeline_text_to_textnodes(text):
+    # the original five pass implementation, kept as the baseline to beat
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def regex_block_to_block_type(block):
+    # the original classifier, matching pattern strings on every call
+    if re.match(r'^#{1,6} ', block):
+        return BlockType.HEADING
+    if re.match(r'^```.*```$', block, re.DOTALL):
+        return BlockType.CODE
+    lines = block.split('\n')
+    if all(line.startswith('>') for line in lines):
+        return BlockType.QUOTE
+    if all(line.startswith('- ') for line in lines):
+        return BlockType.UNORDERED_LIST
+    if all(re.match(f'^{i}\\. ', line) for i, line in enumerate(lines, 1)):
+        return BlockType.ORDERED_LIST
+    if len(lines) == 1 and re.match(r"^!\[.*\]\(.*\)$", lines[0].strip()):
+        return BlockType.IMAGE
+    return BlockType.PARAGRAPH
+
+
+def lambda_text_node_to_html_node(text_node):
+    # the original converter, rebuilding its dispatch dict on every call
+    html_dict = {
+        TextType.TEXT: lambda node: leaf_node(None, text_node.text),
+        TextType.BOLD: lambda node: leaf_node("b", text_node.text),
+        TextType.ITALIC: lambda node: leaf_node("i", text_node.text),
+        TextType.CODE: lambda node: leaf_node("code", text_node.text),
+        TextType.LINK: lambda node: LeafNode("a", text_node.text, {"href": text_node.url}),
+        TextType.IMAGE: lambda node: LeafNode("img", "", {"src": text_node.url, "alt": text_node.text}),
+    }
+    if text_node.text_type not in html_dict:
+        raise ValueError(f"Unsupported TextType: {text_node.text_type}")
+    return html_dict[text_node.text_type](text_node)
+
+
+def plain_heading_block_to_html_node(markdown):
+    # the original heading converter, without ids or an outline
+    heading_parts = markdown.split()
+    heading, heading_text = heading_parts[0], " ".join(heading_parts[1:])
+    return ParentNode(tag=f"h{len(heading)}", children=text_to_html_node(heading_text))
+
+
+_PLAIN_BUILDERS = {BlockType.HEADING: plain_heading_block_to_html_node}
+
+
+def plain_block_to_html_node(text, type):
+    # the original dispatch, a lookup in a table of builders
+    builder = _PLAIN_BUILDERS.get(type)
+    if builder is None:
+        raise Exception(f"Unknown BlockType {type}")
+    return builder(text)
+
+
+def headings_with_ids(pages):
+    # the heading blocks of each page converted the way a page parse does,
+    # with one outline per page
+    outlines = []
+    for page in pages:
+        outline = Outline()
+        for block in page:
+            block_to_html_node(block, BlockType.HEADING, outline)
+        outlines.append(outline)
+    return outlines
+
+
+def large_paragraph(sentences, shape="mixed"):
+    parts = []
+    for i in range(sentences):
+        if shape == "links":
+            parts.append(f"See [link {i}](https://example.com/{i}) for details.")
+        else:
+            parts.append(
+                f"Sentence {i} has **bold {i}**, some _italic_ words, `code {i}`, "
+                f"a [link {i}](https://example.com/{i}) and "
+                f"an ![image {i}](/images/{i}.png) in it."
+            )
+    return " ".join(parts)
+
+
+def best_time(func, arg, repeat):
+    timer = timeit.Timer(lambda: func(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_inline(sizes, repeat):
+    print(f"{'shape':>6} {'sentences':>10} {'split passes':>14} {'single pass':>14} {'speedup':>9}")
+    for shape in ("mixed", "links"):
+        for size in sizes:
+            text = large_paragraph(size, shape)
+            if text_to_textnodes(text) != split_pipeline_text_to_textnodes(text):
+                raise Exception(f"Inline parsers disagree for {shape} paragraph of {size}")
+
+            before = best_time(split_pipeline_text_to_textnodes, text, repeat)
+            after = best_time(text_to_textnodes, text, repeat)
+            print(
+                f"{shape:>6} {size:>10} {before * 1000:>12.3f}ms "
+                f"{after * 1000:>12.3f}ms {before / after:>8.1f}x"
+            )
+
+
+def bench_blocks(args):
+    generator = CorpusGenerator(seed=args.seed)
+    blocks = [
+        block
+        for _ in range(args.pages)
+        for block in markdown_to_blocks(generator.document(args.blocks))
+    ]
+    text_nodes = [
+        node
+        for block in blocks
+        if block_to_block_type(block) == BlockType.PARAGRAPH
+        for node in text_to_textnodes(block.replace("\n", " "))
+    ]
+    if [block_to_block_type(b) for b in blocks] != [regex_block_to_block_type(b) for b in blocks]:
+        raise Exception("Block classifiers disagree")
+
+    cases = [
+        ("block_to_block_type", blocks, regex_block_to_block_type, block_to_block_type),
+        ("text_node_to_html_node", text_nodes, lambda_text_node_to_html_node, text_node_to_html_node),
+    ]
+    print(f"{'function':<24} {'items':>8} {'before':>12} {'after':>12} {'speedup':>9}")
+    for name, items, before_func, after_func in cases:
+        before = best_time(lambda xs: [before_func(x) for x in xs], items, args.repeat) / len(items)
+        after = best_time(lambda xs: [after_func(x) for x in xs], items, args.repeat) / len(items)
+        print(
+            f"{name:<24} {len(items):>8} {before * 1e9:>10.0f}ns "
+            f"{after * 1e9:>10.0f}ns {before / after:>8.1f}x"
+        )
+
+
+def bench_headings(args):
+    # Heading ids and the table of contents come out of the parse pass; on
+    # heading heavy pages that must cost next to nothing over the original
+    # heading converter.
+    generator = CorpusGenerator(seed=args.seed, block_mix={"heading": 4, "paragraph": 1})
+    documents = [generator.document(args.blocks) for _ in range(args.pages)]
+    headings = [
+        [block for block in markdown_to_blocks(document) if block_to_block_type(block) == BlockType.HEADING]
+        for document in documents
+    ]
+
+    def without_outline(pages):
+        return [[plain_block_to_html_node(block, BlockType.HEADING) for block in page] for page in pages]
+
+    outlines = headings_with_ids(headings)
+    count = sum(len(page) for page in headings)
+    before = best_time(without_outline, headings, args.repeat) / count
+    ids = best_time(headings_with_ids, headings, args.repeat) / count
+    # the table of contents is only built for templates with a {{ Toc }};
+    # timed up to its markup, since it is written as it is built
+    toc = best_time(lambda xs: [outline.to_html_node().to_html() for outline in xs], outlines, args.repeat) / count
+    print(f"{'function':<24} {'items':>8} {'before':>12} {'after':>12} {'change':>9}")
+    for name, after in (("heading with id", ids), ("heading with id and toc", ids + toc)):
+        print(
+            f"{name:<24} {count:>8} {before * 1e9:>10.0f}ns "
+            f"{after * 1e9:>10.0f}ns {after / before - 1:>+8.1%}"
+        )
+
+    # whole pages, where the headings are one part of the parse, against
+    # the same parse with the original heading converter
+    def pages_without_ids(ds):
+        results = []
+        for d in ds:
+            children = []
+            for block in markdown_to_blocks(d):
+                if block.strip() == "":
+                    continue
+                block_type = block_to_block_type(block)
+                if block_type == BlockType.HEADING:
+                    children.append(plain_block_to_html_node(block, block_type))
+                else:
+                    children.append(block_to_html_node(block, block_type))
+            results.append(ParentNode("div", children))
+        return results
+
+    pages_before = best_time(pages_without_ids, documents, args.repeat)
+
+    def pages_with_toc(ds):
+        results = []
+        for d in ds:
+            outline = Outline()
+            results.append((markdown_to_html_node(d, outline), outline.to_html_node().to_html()))
+        return results
+
+    pages_after = best_time(pages_with_toc, documents, args.repeat)
+    print(
+        f"{'page + toc':<24} {len(documents):>8} {pages_before / len(documents) * 1e6:>10.0f}us "
+        f"{pages_after / len(documents) * 1e6:>10.0f}us {pages_after / pages_before - 1:>+8.1%}"
+    )
+
+
+def best_run(func, repeat) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(args) -> dict:
+    generator = CorpusGenerator(
+        seed=args.seed,
+        block_mix=args.mix,
+        link_density=args.link_density,
+        image_density=args.image_density,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content = Path(tmp) / "content"
+        paths = generator.write_corpus(content, args.pages, args.blocks, args.depth)
+        documents = [path.read_text() for path in paths]
+        blocks = [block for document in documents for block in markdown_to_blocks(document)]
+        texts = [
+            block.replace("\n", " ")
+            for block in blocks
+            if block_to_block_type(block) == BlockType.PARAGRAPH
+        ]
+        trees = [markdown_to_html_node(document) for document in documents]
+        headings = [
+            [block for block in markdown_to_blocks(document) if block_to_block_type(block) == BlockType.HEADING]
+            for document in documents
+        ]
+
+        def end_to_end():
+            generate_pages_recursive(content, TEMPLATE, Path(tmp) / "docs", "/")
+
+        stages = {
+            "markdown_to_blocks": (lambda: [markdown_to_blocks(d) for d in documents], len(documents)),
+            "block_to_block_type": (lambda: [block_to_block_type(b) for b in blocks], len(blocks)),
+            "text_to_textnodes": (lambda: [text_to_textnodes(t) for t in texts], len(texts)),
+            "headings_with_ids": (lambda: headings_with_ids(headings), sum(map(len, headings))),
+            "to_html": (lambda: [tree.to_html() for tree in trees], len(trees)),
+            "generate_pages_recursive": (end_to_end, len(documents)),
+        }
+
+        results = {}
+        for name, (func, items) in stages.items():
+            seconds = best_run(func, args.repeat)
+            results[name] = {
+                "seconds": seconds,
+                "items": items,
+                "per_item_us": seconds / items * 1e6 if items else 0.0,
+            }
+
+    return {
+        "version": 1,
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "corpus": {
+            "pages": args.pages,
+            "blocks_per_page": args.blocks,
+            "block_mix": generator.block_mix,
+            "link_density": args.link_density,
+            "image_density": args.image_density,
+            "depth": args.depth,
+            "seed": args.seed,
+            "blocks": len(blocks),
+            "bytes": sum(len(document.encode()) for document in documents),
+        },
+        "stages": results,
+    }
+
+
+def print_results(results, baseline=None, threshold=0.1) -> list[str]:
+    # prints the stage table and returns the stages that regressed
+    regressions = []
+    header = f"{'stage':<26} {'items':>8} {'total':>11} {'per item':>12}"
+    if baseline:
+        header += f" {'baseline':>12} {'change':>8}"
+    print(header)
+
+    for name, stage in results["stages"].items():
+        line = (
+            f"{name:<26} {stage['items']:>8} {stage['seconds'] * 1000:>9.2f}ms "
+            f"{stage['per_item_us']:>10.1f}us"
+        )
+        old = (baseline or {}).get("stages", {}).get(name)
+        if old:
+            # per item times keep runs on differently sized corpora comparable
+            change = stage["per_item_us"] / old["per_item_us"] - 1 if old["per_item_us"] else 0.0
+            line += f" {old['per_item_us']:>10.1f}us {change:>+7.1%}"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    return regressions
+
+
+def count_nodes(node) -> int:
+    return 1 + sum(count_nodes(child) for child in node.children or ())
+
+
+def _memory_child(documents, share_leaves, trace, queue):
+    # runs in a fresh interpreter so earlier measurements can't skew this one
+    import htmlnode
+
+    if not share_leaves:
+        htmlnode.SHARED_LEAF_MAX_LENGTH = -1
+
+    if trace:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    trees = [markdown_to_html_node(document) for document in documents]
+
+    result = {"nodes": sum(count_nodes(tree) for tree in trees)}
+    if trace:
+        result["retained_bytes"] = tracemalloc.get_traced_memory()[0]
+    else:
+        # ru_maxrss is in KiB on Linux
+        result["peak_rss_bytes"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        ) * 1024
+    queue.put(result)
+
+
+def measure_memory(documents, share_leaves, trace) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_memory_child, args=(documents, share_leaves, trace, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def bench_memory(args):
+    generator = CorpusGenerator(seed=args.seed)
+    documents = [generator.document(args.blocks) for _ in range(args.pages)]
+    print(f"{args.pages} pages, {sum(len(d) for d in documents) / 1e6:.1f} MB of markdown")
+    print(f"{'variant':<16} {'nodes':>10} {'peak rss':>12} {'retained':>12} {'bytes/node':>11}")
+
+    for name, share_leaves in (("shared leaves", True), ("no sharing", False)):
+        rss = measure_memory(documents, share_leaves, trace=False)
+        traced = measure_memory(documents, share_leaves, trace=True)
+        print(
+            f"{name:<16} {rss['nodes']:>10} {rss['peak_rss_bytes'] / 1e6:>10.1f}MB "
+            f"{traced['retained_bytes'] / 1e6:>10.1f}MB "
+            f"{traced['retained_bytes'] / traced['nodes']:>11.1f}"
+        )
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--repeat", type=int, default=5, help="runs per measurement, best is kept")
+
+    parser = argparse.ArgumentParser(description="Benchmark the site generator")
+    commands = parser.add_subparsers(dest="command")
+
+    inline = commands.add_parser(
+        "inline", parents=[common], help="compare the inline parser with the split pipeline"
+    )
+    inline.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="paragraph sizes, in sentences, for the inline benchmark",
+    )
+
+    suite = commands.add_parser(
+        "suite", parents=[common], help="time every build stage on a synthetic corpus"
+    )
+    suite.add_argument("--pages", type=int, default=200)
+    suite.add_argument("--blocks", type=int, default=20, help="blocks per page")
+    suite.add_argument(
+        "--mix",
+        type=parse_block_mix,
+        help="block weights, e.g. paragraph=6,heading=2,code=1 (default: a typical blog mix)",
+    )
+    suite.add_argument("--link-density", type=float, default=0.2)
+    suite.add_argument("--image-density", type=float, default=0.05)
+    suite.add_argument("--depth", type=int, default=2, help="maximum directory nesting")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument(
+        "--output",
+        default="bench_output.json",
+        help="where to write the JSON results",
+    )
+    suite.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    suite.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown, as a fraction, that counts as a regression",
+    )
+
+    blocks = commands.add_parser(
+        "blocks", parents=[common], help="per item cost of block classification and inline conversion"
+    )
+    blocks.add_argument("--pages", type=int, default=200)
+    blocks.add_argument("--blocks", type=int, default=20, help="blocks per page")
+    blocks.add_argument("--seed", type=int, default=0)
+
+    headings = commands.add_parser(
+        "headings", parents=[common], help="cost of heading ids and the table of contents"
+    )
+    headings.add_argument("--pages", type=int, default=200)
+    headings.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    headings.add_argument("--seed", type=int, default=0)
+
+    memory = commands.add_parser(
+        "memory", help="peak RSS and retained bytes of the parsed trees for a corpus"
+    )
+    memory.add_argument("--pages", type=int, default=2000)
+    memory.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    memory.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.command == "memory":
+        bench_memory(args)
+        return
+
+    if args.command == "headings":
+        bench_headings(args)
+        return
+
+    if args.command == "blocks":
+        bench_blocks(args)
+        return
+
+    if args.command == "inline":
+        bench_inline(args.sizes, args.repeat)
+        return
+
+    if args.command is None:
+        args = parser.parse_args(["suite"])
+
+    results = bench_suite(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    regressions = print_results(results, baseline, args.threshold)
+    print(f"Wrote {args.output}")
+    if regressions:
+        raise SystemExit(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
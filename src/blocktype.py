@@ -1,8 +1,19 @@
+import html
+import logging
 import re
 
 from enum import Enum
-from htmlnode import HTMLNode, ParentNode, LeafNode, text_node_to_html_node, text_to_textnodes
-from textnode import markdown_to_blocks
+from log import logger
+from htmlnode import (
+    HTMLNode,
+    LeafNode,
+    ParentNode,
+    attributes_html,
+    leaf_node,
+    text_node_to_html_node,
+    text_to_textnodes,
+)
+from textnode import markdown_to_blocks, read_blocks
 
 class BlockType (Enum):
     PARAGRAPH = "paragraph"
@@ -13,70 +24,197 @@ class BlockType (Enum):
     ORDERED_LIST = "ordered_list"
     IMAGE = "image"
 
-def markdown_to_html_node(markdown):
-    children = []
-    blocks = markdown_to_blocks(markdown)
+# the table of contents lists headings of this level and deeper; the h1 is
+# the page title
+TOC_MIN_LEVEL = 2
+
+_SLUG_STRIP_PATTERN = re.compile(r"[^\w\- ]")
+# the same headings ("Usage", "See also") recur across a site
+SLUG_CACHE_SIZE = 4096
+_slugs = {}
+
+def slugify(text):
+    # "Tom's House & Garden" -> "toms-house--garden", as GitHub does
+    slug = _slugs.get(text)
+    if slug is None:
+        if len(_slugs) >= SLUG_CACHE_SIZE:
+            _slugs.clear()
+        lowered = text.lower()
+        # \w is isalnum() plus "_", so text of words and spaces, most
+        # headings, has nothing to strip and skips the pattern
+        if not lowered.replace(" ", "").isalnum():
+            lowered = _SLUG_STRIP_PATTERN.sub("", lowered)
+        slug = lowered.strip().replace(" ", "-") or "section"
+        _slugs[text] = slug
+    return slug
+
+class Outline:
+    """The headings of one page in document order, with their anchor ids.
+
+    Filled in while the blocks are converted, so a page gets heading ids
+    and its table of contents from the one pass over its blocks. Ids are
+    unique within the outline: repeats get "-1", "-2", ... appended.
+    """
+
+    def __init__(self):
+        # (level, id, text) per heading
+        self.headings = []
+        self._used = set()
+
+    def add(self, level, text):
+        # returns the id of the heading
+        slug = slugify(text)
+        base = slug
+        count = 0
+        while slug in self._used:
+            count += 1
+            slug = f"{base}-{count}"
+        self._used.add(slug)
+        self.headings.append((level, slug, text))
+        return slug
+
+    @classmethod
+    def from_tree(cls, node):
+        # the outline of a tree parsed earlier, such as one from the AST
+        # cache; headings are always children of the page's root node
+        outline = cls()
+        for child in node.children:
+            if child.tag in _HEADING_TAGS and child.props and "id" in child.props:
+                outline.headings.append((int(child.tag[1]), child.props["id"], _plain_text(child)))
+                outline._used.add(child.props["id"])
+        return outline
+
+    def to_html_node(self, min_level=TOC_MIN_LEVEL):
+        """Return the table of contents as a nav of nested lists, or None
+        when the page has no headings of min_level or below."""
+        headings = [heading for heading in self.headings if heading[0] >= min_level]
+        if not headings:
+            return None
+        return TableOfContents(headings)
+
+class TableOfContents(HTMLNode):
+    """The nav of nested lists of an Outline's headings.
+
+    The lists are written straight from the headings rather than built as
+    li and a nodes first, since a page's table of contents is only ever
+    written once.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, headings):
+        # headings are the (level, id, text) of Outline.headings
+        super().__init__("nav", None, headings, {"class": "toc"})
+
+    def to_html(self, rewrite_url=None, image_attributes=None, minifier=None):
+        parts = []
+        self.write_html(parts.append, rewrite_url, image_attributes, minifier)
+        return "".join(parts)
+
+    def write_html(self, write, rewrite_url=None, image_attributes=None, minifier=None):
+        if rewrite_url is None and minifier is None:
+            write('<nav class="toc"><ul>')
+        else:
+            write(f"<nav{attributes_html(self.props, rewrite_url, minifier)}><ul>")
+        # [level, has a nested ul] of the open li elements a heading may
+        # nest under
+        stack = []
+        for level, slug, text in self.children:
+            while stack and stack[-1][0] >= level:
+                write("</ul></li>" if stack.pop()[1] else "</li>")
+            if stack and not stack[-1][1]:
+                write("<ul>")
+                stack[-1][1] = True
+            if rewrite_url is None and minifier is None:
+                write(f'<li><a href="#{slug}">{text or slug}</a>')
+            else:
+                attributes = attributes_html({"href": f"#{slug}"}, rewrite_url, minifier)
+                write(f"<li><a{attributes}>{text or slug}</a>")
+            stack.append([level, False])
+        while stack:
+            write("</ul></li>" if stack.pop()[1] else "</li>")
+        write("</ul></nav>")
+
+def markdown_to_html_node(markdown, outline=None):
+    # outline, an Outline, collects the page's headings when given
+    return blocks_to_html_node(markdown_to_blocks(markdown), outline)
+
+def blocks_to_html_node(blocks, outline=None):
+    return ParentNode(tag="div", children=list(_block_nodes(blocks, outline)))
+
+def stream_html_node(lines, outline=None):
+    """Return a page tree whose blocks are parsed as the tree is written.
+
+    lines is an iterable of markdown lines, typically an open file, and is
+    consumed while the tree is written, so only one block is held in memory
+    at a time. The returned tree can therefore only be written once, and
+    outline only fills in as it is.
+    """
+    return ParentNode(tag="div", children=_block_nodes(read_blocks(lines), outline))
+
+def _block_nodes(blocks, outline=None):
+    # headings need ids unique within the page even when nobody asked for
+    # the outline
+    if outline is None:
+        outline = Outline()
     for block in blocks:
         if block.strip() == "":
             continue
-        block_type = block_to_block_type(block)
-        node = block_to_html_node(block, block_type)
-        children.append(node)
+        yield block_to_html_node(block, block_to_block_type(block), outline)
 
-    return ParentNode(tag="div", children=children)
+_HEADING_PATTERN = re.compile(r"#{1,6} ")
+_CODE_PATTERN = re.compile(r"```.*```$", re.DOTALL)
+_ORDERED_ITEM_PATTERN = re.compile(r"([1-9][0-9]*)\. ")
+_IMAGE_BLOCK_PATTERN = re.compile(r"!\[.*\]\(.*\)$")
+_IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_HEADING_TAGS = {f"h{level}" for level in range(1, 7)}
 
 def block_to_block_type(block):
-
-    if re.match(r'^#{1,6} ', block):
+    # headings and code are decided by the start of the block alone, the
+    # first character rules them out before any pattern runs
+    first = block[:1]
+    if first == "#" and _HEADING_PATTERN.match(block):
         return BlockType.HEADING
-
-    # Code block pattern: starts with ``` and ends with ```
-    if re.match(r'^```.*```$', block, re.DOTALL):
+    if first == "`" and _CODE_PATTERN.match(block):
         return BlockType.CODE
-    
-    # For quote blocks, we need to check if EVERY line starts with >
-    lines = block.split('\n')
-    if all(line.startswith('>') for line in lines):
-        return BlockType.QUOTE
-    
-    # For unordered lists, check if EVERY line starts with -
-    if all(line.startswith('- ') for line in lines):
-        return BlockType.UNORDERED_LIST
-    
-    # For ordered lists, more complex: check if lines start with incrementing numbers
-    if is_ordered_list(lines):  # You'd need to implement this helper function
+
+    # quote and list blocks need every line to agree, so track all three
+    # candidates in one scan and stop once none of them can still match
+    quote = unordered = ordered = True
+    for number, line in enumerate(block.split("\n"), 1):
+        quote = quote and line.startswith(">")
+        unordered = unordered and line.startswith("- ")
+        if ordered:
+            match = _ORDERED_ITEM_PATTERN.match(line)
+            ordered = match is not None and int(match.group(1)) == number
+        if not (quote or unordered or ordered):
+            break
+    else:
+        if quote:
+            return BlockType.QUOTE
+        if unordered:
+            return BlockType.UNORDERED_LIST
         return BlockType.ORDERED_LIST
 
-    line = lines[0].strip()  # only for a single-line block
-    if len(lines) == 1 and re.match(r"^!\[.*\]\(.*\)$", line):
-        # It's an image block!
+    if "\n" not in block and _IMAGE_BLOCK_PATTERN.match(block.strip()):
         return BlockType.IMAGE
-    
-    # Default case
+
     return BlockType.PARAGRAPH
 
-def block_to_html_node(text: str, type: BlockType) -> HTMLNode:
-    if type == BlockType.QUOTE:
-        return _quote_block_to_html_node(text)
-    elif type == BlockType.UNORDERED_LIST:
-        return _ul_block_to_html_node(text)
-    elif type == BlockType.ORDERED_LIST:
-        return _ol_block_to_html_node(text)
-    elif type == BlockType.CODE:
-        return _code_block_to_html_node(text)
-    elif type == BlockType.HEADING:
-        return _heading_block_to_html_node(text)
-    elif type == BlockType.PARAGRAPH:
-        return _paragraph_block_to_html_node(text)
-    elif type == BlockType.IMAGE:
-        return _image_block_to_html_node(text)
-    else:
-        raise Exception(f"Unknown BlockType {type}") 
+def block_to_html_node(text: str, type: BlockType, outline=None) -> HTMLNode:
+    if type is BlockType.HEADING:
+        # the one builder with per-page state: ids must not repeat
+        return _heading_block_to_html_node(text, outline)
+    builder = _BLOCK_BUILDERS.get(type)
+    if builder is None:
+        raise Exception(f"Unknown BlockType {type}")
+    return builder(text)
 
 def is_ordered_list(lines):
     for i, line in enumerate(lines, 1):
-                if not re.match(f'^{i}\\. ', line):
-                    return False
+        match = _ORDERED_ITEM_PATTERN.match(line)
+        if match is None or int(match.group(1)) != i:
+            return False
     return True
 
 def text_to_html_node(text: str) -> list[LeafNode]:
@@ -91,11 +229,12 @@ def text_to_html_node(text: str) -> list[LeafNode]:
 
 
 def _paragraph_block_to_html_node(markdown: str) -> HTMLNode:
-    print(f"_paragraph_block_to_html_node received: '{markdown}'")
+    # paragraphs are the hottest block type, so skip even building the
+    # log call unless debug output is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("_paragraph_block_to_html_node received: %r", markdown)
     # markdown text ready to be made into html text
-    text = ""
-    for line in markdown.split("\n"):
-        text = " ".join(markdown.split("\n"))
+    text = " ".join(markdown.split("\n"))
 
     # text needs to be parsed into html nodes (aka leaf nodes)
     children = text_to_html_node(text.strip())
@@ -112,14 +251,29 @@ def _check_if_heading(text: str) -> bool:
     return False
 
 
-def _heading_block_to_html_node(markdown: str) -> HTMLNode:
+def _plain_text(node) -> str:
+    # the text of a heading without its markup, for its id and the TOC
+    if node.children is None:
+        return node.value or ""
+    return "".join(_plain_text(child) for child in node.children)
+
+
+def _heading_block_to_html_node(markdown: str, outline=None) -> HTMLNode:
     # markdown text ready to be made into html text
     heading_parts = markdown.split()
     heading, heading_text = heading_parts[0], " ".join(heading_parts[1:])
     heading_num = len(heading)
-    # text needs to be parsed into html nodes (aka leaf nodes)
-    children = text_to_html_node(heading_text)
-    return ParentNode(tag=f"h{heading_num}", children=children)
+    if "*" not in heading_text and "_" not in heading_text and "`" not in heading_text and "[" not in heading_text:
+        # most headings are plain words, which make a single text leaf and
+        # are their own plain text
+        children = [leaf_node(None, heading_text)] if heading_text else []
+        text = heading_text
+    else:
+        # text needs to be parsed into html nodes (aka leaf nodes)
+        children = text_to_html_node(heading_text)
+        text = "".join([_plain_text(child) for child in children])
+    slug = outline.add(heading_num, text) if outline is not None else slugify(text)
+    return ParentNode(f"h{heading_num}", children, {"id": slug})
 
 
 def _check_if_code_block(text: str) -> bool:
@@ -127,14 +281,36 @@ def _check_if_code_block(text: str) -> bool:
     return text[:3] == "```" and text[-3:] == "```"
 
 
-def _code_block_to_html_node(markdown: str) -> HTMLNode:
-    # markdown text ready to be made into html text
-    list_elements = []
-    text = markdown.strip("```")
-    children = text_to_html_node(text)
-    list_elements.append(ParentNode("code", children))
+def parse_fence(markdown: str) -> tuple[str | None, str]:
+    # "```python\nx = 1\n```" -> ("python", "x = 1\n"); the code is kept
+    # verbatim, without inline markdown
+    first, newline, rest = markdown.partition("\n")
+    if not newline:
+        # "``` code ```" on one line
+        return None, first[3:-3].strip()
+
+    info = first[3:].split()
+    language = info[0] if info else None
+    last_start = rest.rfind("\n") + 1
+    last = rest[last_start:]
+    if last.strip() == "```":
+        code = rest[:last_start]
+    else:
+        # closed at the end of the last line of code
+        code = rest.rstrip()[:-3] + "\n"
+    return language, code
+
 
-    return ParentNode(tag="pre", children=list_elements)
+def code_block_node(code: str, language=None) -> HTMLNode:
+    # <pre><code class="language-x"> around code, escaped
+    props = {"class": f"language-{html.escape(language)}"} if language else None
+    children = [leaf_node(None, html.escape(code, quote=False))] if code else []
+    return ParentNode("pre", [ParentNode("code", children, props)])
+
+
+def _code_block_to_html_node(markdown: str) -> HTMLNode:
+    language, code = parse_fence(markdown)
+    return code_block_node(code, language)
 
 
 def _check_if_quote_block(text: str) -> bool:
@@ -194,7 +370,7 @@ def _ol_block_to_html_node(markdown: str) -> HTMLNode:
     return ParentNode(tag="ol", children=list_elements)
 
 def _image_block_to_html_node(markdown: str) -> HTMLNode:
-    match = re.match(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", markdown)
+    match = _IMAGE_PATTERN.match(markdown)
     if match:
         alt = match.group(1)
         src = match.group(2)
@@ -203,3 +379,13 @@ def _image_block_to_html_node(markdown: str) -> HTMLNode:
         raise Exception("Invalid markdown image syntax")
 
     return LeafNode(tag="img", value=None, attributes={"src": src, "alt": alt})
+
+
+_BLOCK_BUILDERS = {
+    BlockType.QUOTE: _quote_block_to_html_node,
+    BlockType.UNORDERED_LIST: _ul_block_to_html_node,
+    BlockType.ORDERED_LIST: _ol_block_to_html_node,
+    BlockType.CODE: _code_block_to_html_node,
+    BlockType.PARAGRAPH: _paragraph_block_to_html_node,
+    BlockType.IMAGE: _image_block_to_html_node,
+}
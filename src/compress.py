@@ -0,0 +1,209 @@
+import gzip
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from log import logger
+from manifest import hash_bytes
+from outputs import ADDED, DELETED, MODIFIED
+from sync import list_files
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATE_VERSION = 1
+COMPRESSIBLE_SUFFIXES = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt"}
+# below this the headers of a compressed response outweigh the savings
+MIN_SIZE = 256
+
+
+def _gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+# format -> (sibling suffix, compress function)
+COMPRESSORS = {
+    "gzip": (".gz", _gzip),
+    "br": (".br", _brotli),
+}
+
+
+def available_formats() -> list[str]:
+    # brotli is optional and only used when the module is installed
+    return ["gzip", "br"] if brotli is not None else ["gzip"]
+
+
+class CompressionState:
+    """Hash of every file compressed in the last build, and what was written.
+
+    A file whose content hash still matches is skipped as long as its
+    siblings are still there, so compression only runs on changed output.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = Path(path)
+        # relative name -> [hash, {format: compressed size, or None if not smaller}]
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get("version") != STATE_VERSION:
+            return cls(path)
+
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": STATE_VERSION, "files": self.entries}
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+
+def _is_compressible(name) -> bool:
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_SUFFIXES
+
+
+def compressed_suffixes() -> tuple[str, ...]:
+    # suffixes of every sibling this module may write
+    return tuple(suffix for suffix, _ in COMPRESSORS.values())
+
+
+def _remove_siblings(path, formats=COMPRESSORS, changes=None) -> None:
+    for fmt in formats:
+        sibling = path + COMPRESSORS[fmt][0]
+        if os.path.lexists(sibling):
+            os.unlink(sibling)
+            if changes is not None:
+                changes.record(sibling, DELETED)
+
+
+def compress_file(path, formats, entry=None):
+    """Write a compressed sibling of path for every format that shrinks it.
+
+    entry is the file's state from the last build. Returns the new entry,
+    the original size and whether anything had to be compressed.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hash_bytes(data)
+
+    if entry is not None and entry[0] == digest and set(entry[1]) == set(formats):
+        written = [fmt for fmt, size in entry[1].items() if size is not None]
+        if all(os.path.exists(path + COMPRESSORS[fmt][0]) for fmt in written):
+            return entry, len(data), False
+
+    stat = os.stat(path)
+    sizes = {}
+    for fmt in formats:
+        suffix, compress = COMPRESSORS[fmt]
+        sibling = path + suffix
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            sizes[fmt] = None
+            if os.path.lexists(sibling):
+                os.unlink(sibling)
+            continue
+
+        # written aside and renamed so the host never serves a partial file
+        tmp_path = f"{sibling}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, sibling)
+        sizes[fmt] = len(compressed)
+
+    return [digest, sizes], len(data), True
+
+
+def compress_directory(root, state, formats=None, max_workers=None, changes=None) -> dict:
+    """Pre-compress every HTML/CSS/JS (and similar) file under root.
+
+    Runs in a thread pool: zlib, brotli and hashlib release the GIL while
+    they work. Siblings of files that are gone, or became too small, are
+    removed. Returns {"files", "compressed", "bytes", "formats": {format:
+    compressed bytes}}, counting files that were skipped as up to date.
+    Siblings are recorded in changes, an outputs.ChangeSet, when given.
+    """
+    formats = formats or available_formats()
+    names = [name for name in list_files(root) if _is_compressible(name)]
+    small = []
+    candidates = []
+    for name in names:
+        if os.path.getsize(os.path.join(root, name)) < MIN_SIZE:
+            small.append(name)
+        else:
+            candidates.append(name)
+
+    def compress_one(name):
+        return compress_file(os.path.join(root, name), formats, state.entries.get(name))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(compress_one, candidates))
+
+    stats = {"files": len(candidates), "compressed": 0, "bytes": 0, "formats": dict.fromkeys(formats, 0)}
+    entries = {}
+    for name, (entry, size, compressed) in zip(candidates, results):
+        entries[name] = entry
+        stats["bytes"] += size
+        stats["compressed"] += compressed
+        for fmt, compressed_size in entry[1].items():
+            stats["formats"][fmt] += size if compressed_size is None else compressed_size
+        if compressed:
+            logger.debug("Compressed %s", os.path.join(root, name))
+        if changes is not None:
+            previous = state.entries.get(name)
+            _record_siblings(changes, os.path.join(root, name), entry, previous, compressed)
+
+    for name in small:
+        _remove_siblings(os.path.join(root, name), changes=changes)
+    for name in set(state.entries) - set(entries) - set(small):
+        _remove_siblings(os.path.join(root, name), changes=changes)
+    state.entries = entries
+
+    return stats
+
+
+def _record_siblings(changes, path, entry, previous, compressed) -> None:
+    for fmt, size in entry[1].items():
+        sibling = path + COMPRESSORS[fmt][0]
+        existed = previous is not None and previous[1].get(fmt) is not None
+        if size is None:
+            if compressed and existed:
+                # compress_file removed it, the file no longer shrinks
+                changes.record(sibling, DELETED)
+        elif compressed:
+            changes.record(sibling, MODIFIED if existed else ADDED)
+        else:
+            changes.record(sibling)
+
+
+def remove_compressed(root, state, changes=None) -> None:
+    # undoes compress_directory, for builds that no longer compress
+    for name in state.entries:
+        _remove_siblings(os.path.join(root, name), changes=changes)
+    state.entries = {}
+
+
+def format_ratios(stats) -> str:
+    # "gzip 12.3 KB (27.1%), br 10.2 KB (22.5%)"
+    parts = []
+    for fmt, size in stats["formats"].items():
+        ratio = size / stats["bytes"] if stats["bytes"] else 1.0
+        parts.append(f"{fmt} {size / 1024:.1f} KB ({ratio:.1%})")
+    return ", ".join(parts)
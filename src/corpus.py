@@ -0,0 +1,111 @@
+import random
+
+from pathlib import Path
+
+WORDS = (
+    "the ring of power was forged in secret by sauron in the fires of mount doom "
+    "while elves and dwarves and men walked the long roads of middle earth under "
+    "stars and shadow toward rivendell lothlorien gondor rohan and the shire"
+).split()
+
+DEFAULT_BLOCK_MIX = {
+    "paragraph": 6,
+    "heading": 2,
+    "unordered_list": 1,
+    "ordered_list": 1,
+    "quote": 1,
+    "code": 1,
+    "image": 1,
+}
+
+
+def parse_block_mix(text) -> dict:
+    # "paragraph=6,heading=2" -> {"paragraph": 6, "heading": 2}
+    mix = {}
+    for item in text.split(","):
+        name, sep, weight = item.partition("=")
+        if not sep or name not in DEFAULT_BLOCK_MIX:
+            raise ValueError(f"Bad block mix entry {item!r}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("Block mix needs at least one positive weight")
+    return mix
+
+
+class CorpusGenerator:
+    """Deterministic generator of synthetic markdown for benchmarks.
+
+    Every document only uses syntax the parser accepts, so a corpus can be
+    pushed through the whole pipeline. link_density and image_density are
+    the chance that a sentence carries a link or that a paragraph is
+    followed by an image block.
+    """
+
+    def __init__(self, seed=0, block_mix=None, link_density=0.2, image_density=0.05,
+                 words_per_sentence=12, sentences_per_paragraph=4):
+        self.rng = random.Random(seed)
+        self.block_mix = block_mix or DEFAULT_BLOCK_MIX
+        self.link_density = link_density
+        self.image_density = image_density
+        self.words_per_sentence = words_per_sentence
+        self.sentences_per_paragraph = sentences_per_paragraph
+
+    def words(self, count) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def sentence(self) -> str:
+        rng = self.rng
+        parts = [self.words(self.words_per_sentence).capitalize()]
+        roll = rng.random()
+        if roll < 0.15:
+            parts.append(f"**{self.words(2)}**")
+        elif roll < 0.3:
+            parts.append(f"_{self.words(2)}_")
+        elif roll < 0.4:
+            parts.append(f"`{self.words(1)}`")
+        if rng.random() < self.link_density:
+            parts.append(f"[{self.words(3)}](/blog/{rng.choice(WORDS)})")
+        return " ".join(parts) + "."
+
+    def block(self, kind) -> str:
+        rng = self.rng
+        if kind == "paragraph":
+            return " ".join(self.sentence() for _ in range(self.sentences_per_paragraph))
+        if kind == "heading":
+            return f"{'#' * rng.randint(2, 6)} {self.words(4).capitalize()}"
+        if kind == "unordered_list":
+            return "\n".join(f"- {self.sentence()}" for _ in range(rng.randint(2, 6)))
+        if kind == "ordered_list":
+            return "\n".join(f"{i}. {self.sentence()}" for i in range(1, rng.randint(3, 8)))
+        if kind == "quote":
+            return "\n".join(f"> {self.sentence()}" for _ in range(rng.randint(1, 3)))
+        if kind == "code":
+            lines = [f"let {self.words(1)} = {rng.randint(0, 99)}" for _ in range(rng.randint(2, 6))]
+            return "```\n" + "\n".join(lines) + "\n```"
+        if kind == "image":
+            return f"![{self.words(3)}](/images/{rng.choice(WORDS)}.png)"
+        raise ValueError(f"Unknown block kind {kind}")
+
+    def document(self, blocks) -> str:
+        kinds = list(self.block_mix)
+        weights = [self.block_mix[kind] for kind in kinds]
+        parts = [f"# {self.words(5).capitalize()}"]
+        for kind in self.rng.choices(kinds, weights, k=blocks):
+            parts.append(self.block(kind))
+            if kind == "paragraph" and self.rng.random() < self.image_density:
+                parts.append(self.block("image"))
+        return "\n\n".join(parts) + "\n"
+
+    def write_corpus(self, root, pages, blocks_per_page=20, depth=2, fanout=8) -> list[Path]:
+        """Write pages markdown files under root, nested up to depth directories."""
+        root = Path(root)
+        paths = []
+        for i in range(pages):
+            directory = root
+            for level in range(self.rng.randint(0, depth)):
+                directory = directory / f"section{self.rng.randrange(fanout)}"
+            path = directory / f"page{i}" / "index.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(self.document(blocks_per_page))
+            paths.append(path)
+        return paths
@@ -0,0 +1,131 @@
+import json
+import os
+
+from pathlib import Path
+from manifest import hash_file
+
+GRAPH_VERSION = 1
+
+# inputs that are values produced during the build rather than files
+TITLE_PREFIX = "title:"
+LISTING_PREFIX = "listing:"
+ASSET_PREFIX = "asset:"
+IMAGE_PREFIX = "image:"
+OPTIONS_KEY = "options"
+
+
+def title_key(source) -> str:
+    return f"{TITLE_PREFIX}{source}"
+
+
+def asset_key(url) -> str:
+    # the fingerprinted URL of the asset at url
+    return f"{ASSET_PREFIX}{url}"
+
+
+def image_key(url) -> str:
+    # the dimensions and srcset variants of the image at url
+    return f"{IMAGE_PREFIX}{url}"
+
+
+def listing_key(directory) -> str:
+    # the ordered sources of the pages under directory
+    return f"{LISTING_PREFIX}{directory}"
+
+
+class DependencyGraph:
+    """On-disk record of which inputs every build output read.
+
+    Each output maps to the fingerprints its inputs had when it was built.
+    File inputs are keyed by path and fingerprinted by content hash. Values
+    produced during the build, such as another page's title, are keyed by
+    name (see title_key) and fingerprinted by the value itself. An output
+    is current when all of its inputs still have the recorded fingerprints,
+    and dependents() answers the reverse question of which outputs read a
+    given input.
+    """
+
+    def __init__(self, path, edges=None, values=None):
+        self.path = Path(path)
+        # output -> {input: fingerprint}
+        self.edges = edges if edges is not None else {}
+        # value input -> its latest value, kept for outputs skipped this build
+        self.values = values if values is not None else {}
+        self._file_hashes = {}
+        self._dependents = None
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get("version") != GRAPH_VERSION:
+            return cls(path)
+
+        return cls(path, data.get("edges", {}), data.get("values", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": GRAPH_VERSION, "edges": self.edges, "values": self.values}
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, key):
+        if key in self.values:
+            return self.values[key]
+
+        # file hashes are computed at most once per build
+        if key not in self._file_hashes:
+            try:
+                self._file_hashes[key] = hash_file(key)
+            except OSError:
+                self._file_hashes[key] = None
+        return self._file_hashes[key]
+
+    def set_value(self, key, value) -> bool:
+        # returns whether the value differs from the one last recorded
+        changed = self.values.get(key) != value
+        self.values[key] = value
+        return changed
+
+    def forget_value(self, key):
+        self.values.pop(key, None)
+
+    def invalidate(self, paths):
+        # drop memoized hashes of files known to have changed
+        for path in paths:
+            self._file_hashes.pop(str(path), None)
+
+    def record(self, output, inputs):
+        self.edges[str(output)] = {str(key): self.fingerprint(str(key)) for key in inputs}
+        self._dependents = None
+
+    def forget(self, output):
+        if self.edges.pop(str(output), None) is not None:
+            self._dependents = None
+
+    def inputs(self, output) -> dict:
+        return self.edges.get(str(output), {})
+
+    def is_current(self, output) -> bool:
+        recorded = self.edges.get(str(output))
+        if recorded is None:
+            return False
+        return all(self.fingerprint(key) == value for key, value in recorded.items())
+
+    def dependents(self, inputs) -> set[str]:
+        if self._dependents is None:
+            self._dependents = {}
+            for output, recorded in self.edges.items():
+                for key in recorded:
+                    self._dependents.setdefault(key, set()).add(output)
+
+        outputs = set()
+        for key in inputs:
+            outputs |= self._dependents.get(str(key), set())
+        return outputs
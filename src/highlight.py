@@ -0,0 +1,119 @@
+import hashlib
+import html
+import os
+
+from pathlib import Path
+from astcache import prune_directory
+from htmlnode import LeafNode
+
+try:
+    import pygments
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    pygments = None
+
+# Bump whenever the highlighted markup would change for the same code, so
+# entries written by an older version are never reused.
+HIGHLIGHT_VERSION = 1
+LANGUAGE_PREFIX = "language-"
+# class of highlighted <pre> blocks, the selector of the CSS printed by
+# pygmentize -S default -f html -a .highlight
+PRE_CLASS = "highlight"
+
+# memoized result for code in a language Pygments doesn't know
+_UNKNOWN = ""
+
+
+def highlighting_available() -> bool:
+    # highlighting needs Pygments, which is optional
+    return pygments is not None
+
+
+class Highlighter:
+    """Syntax highlighting of fenced code blocks, memoized by content hash.
+
+    The markup for a snippet is keyed by a hash of its language, its code
+    and the Pygments version, and kept both in memory and as a file under
+    directory, so code repeated across pages is tokenized once however many
+    worker processes render them, and not again by later builds. Reading an
+    entry refreshes its mtime, and prune() deletes the least recently used
+    entries once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._memory = {}
+        self._lexers = {}
+        self._formatter = None
+        # snippets that had to be tokenized rather than served from a cache
+        self.tokenized = 0
+
+    def __getstate__(self):
+        # sent to worker processes without what this process memoized
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_bytes"])
+
+    def _path(self, language, code) -> Path:
+        digest = hashlib.sha256(
+            f"{HIGHLIGHT_VERSION}:{pygments.__version__}:{language}\0".encode() + code.encode()
+        ).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def _tokenize(self, code, language) -> str:
+        lexer = self._lexers.get(language)
+        if lexer is None:
+            try:
+                lexer = get_lexer_by_name(language)
+            except ClassNotFound:
+                return _UNKNOWN
+            self._lexers[language] = lexer
+        if self._formatter is None:
+            self._formatter = HtmlFormatter(nowrap=True)
+        self.tokenized += 1
+        return pygments.highlight(code, lexer, self._formatter)
+
+    def highlight(self, code, language) -> str | None:
+        # Returns code as highlighted markup, or None when Pygments doesn't
+        # know the language.
+        path = self._path(language, code)
+        markup = self._memory.get(path.name)
+        if markup is None:
+            try:
+                markup = path.read_text()
+                os.utime(path)
+            except OSError:
+                markup = self._tokenize(code, language)
+                if markup is not _UNKNOWN:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    # workers may store the same entry at once
+                    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                    tmp_path.write_text(markup)
+                    os.replace(tmp_path, path)
+            self._memory[path.name] = markup
+        return markup or None
+
+    def apply(self, node):
+        # Highlights node in place if it is a fenced code block with a
+        # language (see blocktype.code_block_node) and returns it, so a
+        # page's blocks can be mapped through this.
+        if node.tag != "pre" or len(node.children) != 1:
+            return node
+        code_node = node.children[0]
+        language = (code_node.props or {}).get("class", "")
+        if not language.startswith(LANGUAGE_PREFIX) or not code_node.children:
+            return node
+
+        code = html.unescape(code_node.children[0].value)
+        markup = self.highlight(code, html.unescape(language[len(LANGUAGE_PREFIX):]))
+        if markup is not None:
+            code_node.children = [LeafNode(None, markup)]
+            node.props = {"class": PRE_CLASS}
+        return node
+
+    def prune(self) -> int:
+        return prune_directory(self.directory, self.max_bytes)
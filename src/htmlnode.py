@@ -1,7 +1,16 @@
 import re
 from textnode import TextNode, TextType, markdown_to_blocks, TextNodeDelimiter
 
+# attributes whose values are URLs and go through the rewrite_url hook
+URL_ATTRIBUTES = ("href", "src")
+# elements without content or closing tag, written as <img ...> when empty
+VOID_TAGS = {"img", "br", "hr"}
+
 class HTMLNode:
+    # nodes are created for every inline fragment of every page, so they use
+    # slots instead of a per-instance __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -11,6 +20,16 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError("Must implement this method")
 
+    def write_html(self, write, rewrite_url=None, image_attributes=None, minifier=None):
+        # Streams the markup through write() one chunk at a time. Nested
+        # nodes write straight into the same sink, so nothing is copied once
+        # per nesting level the way joining child strings would. rewrite_url,
+        # when given, maps every href/src value before it is written, and
+        # image_attributes returns extra attributes for every <img> from its
+        # original src (see images.image_annotator). minifier, a
+        # minify.Minifier, writes attributes without quotes where it can.
+        raise NotImplementedError("Must implement this method")
+
     def props_to_html(self):
         if not self.props:
             return ""
@@ -21,71 +40,167 @@ class HTMLNode:
     def __repr__(self):
         return f"{self.tag} {self.value} {self.children} {self.props}"
 
+def attributes_html(attributes, rewrite_url=None, minifier=None):
+    # ' key="value" ...' with the serializer hooks applied
+    if rewrite_url is None and minifier is None:
+        # most nodes have one or two attributes, where += beats a join
+        html = ""
+        for key, value in attributes.items():
+            html += f' {key}="{value}"'
+        return html
+    attr_pairs = []
+    for key, value in attributes.items():
+        if rewrite_url is not None and key in URL_ATTRIBUTES:
+            value = rewrite_url(value)
+        if minifier is not None:
+            attr_pairs.append(minifier.attribute(key, value))
+        else:
+            attr_pairs.append(f'{key}="{value}"')
+    return " " + " ".join(attr_pairs)
+
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, attributes=None):
-        super().__init__()
-        self.value = value
+        # slots set directly, as in ParentNode
         self.tag = tag
-        self.attributes = attributes
+        self.value = value
+        self.children = None
         self.props = attributes
 
-    def to_html(self):
-        if self.value == "":
+    # attributes is the leaf name for props; both share the one slot
+    @property
+    def attributes(self):
+        return self.props
+
+    @attributes.setter
+    def attributes(self, attributes):
+        self.props = attributes
+
+    def to_html(self, rewrite_url=None, image_attributes=None, minifier=None):
+        void = self.tag in VOID_TAGS and not self.value
+        if self.value == "" and not void:
             raise ValueError("All leaf nodes must have a value.")
 
         if self.tag is None:
             return self.value
 
-        attr_str = ""
-        if self.attributes:
-            attr_pairs = []
-            for key, value in self.attributes.items():
-                attr_pairs.append(f'{key}="{value}"')
-            if attr_pairs:
-                attr_str = " " + " ".join(attr_pairs)
+        attributes = self.attributes
+        if image_attributes is not None and self.tag == "img":
+            attributes = {**(attributes or {})}
+            for key, value in image_attributes(attributes.get("src")).items():
+                attributes.setdefault(key, value)
+
+        attr_str = attributes_html(attributes, rewrite_url, minifier) if attributes else ""
 
+        if void:
+            return f"<{self.tag}{attr_str}>"
         new_tag = f"<{self.tag}{attr_str}>{self.value}</{self.tag}>"
         return new_tag
 
+    def write_html(self, write, rewrite_url=None, image_attributes=None, minifier=None):
+        write(self.to_html(rewrite_url, image_attributes, minifier))
+
+class SharedLeafNode(LeafNode):
+    """An attribute-less leaf that may appear in many trees at once.
+
+    Instances come from shared_leaf() and are immutable, since changing one
+    would change every page that uses it.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, tag, value):
+        for name, slot_value in (("tag", tag), ("value", value), ("children", None), ("props", None)):
+            object.__setattr__(self, name, slot_value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("shared leaf nodes are immutable")
+
+    def __reduce__(self):
+        return (shared_leaf, (self.tag, self.value))
+
+# Short attribute-less leaves (", ", " and the ", a bold word) repeat
+# constantly across a site, so they are handed out from one bounded cache.
+SHARED_LEAF_MAX_LENGTH = 32
+SHARED_LEAF_CACHE_SIZE = 8192
+_shared_leaves = {}
+
+def shared_leaf(tag, value):
+    key = (tag, value)
+    node = _shared_leaves.get(key)
+    if node is None:
+        if len(_shared_leaves) >= SHARED_LEAF_CACHE_SIZE:
+            _shared_leaves.clear()
+        node = _shared_leaves[key] = SharedLeafNode(tag, value)
+    return node
+
+def leaf_node(tag, value, attributes=None):
+    # LeafNode factory that reuses a shared instance whenever it can
+    if attributes is None and value is not None and len(value) <= SHARED_LEAF_MAX_LENGTH:
+        return shared_leaf(tag, value)
+    return LeafNode(tag, value, attributes)
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__()
+        # every slot set here rather than through HTMLNode.__init__, which
+        # is measurable for the many small nodes of a page
         self.tag = tag
+        self.value = None
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def to_html(self, rewrite_url=None, image_attributes=None, minifier=None):
+        html_list = []
+        self.write_html(html_list.append, rewrite_url, image_attributes, minifier)
+        return ''.join(html_list)
+
+    def write_html(self, write, rewrite_url=None, image_attributes=None, minifier=None):
         if not self.tag:
             raise ValueError("Tag is missing")
 
         if self.children is None:
             raise ValueError("Children value is missing")
 
-        new_tag = ""
-        html_list = []
+        if self.props:
+            write(f"<{self.tag}{attributes_html(self.props, rewrite_url, minifier)}>")
+        else:
+            write(f"<{self.tag}>")
         for child in self.children:
-            html_list.append(child.to_html())
-
-        new_tag = ''.join(html_list)
-
-        return f"<{self.tag}>{new_tag}</{self.tag}>"
+            child.write_html(write, rewrite_url, image_attributes, minifier)
+        write(f"</{self.tag}>")
+
+def _link_to_html_node(text_node):
+    return LeafNode("a", text_node.text, {"href": text_node.url})
+
+def _image_to_html_node(text_node):
+    return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+
+# built once at import instead of on every call; plain inline types only
+# need a tag so they skip the builder call and go straight to leaf_node
+_INLINE_TAGS = {
+    TextType.TEXT: None,
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+_INLINE_BUILDERS = {
+    TextType.LINK: _link_to_html_node,
+    TextType.IMAGE: _image_to_html_node,
+}
 
 def text_node_to_html_node(text_node):
-
-    html_dict = {
-        TextType.TEXT: lambda node: LeafNode(None, text_node.text),
-        TextType.BOLD: lambda node: LeafNode("b", text_node.text),
-        TextType.ITALIC: lambda node: LeafNode("i", text_node.text),
-        TextType.CODE: lambda node: LeafNode("code", text_node.text),
-        TextType.LINK: lambda node: LeafNode("a", text_node.text, {"href": text_node.url}),
-        TextType.IMAGE: lambda node: LeafNode("img", "", {"src": text_node.url, "alt": text_node.text}),
-        }
-
-    if text_node.text_type not in html_dict:
-        raise ValueError(f"Unsupported TextType: {text_node.text_type}") 
-
-    new_node = html_dict[text_node.text_type](text_node)
-    return new_node
+    text_type = text_node.text_type
+    try:
+        tag = _INLINE_TAGS[text_type]
+    except KeyError:
+        builder = _INLINE_BUILDERS.get(text_type)
+        if builder is None:
+            raise ValueError(f"Unsupported TextType: {text_type}")
+        return builder(text_node)
+    return leaf_node(tag, text_node.text)
 
 
 def extract_markdown_images(text):
@@ -190,14 +305,69 @@ def split_nodes_link(old_nodes):
 
     return new_nodes
 
-def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    return nodes
+# every inline delimiter, in the order the original split passes applied them:
+# bold first, then italic inside the non-bold text, then code inside the rest
+_DELIMITER_PATTERN = re.compile(r"\*\*|_|`")
+_DELIMITER_RANK = {"**": 0, "_": 1, "`": 2}
+_DELIMITER_TYPES = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+_IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_PATTERN = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+
+def _append_links(text, start, end, nodes):
+    pos = start
+    for match in _LINK_PATTERN.finditer(text, start, end):
+        if match.start() > pos:
+            nodes.append(TextNode(text[pos:match.start()], TextType.TEXT))
+        nodes.append(TextNode(match.group(1), TextType.LINK, match.group(2)))
+        pos = match.end()
+
+    if end > pos:
+        nodes.append(TextNode(text[pos:end], TextType.TEXT))
+
+def _append_text(text, start, end, nodes):
+    if start >= end:
+        return
+
+    # most text has no brackets at all, so skip both regex scans for it
+    if text.find("[", start, end) == -1:
+        nodes.append(TextNode(text[start:end], TextType.TEXT))
+        return
+
+    # images win over links, exactly like split_nodes_image running first
+    pos = start
+    for match in _IMAGE_PATTERN.finditer(text, start, end):
+        _append_links(text, pos, match.start(), nodes)
+        nodes.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+        pos = match.end()
+
+    _append_links(text, pos, end, nodes)
 
+def text_to_textnodes(text):
+    # Single pass replacement for running split_nodes_delimiter three times
+    # followed by split_nodes_image and split_nodes_link. It produces the same
+    # node stream: an open span ignores delimiters that were split *after* it
+    # (so `_` inside bold stays literal) and a delimiter that was split
+    # *before* it means the old pipeline would have seen an unbalanced segment.
+    nodes = []
+    open_delimiter = None
+    segment_start = 0
+
+    for match in _DELIMITER_PATTERN.finditer(text):
+        delimiter = match.group()
+
+        if open_delimiter is None:
+            _append_text(text, segment_start, match.start(), nodes)
+            open_delimiter = delimiter
+            segment_start = match.end()
+        elif delimiter == open_delimiter:
+            nodes.append(TextNode(text[segment_start:match.start()], _DELIMITER_TYPES[delimiter]))
+            open_delimiter = None
+            segment_start = match.end()
+        elif _DELIMITER_RANK[delimiter] < _DELIMITER_RANK[open_delimiter]:
+            raise Exception("Invalid Markdown Syntax")
 
+    if open_delimiter is not None:
+        raise Exception("Invalid Markdown Syntax")
 
+    _append_text(text, segment_start, len(text), nodes)
+    return nodes
@@ -0,0 +1,248 @@
+import json
+import os
+import struct
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from assets import fingerprinted_name
+from log import logger
+from outputs import ADDED, DELETED
+from sync import list_files, remove_empty_parents
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGES_VERSION = 1
+IMAGE_SUFFIXES = {".png", ".gif", ".jpg", ".jpeg", ".webp"}
+# widths of the downscaled srcset variants; only the ones narrower than the
+# original are written
+VARIANT_WIDTHS = (480, 960)
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    # walks the segment headers up to the first start-of-frame marker
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+    """Return (width, height) of a PNG, GIF, JPEG or WebP file, or None.
+
+    Only the header is read, so this costs a few hundred bytes of I/O
+    however large the image is.
+    """
+    with open(path, "rb") as f:
+        head = f.read(30)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(f)
+        if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+            chunk = head[12:16]
+            if chunk == b"VP8 " and len(head) >= 30:
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return (
+                    int.from_bytes(head[24:27], "little") + 1,
+                    int.from_bytes(head[27:30], "little") + 1,
+                )
+    return None
+
+
+class ImageCache:
+    """Dimensions of static images keyed by content hash, and the srcset
+    variants written by the last build.
+    """
+
+    def __init__(self, path, sizes=None, variants=None):
+        self.path = Path(path)
+        # content hash -> [width, height], or None for unreadable files
+        self.sizes = sizes if sizes is not None else {}
+        # relative names of the variants written into the output directory
+        self.variants = set(variants or ())
+        # images whose header was read rather than served from the cache
+        self.read = 0
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get("version") != IMAGES_VERSION:
+            return cls(path)
+
+        return cls(path, data.get("sizes", {}), data.get("variants", []))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": IMAGES_VERSION, "sizes": self.sizes, "variants": sorted(self.variants)}
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def size(self, path, digest):
+        if digest not in self.sizes:
+            self.sizes[digest] = image_size(path)
+            self.read += 1
+        return self.sizes[digest]
+
+
+def variants_available() -> bool:
+    # downscaling needs Pillow, which is optional
+    return Image is not None
+
+
+def _write_variant(job):
+    # runs inside a worker process
+    src, dest, width, height = job
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    with Image.open(src) as image:
+        image.resize((width, height), Image.LANCZOS).save(tmp_path, format=image.format)
+    os.replace(tmp_path, dest)
+
+
+def variant_name(name, width, digest) -> str:
+    # "images/tom.png" -> "images/tom.480w.3f9a1c2b.png"
+    root, ext = os.path.splitext(name)
+    return fingerprinted_name(f"{root}.{width}w{ext}", digest)
+
+
+def process_images(src, dst, hashes, cache, variants=False, max_workers=None, changes=None) -> dict:
+    """Measure every image under src and, with variants, write downscaled
+    copies of it into dst for srcset.
+
+    hashes is the AssetHashes of src. Variant names carry the hash of the
+    original, so an unchanged image never has its variants written again.
+    With dst None the table is returned without writing or removing any
+    variants. Variants are recorded in changes, an outputs.ChangeSet, when
+    given. Returns the image table: root relative URL -> {"width",
+    "height", "variants": [[url, width], ...]}.
+    """
+    table = {}
+    jobs = []
+    written = set()
+    digests = set()
+    cache.read = 0
+
+    for name in list_files(src):
+        if os.path.splitext(name)[1].lower() not in IMAGE_SUFFIXES:
+            continue
+        path = os.path.join(src, name)
+        digest = hashes.get(src, name)
+        digests.add(digest)
+        size = cache.size(path, digest)
+        if size is None:
+            logger.warning("Can't read the dimensions of %s", path)
+            continue
+
+        width, height = size
+        entry = {"width": width, "height": height, "variants": []}
+        if variants:
+            for variant_width in VARIANT_WIDTHS:
+                if variant_width >= width:
+                    continue
+                variant = variant_name(name, variant_width, digest)
+                written.add(variant)
+                entry["variants"].append([_url(variant), variant_width])
+                if dst is None:
+                    continue
+                if not os.path.exists(os.path.join(dst, variant)):
+                    variant_height = max(1, round(height * variant_width / width))
+                    jobs.append((path, os.path.join(dst, variant), variant_width, variant_height))
+                elif changes is not None:
+                    changes.record(os.path.join(dst, variant))
+        table[_url(name)] = entry
+
+    if dst is None:
+        return table
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_write_variant, jobs))
+    if changes is not None:
+        for job in jobs:
+            # variant names change with the image, so a written one is new
+            changes.record(job[1], ADDED)
+
+    for name in sorted(cache.variants - written):
+        path = os.path.join(dst, name)
+        if os.path.lexists(path):
+            logger.debug("Removing %s", path)
+            os.unlink(path)
+            if changes is not None:
+                changes.record(path, DELETED)
+        remove_empty_parents(path, dst)
+    cache.variants = written
+    for digest in set(cache.sizes) - digests:
+        del cache.sizes[digest]
+
+    logger.info(
+        "Measured %d images in %s (%d read, %d variants written)",
+        len(table), src, cache.read, len(jobs),
+    )
+    return table
+
+
+def image_annotator(images, rewrite_url=None, used=None):
+    """Return the function that gives the extra attributes of an <img>.
+
+    It is called with the image's src as written in the markdown, before
+    any URL rewriting. Known images get their dimensions and a srcset;
+    every image is lazy loaded and decoded off the main thread. The URLs
+    of known images are added to used, when given.
+    """
+
+    def image_attributes(src):
+        attributes = {}
+        entry = images.get(src) if src is not None else None
+        if entry is not None:
+            if used is not None:
+                used.add(src)
+            attributes["width"] = str(entry["width"])
+            attributes["height"] = str(entry["height"])
+            if entry["variants"]:
+                candidates = [*entry["variants"], [src, entry["width"]]]
+                attributes["srcset"] = ", ".join(
+                    f"{rewrite_url(url) if rewrite_url else url} {width}w"
+                    for url, width in candidates
+                )
+                attributes["sizes"] = f"(max-width: {entry['width']}px) 100vw, {entry['width']}px"
+        attributes["loading"] = "lazy"
+        attributes["decoding"] = "async"
+        return attributes
+
+    return image_attributes
+
+
+def _url(name) -> str:
+    return "/" + name.replace(os.sep, "/")
@@ -0,0 +1,77 @@
+import json
+import logging
+import logging.handlers
+import sys
+import time
+
+logger = logging.getLogger("site_generator")
+
+# records are held in memory and written in batches instead of one terminal
+# write per line; anything at ERROR or above is flushed straight away
+BUFFER_CAPACITY = 512
+
+_event_log = None
+
+
+class EventLog:
+    """Appends build events to a file as one JSON object per line."""
+
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1 << 16)
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 6), **fields}
+        self.file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def configure_logging(level=logging.INFO, event_log_path=None):
+    global _event_log
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    handler = logging.handlers.MemoryHandler(
+        BUFFER_CAPACITY, flushLevel=logging.ERROR, target=stream
+    )
+
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+        old.close()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    if _event_log is not None:
+        _event_log.close()
+    _event_log = EventLog(event_log_path) if event_log_path else None
+
+
+def configure_worker_logging(level):
+    # Pool workers log straight to stderr: a buffer inherited from the parent
+    # would only ever be flushed in the parent, and worker output is rare
+    # (debug lines and nothing else) anyway.
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(stream)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def events_enabled() -> bool:
+    return _event_log is not None
+
+
+def log_event(event, **fields):
+    if _event_log is not None:
+        _event_log.emit(event, **fields)
+
+
+def flush_logs():
+    for handler in logger.handlers:
+        handler.flush()
+    if _event_log is not None:
+        _event_log.file.flush()
@@ -1,11 +1,101 @@
-import sys
+import argparse
+import logging
 import os
 import shutil
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from pathlib import Path
-from textnode import TextNode
-from blocktype import markdown_to_html_node
+from textnode import TextNode, markdown_to_blocks
+from blocktype import Outline, blocks_to_html_node, stream_html_node
 from htmlnode import HTMLNode
+from assets import AssetHashes, asset_table, fingerprint_assets
+from astcache import ASTCache
+from compress import (
+    CompressionState,
+    compress_directory,
+    compressed_suffixes,
+    format_ratios,
+    remove_compressed,
+)
+from depgraph import (
+    ASSET_PREFIX,
+    IMAGE_PREFIX,
+    LISTING_PREFIX,
+    OPTIONS_KEY,
+    DependencyGraph,
+    asset_key,
+    image_key,
+    listing_key,
+    title_key,
+)
+from highlight import Highlighter, highlighting_available
+from images import ImageCache, image_annotator, process_images, variants_available
+from log import configure_logging, configure_worker_logging, events_enabled, flush_logs, log_event, logger
+from manifest import BuildManifest, hash_file
+from minify import Minifier
+from outputs import (
+    ADDED,
+    DELETED,
+    MODIFIED,
+    ChangeSet,
+    SpooledPage,
+    replace_if_changed,
+    temporary_path,
+    write_if_changed,
+)
+from pipeline import run_pipeline
+from profiler import NULL_TIMER, BuildProfile, StageTimer
+from serve import serve
+from shard import (
+    SHARD_MANIFEST_NAME,
+    ShardManifest,
+    check_shards,
+    load_timings,
+    parse_shard,
+    partition_sources,
+    save_timings,
+    sources_digest,
+)
+from siteindex import SiteIndex, section_node, write_feed, write_sitemap
+from sync import sync_directory, sync_file
+from template import load_template, url_rewriter
+
+CONTENT_DIR = "content"
+STATIC_DIR = "static"
+TEMPLATE_PATH = "template.html"
+OUTPUT_DIR = "docs"
+MANIFEST_PATH = ".cache/manifest.json"
+DEPGRAPH_PATH = ".cache/depgraph.json"
+ASSET_HASHES_PATH = ".cache/assets.json"
+COMPRESSION_STATE_PATH = ".cache/compress.json"
+IMAGE_CACHE_PATH = ".cache/images.json"
+# seconds every page took in the last merged sharded build
+SHARD_TIMINGS_PATH = ".cache/shard-timings.json"
+# where --shard K/N writes shard K without --out
+SHARD_OUT_DIR = ".cache/shard-{}"
+# the outputs the last build added, modified or deleted, for deploy scripts
+CHANGED_FILES_PATH = ".cache/changed-files.txt"
+AST_CACHE_DIR = ".cache/ast"
+HIGHLIGHT_CACHE_DIR = ".cache/highlight"
+# directories of content/ that get a generated index page listing their pages
+SECTIONS = ("blog",)
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+FEED_SIZE = 20
+# markdown files larger than this are parsed while the page is written
+# instead of being read into memory whole
+STREAM_THRESHOLD = 32 * 1024 * 1024
+# reader and writer threads of the page pipeline, how many batches of at
+# most PIPELINE_BATCH pages may be between being read and written at once
+IO_THREADS = 4
+PIPELINE_DEPTH = 8
+PIPELINE_BATCH = 16
+# characters of a rendered page held in memory before the rest of it is
+# streamed to disk (see outputs.SpooledPage); few pages are larger
+PAGE_CHUNK_SIZE = 256 * 1024
 
 
 def extract_title(markdown):
@@ -20,49 +110,385 @@ def extract_title(markdown):
 
     return item
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    
-    from_path_open = open(from_path, "r")
-    template_path_open = open(template_path, "r")
+def _page_hooks(template_path, basepath, assets, images, minify, timer):
+    # The compiled template and the (rewrite_url, image_attributes, minifier)
+    # serializer hooks of one page, plus the sets of asset and image URLs the
+    # hooks fill in as the page is written.
+    with timer.stage("template"):
+        template = load_template(template_path, basepath, assets, minify)
+    used = (set(template.assets), set())
+    rewrite_url = url_rewriter(basepath, assets, used[0]) if assets else template.rewrite_url
+    image_attributes = (
+        image_annotator(images, rewrite_url, used[1]) if images is not None else None
+    )
+    minifier = Minifier() if minify else None
+    return template, (rewrite_url, image_attributes, minifier), used
 
+def _page_info(title, cache_hit, timer, started, hooks, used) -> dict:
+    # "bytes" is added once the page is written
+    return {
+        "title": title,
+        "cache_hit": cache_hit,
+        "timings": timer.timings,
+        "started": started,
+        "duration": time.time() - started,
+        "assets": sorted(used[0]),
+        "images": sorted(used[1]),
+        "saved": hooks[2].saved if hooks[2] is not None else 0,
+    }
+
+def read_markdown(from_path) -> str:
+    with open(from_path, "r") as from_file:
+        return from_file.read()
+
+def render_page(
+    markdown, template_path, basepath, write, variables=None, ast_cache=None, profile=False,
+    assets=None, images=None, minify=False, highlighter=None,
+):
+    # Renders a page from its markdown into write, which takes the page a
+    # piece at a time, without touching the page's files. Returns the page
+    # info (see generate_page) without "bytes".
+    started = time.time()
+
+    # with profiling off every stage below is a shared no-op context manager
+    timer = StageTimer() if profile else NULL_TIMER
+    template, hooks, used = _page_hooks(template_path, basepath, assets, images, minify, timer)
+
+    cache_hit = None
+    html = None
+    if ast_cache is not None:
+        with timer.stage("cache"):
+            html = ast_cache.get(markdown)
+        cache_hit = html is not None
+
+    if html is None:
+        with timer.stage("split"):
+            blocks = markdown_to_blocks(markdown)
+        with timer.stage("parse"):
+            outline = Outline()
+            html = blocks_to_html_node(blocks, outline)
+        if ast_cache is not None:
+            with timer.stage("cache"):
+                ast_cache.put(markdown, html)
+    else:
+        # the cached tree has its heading ids already
+        outline = Outline.from_tree(html)
 
-    markdown = from_path_open.read()
-    template = template_path_open.read()
+    if highlighter is not None:
+        # after the AST cache, which holds trees as parsed
+        with timer.stage("highlight"):
+            html.children = [highlighter.apply(block) for block in html.children]
 
-    html = markdown_to_html_node(markdown)
+    with timer.stage("parse"):
+        title = extract_title(markdown)
 
-    title = extract_title(markdown)
+    page_variables = {"Basepath": basepath, **(variables or {})}
+    page_variables["Title"] = title
+    page_variables["Content"] = html
+    if "Toc" in template.slots:
+        # only built for templates that show it
+        with timer.stage("toc"):
+            page_variables["Toc"] = outline.to_html_node() or ""
 
-    template = (
-        template.replace("{{ Title }}", title)
-        .replace("{{ Content }}", html.to_html())
-        .replace('href="/', f'href="{basepath}')
-        .replace('src="/', f'src="{basepath}')
+    if not profile:
+        template.render(write, page_variables, *hooks)
+    else:
+        # serialize and fill the template one after the other so each stage
+        # can be timed on its own
+        with timer.stage("serialize"):
+            page_variables["Content"] = html.to_html(*hooks)
+        with timer.stage("template"):
+            template.render(write, page_variables, minifier=hooks[2])
+
+    return _page_info(title, cache_hit, timer, started, hooks, used)
+
+def render_spooled_page(markdown, template_path, dest_path, basepath, **options):
+    # render_page into an outputs.SpooledPage, which holds at most a chunk
+    # of the page in memory; returns the page, for write_page to put in
+    # place, and the page info.
+    page = SpooledPage(dest_path, PAGE_CHUNK_SIZE)
+    try:
+        info = render_page(markdown, template_path, basepath, page.write, **options)
+    except BaseException:
+        page.discard()
+        raise
+    page.close()
+    return page, info
+
+def write_page(dest_path, page) -> tuple[int, str | None]:
+    # page is either the page as one string, as rendered by a worker
+    # process, or the SpooledPage render_spooled_page rendered it into.
+    # Returns the size of the page and its outputs status; a page that came
+    # out the same is not written at all, which keeps its mtime for rsync,
+    # the compression pass and HTTP caches.
+    if isinstance(page, str):
+        data = page.encode()
+        return len(data), write_if_changed(dest_path, data)
+    return page.finish()
+
+def _add_timing(info, stage, start) -> None:
+    if info["timings"] is not None:
+        info["timings"][stage] = info["timings"].get(stage, 0.0) + time.perf_counter() - start
+
+def generate_page(
+    from_path, template_path, dest_path, basepath, variables=None, ast_cache=None, profile=False,
+    stream_threshold=STREAM_THRESHOLD, assets=None, images=None, minify=False, highlighter=None,
+):
+    # assets, when given, is the AssetTable of fingerprinted static files and
+    # images the table from images.process_images; the returned info lists
+    # the asset and image URLs the page references. With minify the page is
+    # minified as it is serialized and the info has the bytes that saved.
+    # highlighter, a highlight.Highlighter, highlights fenced code.
+    logger.debug("Generating page from %s to %s using %s", from_path, dest_path, template_path)
+    options = {"assets": assets, "images": images, "minify": minify, "highlighter": highlighter}
+
+    if os.path.getsize(from_path) > stream_threshold:
+        return _stream_page(from_path, template_path, dest_path, basepath, variables, profile, **options)
+
+    started = time.time()
+    start = time.perf_counter()
+    markdown = read_markdown(from_path)
+    read_time = time.perf_counter() - start
+
+    page, info = render_spooled_page(
+        markdown, template_path, dest_path, basepath, variables=variables, ast_cache=ast_cache,
+        profile=profile, **options
     )
+    if info["timings"] is not None:
+        info["timings"]["read"] = read_time
+
+    start = time.perf_counter()
+    info["bytes"], info["status"] = write_page(dest_path, page)
+    _add_timing(info, "write", start)
+    info["started"] = started
+    info["duration"] = time.time() - started
+    return info
+
+def _stream_page(
+    from_path, template_path, dest_path, basepath, variables, profile, assets, images, minify,
+    highlighter,
+):
+    # Blocks are read, parsed and written one at a time, so memory stays flat
+    # however large the markdown is. The AST cache is skipped: its key is a
+    # hash of the whole document, and a cached tree would be as big as the
+    # document anyway.
+    started = time.time()
+    timer = StageTimer() if profile else NULL_TIMER
+    template, hooks, used = _page_hooks(template_path, basepath, assets, images, minify, timer)
 
     dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    # written aside and compared with the old page once complete
+    tmp_path = temporary_path(dest_path)
 
-    if not dest_path.parent.exists():
-          dest_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(from_path, "r") as from_file, open(tmp_path, "w") as dest_file:
+            title = extract_title(from_file.readline())
+            from_file.seek(0)
+
+            page_variables = {"Basepath": basepath, **(variables or {})}
+            page_variables["Title"] = title
+            page_variables["Content"] = stream_html_node(from_file)
+            if highlighter is not None:
+                content = page_variables["Content"]
+                content.children = map(highlighter.apply, content.children)
+            # headings are only known once the page is written, too late
+            # for a table of contents
+            page_variables["Toc"] = ""
+            with timer.stage("stream"):
+                template.render(dest_file.write, page_variables, *hooks)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
-    dest_path.write_text(template)
+    info = _page_info(title, None, timer, started, hooks, used)
+    info["bytes"] = tmp_path.stat().st_size
+    info["status"] = replace_if_changed(tmp_path, dest_path)
+    return info
 
-def copy_directory_recursive(src, dst) -> None:
-    if not os.path.exists(dst):
-        os.mkdir(dst)
+def copy_directory_recursive(src, dst, previous=None, changes=None, hashes=None) -> dict:
+    # files whose size and mtime already match are skipped and the rest are
+    # hard linked (or copied) in parallel; see sync.sync_directory
+    return sync_directory(src, dst, previous, changes=changes, hashes=hashes)
 
-    for f in os.listdir(src):
-        new_f = os.path.join(dst, f)
-        old_path = os.path.join(src, f)
+def discover_pages(from_path, dest_path) -> list[tuple[Path, Path]]:
+    # sorted so the page order, and therefore the build output, never
+    # depends on the order the filesystem happens to list entries in
+    pages = []
 
-        if os.path.isdir(old_path):
-            copy_directory_recursive(old_path, new_f)
+    for f in sorted(Path(from_path).iterdir()):
+        new_f = Path(dest_path) / f.name
+        if f.is_dir():
+            pages.extend(discover_pages(f, new_f))
+        elif f.suffix.lower() == ".md":
+            pages.append((f, new_f.with_suffix(".html")))
         else:
-            print(f"Copying {f} to {new_f}")
-            shutil.copy(old_path, new_f)
+            logger.debug("Ignoring %s", f)
+
+    return pages
+
+# options of the pages the render stage of this process renders; they are
+# sent to each worker process once rather than with every page
+_render_options = {}
+# whether the render stage runs in the process that writes the pages, and
+# can hand them to the writers as SpooledPages instead of whole strings
+_render_in_process = False
+
+def _init_render_worker(level, options, in_process=False):
+    global _render_in_process
+    if level is not None:
+        configure_worker_logging(level)
+    _render_options.clear()
+    _render_options.update(options)
+    _render_in_process = in_process
+
+def _page_error(e) -> str:
+    return f"{type(e).__name__}: {e}"
+
+def _read_pages_job(batch):
+    # reader thread; pages above the stream threshold are left to the render
+    # stage, which streams them instead of holding them in memory
+    read = []
+    for from_path, _, _, _, threshold in batch:
+        try:
+            if os.path.getsize(from_path) > threshold:
+                read.append((None, None, 0.0))
+                continue
+            start = time.perf_counter()
+            read.append((None, read_markdown(from_path), time.perf_counter() - start))
+        except Exception as e:
+            read.append((_page_error(e), None, 0.0))
+    return read
+
+def _render_pages_job(batch, read):
+    # render stage, inside a worker process for jobs > 1; returns an
+    # (error, page, info) triple per page, the page as write_page takes it
+    rendered = []
+    for (from_path, template_path, dest_path, basepath, threshold), (error, markdown, seconds) in zip(
+        batch, read
+    ):
+        try:
+            if error is not None:
+                rendered.append((error, None, None))
+                continue
+            if markdown is None:
+                info = generate_page(
+                    from_path, template_path, dest_path, basepath, stream_threshold=threshold,
+                    **_render_options,
+                )
+                rendered.append((None, None, info))
+                continue
+
+            if _render_in_process:
+                page, info = render_spooled_page(
+                    markdown, template_path, dest_path, basepath, **_render_options
+                )
+            else:
+                # joined once, to be pickled back to the writer
+                chunks = []
+                info = render_page(markdown, template_path, basepath, chunks.append, **_render_options)
+                page = "".join(chunks)
+            if info["timings"] is not None:
+                info["timings"]["read"] = seconds
+            rendered.append((None, page, info))
+        except Exception as e:
+            rendered.append((_page_error(e), None, None))
+    return rendered
 
-def generate_pages_recursive(from_path, template_path, dest_path, basepath):
+def _write_pages_job(batch, rendered):
+    # writer thread; returns an (error, page info) pair per page
+    written = []
+    for job, (error, page, info) in zip(batch, rendered):
+        if error is None and page is not None:
+            try:
+                start = time.perf_counter()
+                info["bytes"], info["status"] = write_page(job[2], page)
+                _add_timing(info, "write", start)
+                info["duration"] = time.time() - info["started"]
+            except Exception as e:
+                error, info = _page_error(e), None
+                if isinstance(page, SpooledPage):
+                    page.discard()
+        written.append((error, info))
+    return written
+
+def render_pages(pages, template_path, basepath, jobs=1, **options) -> list:
+    # Returns an (error, page info) pair per page, in the order given, with
+    # a failed page's error as a string so one broken page can't hide the
+    # results of the others. options are passed through to generate_page.
+    # Markdown is read ahead and pages are written behind in threads while
+    # pages render (see pipeline.run_pipeline), in one worker thread or in
+    # jobs worker processes. Pages go through the stages in small batches,
+    # which keeps the cost of handing them to worker processes down.
+    threshold = options.pop("stream_threshold", STREAM_THRESHOLD)
+    job_args = [(src, template_path, dest, basepath, threshold) for src, dest in pages]
+    size = min(PIPELINE_BATCH, max(1, len(job_args) // (jobs * 4)))
+    batches = [job_args[index:index + size] for index in range(0, len(job_args), size)]
+
+    if jobs > 1 and len(job_args) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_render_worker,
+            initargs=(logger.getEffectiveLevel(), options),
+        )
+    else:
+        _init_render_worker(None, options, in_process=True)
+        executor = ThreadPoolExecutor(1, "render")
+
+    with executor:
+        results = run_pipeline(
+            batches, _read_pages_job, _render_pages_job, _write_pages_job, executor,
+            IO_THREADS, IO_THREADS, max(PIPELINE_DEPTH, jobs * 2),
+        )
+
+    pairs = []
+    for batch, (error, written) in zip(batches, results):
+        # an error here is one the stage could not pin on a single page,
+        # such as a worker process dying
+        pairs.extend(written if error is None else [(error, None)] * len(batch))
+    return pairs
+
+def record_page(
+    manifest, graph, src, page_dest, inputs, template_path, title, assets=(), images=()
+) -> None:
+    if manifest is not None:
+        manifest.record(src, page_dest, inputs)
+    if graph is not None:
+        graph.record(
+            page_dest,
+            [
+                src, template_path, OPTIONS_KEY,
+                *(asset_key(url) for url in assets), *(image_key(url) for url in images),
+            ],
+        )
+        # pages that list this one depend on its title, not on its file
+        graph.set_value(title_key(src), title)
+
+def forget_page(manifest, graph, src) -> str | None:
+    # returns the output of a deleted source, if it was ever built
+    dest = manifest.forget(src)
+    if graph is not None:
+        graph.forget_value(title_key(src))
+        if dest is not None:
+            graph.forget(dest)
+    return dest
+
+def known_title(graph, src) -> str:
+    # the title recorded when the page was last built, so unchanged pages
+    # don't have to be read again
+    title = graph.values.get(title_key(src)) if graph is not None else None
+    if title is None:
+        with open(src) as f:
+            title = extract_title(f.readline())
+    return title
+
+def generate_pages_recursive(
+    from_path, template_path, dest_path, basepath, manifest=None, jobs=1, report=None,
+    graph=None, site_index=None, changes=None, **options
+):
+    # site_index, when given, is a SiteIndex that receives an entry for every
+    # page that is up to date after this pass, whether or not it was rebuilt;
+    # changes, an outputs.ChangeSet, likewise records every page
 
     from_path = Path(from_path)
     template_path = Path(template_path)
@@ -71,37 +497,900 @@ def generate_pages_recursive(from_path, template_path, dest_path, basepath):
     if not dest_path.parent.exists():
         dest_path.parent.mkdir(parents=True, exist_ok=True)
 
-    for f in from_path.iterdir():
-        new_f = dest_path / f.name
-        if f.is_dir():
-            generate_pages_recursive(f, template_path, new_f, basepath)
+    pages = []
+    for src, page_dest in discover_pages(from_path, dest_path):
+        inputs = None
+        if manifest is not None:
+            inputs = manifest.page_inputs(src, template_path, basepath, options.get("variables"))
+            if manifest.is_current(src, page_dest, inputs) and (
+                graph is None or graph.is_current(page_dest)
+            ):
+                logger.debug("Skipping unchanged %s", src)
+                if changes is not None:
+                    changes.record(page_dest)
+                if site_index is not None:
+                    site_index.add(
+                        src,
+                        page_dest,
+                        known_title(graph, src),
+                        os.stat(src).st_mtime,
+                        os.path.getsize(page_dest),
+                    )
+                continue
+        pages.append((src, page_dest, inputs))
+
+    if report is not None:
+        options["profile"] = True
+
+    start = time.perf_counter()
+    results = render_pages(
+        [(src, page_dest) for src, page_dest, _ in pages],
+        template_path,
+        basepath,
+        jobs,
+        **options,
+    )
+    elapsed = time.perf_counter() - start
+
+    failed = []
+    cache_hits = cache_misses = 0
+    saved = 0
+    for (src, page_dest, inputs), (error, info) in zip(pages, results):
+        if error is not None:
+            logger.error("Error generating %s: %s", src, error)
+            log_event("page_failed", source=str(src), error=error)
+            failed.append(src)
+            continue
+
+        if events_enabled():
+            log_event("page_started", source=str(src), time=info["started"])
+            log_event(
+                "page_finished",
+                source=str(src),
+                dest=str(page_dest),
+                bytes=info["bytes"],
+                duration=round(info["duration"], 6),
+            )
+
+        saved += info["saved"]
+        if info["cache_hit"] is True:
+            cache_hits += 1
+        elif info["cache_hit"] is False:
+            cache_misses += 1
+
+        record_page(
+            manifest, graph, src, page_dest, inputs, template_path, info["title"], info["assets"],
+            info["images"],
+        )
+        if site_index is not None:
+            site_index.add(src, page_dest, info["title"], os.stat(src).st_mtime, info["bytes"])
+        if changes is not None:
+            changes.record(page_dest, info["status"])
+
+        if report is not None:
+            report.add_page(src, info["timings"])
+
+    generated = len(pages) - len(failed)
+    rate = generated / elapsed if elapsed > 0 else 0.0
+    logger.info("Generated %d pages in %.2fs (%.1f pages/sec)", generated, elapsed, rate)
+    unchanged = sum(1 for error, info in results if error is None and info["status"] is None)
+    if unchanged:
+        logger.info("%d of them came out unchanged and were not rewritten", unchanged)
+    if options.get("ast_cache") is not None:
+        logger.info("AST cache: %d hits, %d misses", cache_hits, cache_misses)
+    if options.get("minify"):
+        logger.info("Minifying saved %.1f KB", saved / 1024)
+        if report is not None:
+            report.bytes_saved += saved
+
+    return failed
+
+def load_site_index(manifest, graph, root) -> SiteIndex:
+    # rebuilds the index of a previous build from its manifest and graph
+    site_index = SiteIndex(root)
+    for src, entry in sorted(manifest.pages.items()):
+        if os.path.exists(src) and os.path.exists(entry["dest"]):
+            site_index.add(
+                src,
+                entry["dest"],
+                known_title(graph, src),
+                os.stat(src).st_mtime,
+                os.path.getsize(entry["dest"]),
+            )
+    return site_index
+
+def generate_section_index(
+    directory, site_index, template_path, dest, basepath, graph=None, variables=None, assets=None,
+    minify=False, changes=None,
+) -> None:
+    entries = site_index.section(directory)
+    title = Path(directory).name.replace("-", " ").title()
+
+    inputs = [template_path, OPTIONS_KEY, listing_key(directory)]
+    inputs.extend(title_key(entry.source) for entry in entries)
+    if graph is not None:
+        graph.set_value(listing_key(directory), [entry.source for entry in entries])
+
+    if graph is None or not graph.is_current(dest) or not dest.exists():
+        logger.debug("Generating section index %s", dest)
+        template = load_template(template_path, basepath, assets, minify)
+        used_assets = set(template.assets)
+        page_variables = {"Basepath": basepath, **(variables or {})}
+        page_variables["Title"] = title
+        page_variables["Content"] = section_node(title, entries)
+        page_variables["Toc"] = ""
+
+        chunks = []
+        template.render(
+            chunks.append,
+            page_variables,
+            url_rewriter(basepath, assets, used_assets),
+            minifier=Minifier() if minify else None,
+        )
+        status = write_if_changed(dest, "".join(chunks))
+        if changes is not None:
+            changes.record(dest, status)
+        if graph is not None:
+            graph.record(dest, inputs + [asset_key(url) for url in sorted(used_assets)])
+    elif changes is not None:
+        changes.record(dest)
+
+    mtime = max((entry.mtime for entry in entries), default=os.stat(directory).st_mtime)
+    site_index.add(directory, dest, title, mtime, os.path.getsize(dest))
+
+def generate_site_files(
+    site_index, from_path, template_path, dest_path, basepath, sections=SECTIONS,
+    site_url=None, graph=None, variables=None, assets=None, minify=False, changes=None,
+) -> None:
+    # Section index pages, sitemap.xml and the feed, all written from the
+    # site index gathered during the page pass and recorded in changes.
+    from_path = Path(from_path)
+    dest_path = Path(dest_path)
+
+    directories = [from_path / section for section in sections if (from_path / section).is_dir()]
+    feed_entries = sorted(
+        {entry for directory in directories for entry in site_index.section(directory)},
+        key=lambda entry: (-entry.mtime, entry.url),
+    )[:FEED_SIZE]
+
+    generated = set()
+    for directory in directories:
+        dest = dest_path / directory.relative_to(from_path) / "index.html"
+        if site_index.has_output(dest):
+            # content/ has its own index page for this section
+            continue
+        generate_section_index(
+            directory, site_index, template_path, dest, basepath, graph, variables, assets, minify,
+            changes,
+        )
+        generated.add(str(dest))
+
+    if graph is not None:
+        # section pages of sections that are gone
+        for output, inputs in list(graph.edges.items()):
+            if output not in generated and any(key.startswith(LISTING_PREFIX) for key in inputs):
+                graph.forget(output)
+                remove_stale_outputs([output], dest_path, changes)
+
+    if site_url is None:
+        return
+
+    base_url = site_url.rstrip("/") + basepath.rstrip("/")
+    home = site_index.pages.get(str(from_path / "index.md"))
+    status = write_sitemap(dest_path / SITEMAP_NAME, site_index.entries(), base_url)
+    if changes is not None:
+        changes.record(dest_path / SITEMAP_NAME, status)
+    status = write_feed(
+        dest_path / FEED_NAME,
+        feed_entries,
+        base_url,
+        home.title if home is not None else "Feed",
+        f"{base_url}/{FEED_NAME}",
+    )
+    if changes is not None:
+        changes.record(dest_path / FEED_NAME, status)
+    logger.info("Wrote %s and %s for %d pages", SITEMAP_NAME, FEED_NAME, len(site_index.pages))
+
+def remove_stale_outputs(outputs, root, changes=None) -> None:
+    root = Path(root).resolve()
+
+    for output in outputs:
+        output = Path(output)
+        if output.exists():
+            logger.info("Removing %s", output)
+            output.unlink()
+            if changes is not None:
+                changes.record(output, DELETED)
+
+        # clean up directories left empty by the removal, but never the root
+        parent = output.parent
+        while parent.resolve() != root and parent.exists() and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+def parse_variables(assignments) -> dict:
+    variables = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition("=")
+        if not sep or not name:
+            raise SystemExit(f"Bad --var {assignment!r}, expected NAME=VALUE")
+        variables[name] = value
+    return variables
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site")
+    add_build_arguments(parser)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep docs/ and only regenerate pages whose inputs changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages in N worker processes (0 uses every CPU)",
+    )
+    add_output_arguments(parser)
+    parser.add_argument(
+        "--shard",
+        metavar="K/N",
+        help="only render shard K of N of the pages, for main.py merge to combine",
+    )
+    parser.add_argument(
+        "--out",
+        metavar="DIR",
+        help="where --shard writes its pages and shard manifest (default: .cache/shard-K)",
+    )
+    parser.add_argument(
+        "--shard-timings",
+        default=SHARD_TIMINGS_PATH,
+        metavar="PATH",
+        help="page timings of an earlier merge to balance shards by; every shard needs the same file",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage and report where the time went",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="build_profile.json",
+        metavar="PATH",
+        help="where --profile writes its JSON report",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages to list",
+    )
+    return parser.parse_args(argv)
+
+def parse_merge_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="main.py merge", description="Combine the shards of a sharded build into docs/"
+    )
+    parser.add_argument("shards", nargs="+", metavar="DIR", help="output directory of a shard")
+    add_logging_arguments(parser)
+    add_site_arguments(parser)
+    add_output_arguments(parser)
+    parser.add_argument("--jobs", type=int, default=1, metavar="N")
+    return parser.parse_args(argv)
+
+def merge_main(argv):
+    args = parse_merge_args(argv)
+    setup_logging(args)
+    merge_shards(
+        args.shards, args.section or SECTIONS, args.site_url, args.compress,
+        args.jobs or os.cpu_count() or 1, args.changed_files,
+    )
+    flush_logs()
+
+def parse_serve_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="main.py serve", description="Build the site and serve docs/ locally"
+    )
+    add_build_arguments(parser)
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild changed pages and static files and live reload the browser",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="seconds between polls for changed files",
+    )
+    return parser.parse_args(argv)
+
+def add_logging_arguments(parser):
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-q", "--quiet", action="store_true", help="only report warnings and errors"
+    )
+    verbosity.add_argument(
+        "-v", "--verbose", action="store_true", help="report every page and file"
+    )
+    parser.add_argument(
+        "--event-log",
+        metavar="PATH",
+        help="append JSON lines build events (pages started/finished, bytes, durations)",
+    )
+
+def add_site_arguments(parser):
+    # options of the generated site files, shared by builds and merges
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="absolute URL the site is served from; enables sitemap.xml and feed.xml",
+    )
+    parser.add_argument(
+        "--section",
+        action="append",
+        metavar="DIR",
+        help="content directory that gets a generated index page (default: blog)",
+    )
+
+def add_output_arguments(parser):
+    # what is done with a finished docs/, for builds and merges
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write .gz (and, with the brotli module, .br) siblings of HTML/CSS/JS outputs",
+    )
+    parser.add_argument(
+        "--changed-files",
+        default=CHANGED_FILES_PATH,
+        metavar="PATH",
+        help="where to list the outputs the build added, modified or deleted (A/M/D<tab>path)",
+    )
+
+def add_build_arguments(parser):
+    parser.add_argument("basepath", nargs="?", default="/")
+    add_logging_arguments(parser)
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="set a {{ NAME }} template variable for every page",
+    )
+    add_site_arguments(parser)
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="write content-hashed copies of static files and point pages at them",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="minify pages as they are written (pre blocks are left alone)",
+    )
+    parser.add_argument(
+        "--srcset",
+        action="store_true",
+        help="write downscaled copies of static images for srcset (needs Pillow)",
+    )
+    parser.add_argument(
+        "--highlight",
+        action="store_true",
+        help="highlight fenced code that names its language (needs Pygments); "
+        "style it with the CSS of pygmentize -S default -f html -a .highlight",
+    )
+    parser.add_argument(
+        "--no-ast-cache",
+        action="store_true",
+        help="always parse markdown instead of reusing cached trees",
+    )
+    parser.add_argument(
+        "--ast-cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="evict least recently used parsed trees beyond this size",
+    )
+
+def setup_logging(args) -> None:
+    level = logging.INFO
+    if args.quiet:
+        level = logging.WARNING
+    elif args.verbose:
+        level = logging.DEBUG
+    configure_logging(level, args.event_log)
+
+def site_options(args) -> dict:
+    return {
+        "sections": args.section or SECTIONS,
+        "site_url": args.site_url,
+        "fingerprint": args.fingerprint,
+        "srcset": args.srcset,
+    }
+
+def page_options(args) -> dict:
+    options = {"variables": parse_variables(args.var), "minify": args.minify}
+    if not args.no_ast_cache:
+        options["ast_cache"] = ASTCache(AST_CACHE_DIR, args.ast_cache_size * 1024 * 1024)
+    if args.highlight:
+        if highlighting_available():
+            options["highlighter"] = Highlighter(HIGHLIGHT_CACHE_DIR)
         else:
-            if f.suffix.lower() == ".md":
-                generate_page(f, template_path, new_f.with_suffix(".html"), basepath)
-            else:
-                print(f"Ignoring {f}")
+            logger.warning("--highlight needs Pygments; code is left plain")
+    return options
+
+def set_build_options(
+    graph, basepath, variables, fingerprint, minify=False, highlight=False
+) -> None:
+    # every generated page depends on these through OPTIONS_KEY
+    graph.set_value(
+        OPTIONS_KEY,
+        {
+            "basepath": basepath,
+            "variables": variables or {},
+            "fingerprint": fingerprint,
+            "minify": minify,
+            "highlight": highlight,
+        },
+    )
+
+def _update_values(graph, prefix, table) -> list[str]:
+    # stores table[url] under prefix + url and returns the keys that changed
+    changed = [prefix + url for url, value in table.items() if graph.set_value(prefix + url, value)]
+    for key in list(graph.values):
+        if key.startswith(prefix) and key[len(prefix):] not in table:
+            graph.forget_value(key)
+            changed.append(key)
+    return changed
+
+def update_assets(manifest, graph, fingerprint, hashes, changes=None):
+    # Returns the AssetTable (None with fingerprinting off) and the graph keys
+    # of the assets whose fingerprinted URL changed or that were deleted.
+    if not fingerprint:
+        outputs = [os.path.join(OUTPUT_DIR, name) for name in sorted(manifest.assets)]
+        remove_stale_outputs(outputs, OUTPUT_DIR, changes)
+        manifest.assets = set()
+        return None, _update_values(graph, ASSET_PREFIX, {})
+
+    assets, manifest.assets = fingerprint_assets(
+        STATIC_DIR, OUTPUT_DIR, hashes, manifest.assets, changes=changes
+    )
+    return assets, _update_values(graph, ASSET_PREFIX, assets)
+
+def update_images(graph, hashes, srcset, jobs=1, changes=None):
+    # Returns the image table and the graph keys of the images whose
+    # dimensions or variants changed or that were deleted.
+    if srcset and not variants_available():
+        logger.warning("--srcset needs Pillow; writing width and height only")
+    cache = ImageCache.load(IMAGE_CACHE_PATH)
+    images = process_images(
+        STATIC_DIR, OUTPUT_DIR, hashes, cache, srcset and variants_available(), jobs, changes
+    )
+    cache.save()
+    return images, _update_values(graph, IMAGE_PREFIX, images)
+
+def update_static(manifest, graph, fingerprint, srcset, jobs=1, changes=None, sync=True):
+    # Syncing static/ into docs/ (unless the caller synced what changed
+    # itself), fingerprinted copies and image dimensions all need the
+    # content hashes of static/, which are loaded and saved once for them.
+    # Returns the options for generate_page and the graph keys that changed.
+    hashes = AssetHashes.load(ASSET_HASHES_PATH)
+    if sync:
+        manifest.static = copy_directory_recursive(
+            STATIC_DIR, OUTPUT_DIR, manifest.static, changes, hashes
+        )
+    assets, changed_assets = update_assets(manifest, graph, fingerprint, hashes, changes)
+    images, changed_images = update_images(graph, hashes, srcset, jobs, changes)
+    hashes.save()
+
+    options = {"images": images}
+    if assets is not None:
+        options["assets"] = assets
+    return options, changed_assets + changed_images
 
-def main():
-    if len(sys.argv) == 2:
-        basepath = sys.argv[1]
+def compress_outputs(compress, jobs=1, report=None, changes=None) -> None:
+    # pre-compressed .gz/.br siblings of the text files in docs/
+    state = CompressionState.load(COMPRESSION_STATE_PATH)
+    if not compress:
+        if state.entries:
+            remove_compressed(OUTPUT_DIR, state, changes)
+            state.save()
+        return
+
+    start = time.perf_counter()
+    stats = compress_directory(OUTPUT_DIR, state, max_workers=jobs, changes=changes)
+    state.save()
+    if report is not None:
+        report.add("compress", time.perf_counter() - start)
+        report.compression = stats
+
+    logger.info(
+        "Compressed %d of %d files, %.1f KB to %s",
+        stats["compressed"], stats["files"], stats["bytes"] / 1024, format_ratios(stats),
+    )
+
+def fresh_manifest() -> BuildManifest:
+    # No pages, but the static files of the last build and their hashes, so
+    # static files that didn't change aren't reported as changed
+    previous = BuildManifest.load(MANIFEST_PATH)
+    return BuildManifest(MANIFEST_PATH, static=previous.static, assets=previous.assets)
+
+def build_site(
+    basepath, incremental=False, jobs=1, report=None, sections=SECTIONS, site_url=None,
+    fingerprint=False, srcset=False, compress=False, changed_files=CHANGED_FILES_PATH, **options
+) -> list:
+    # options are passed through to generate_page for every page; report,
+    # when given, is a BuildProfile that collects stage timings. The outputs
+    # the build added, modified or deleted are listed in changed_files.
+    build_start = time.perf_counter()
+    log_event("build_started", basepath=basepath, incremental=incremental, jobs=jobs)
+
+    changes = ChangeSet(OUTPUT_DIR)
+    if incremental:
+        manifest = BuildManifest.load(MANIFEST_PATH)
+        graph = DependencyGraph.load(DEPGRAPH_PATH)
     else:
-        basepath = "/"
+        # A full build starts from a manifest without pages so every page
+        # is rebuilt. docs/ is kept: pages that come out the same are not
+        # rewritten, and whatever the build didn't produce is removed at
+        # the end.
+        manifest = fresh_manifest()
+        graph = DependencyGraph(DEPGRAPH_PATH)
+
+    start = time.perf_counter()
+    static_options, _ = update_static(manifest, graph, fingerprint, srcset, jobs, changes)
+    options.update(static_options)
+    if report is not None:
+        report.add("static sync", time.perf_counter() - start)
+    set_build_options(
+        graph, basepath, options.get("variables"), fingerprint, options.get("minify", False),
+        options.get("highlighter") is not None,
+    )
+
+    site_index = SiteIndex(OUTPUT_DIR)
+    failed = generate_pages_recursive(
+        CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, basepath, manifest, jobs, report, graph,
+        site_index, changes, **options
+    )
+    removed = [forget_page(manifest, graph, src) for src, _ in manifest.missing()]
+    remove_stale_outputs(removed, OUTPUT_DIR, changes)
+
+    start = time.perf_counter()
+    generate_site_files(
+        site_index, CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, basepath, sections, site_url,
+        graph, options.get("variables"), options.get("assets"), options.get("minify", False),
+        changes,
+    )
+    if report is not None:
+        report.add("site files", time.perf_counter() - start)
+    manifest.save()
+    graph.save()
+
+    if not incremental:
+        remove_unknown_outputs(changes, compress)
+    compress_outputs(compress, jobs, report, changes)
+    save_changes(changes, changed_files)
+
+    if options.get("ast_cache") is not None:
+        options["ast_cache"].prune()
+    if options.get("highlighter") is not None:
+        options["highlighter"].prune()
+
+    log_event(
+        "build_finished",
+        failed=len(failed),
+        duration=round(time.perf_counter() - build_start, 6),
+    )
+    return failed
+
+def remove_unknown_outputs(changes, compress) -> None:
+    # What a full build didn't produce is left over from older builds. The
+    # compressed siblings of outputs are kept for compress_outputs to reuse
+    # or remove.
+    suffixes = compressed_suffixes() if compress else ()
+    removed = changes.remove_unknown(suffixes)
+    if removed:
+        logger.info("Removed %d stale files from %s", len(removed), OUTPUT_DIR)
+
+def save_changes(changes, path) -> None:
+    changes.write(path)
+    counts = changes.counts()
+    logger.info(
+        "Outputs: %d added, %d modified, %d deleted, %d unchanged (listed in %s)",
+        counts[ADDED], counts[MODIFIED], counts[DELETED],
+        len(changes.outputs) - counts[ADDED] - counts[MODIFIED], path,
+    )
+
+def shard_options(basepath, fingerprint, srcset, options) -> dict:
+    # what every shard of one build must agree on
+    return {
+        "basepath": basepath,
+        "variables": options.get("variables") or {},
+        "fingerprint": fingerprint,
+        "srcset": srcset,
+        "minify": options.get("minify", False),
+        "highlight": options.get("highlighter") is not None,
+    }
+
+def check_shard_dir(out_dir) -> None:
+    # A shard directory is deleted before the shard is written, so it must
+    # be new, empty or an earlier shard, and not be, hold or sit inside the
+    # site or its sources, nor hold the checkout.
+    out_dir = Path(out_dir).resolve()
+    for protected in (OUTPUT_DIR, CONTENT_DIR, STATIC_DIR):
+        protected_dir = Path(protected).resolve()
+        if out_dir.is_relative_to(protected_dir) or protected_dir.is_relative_to(out_dir):
+            raise SystemExit(
+                f"Refusing to write a shard to {out_dir}, which would delete files in {protected}"
+            )
+    if Path.cwd().resolve().is_relative_to(out_dir):
+        raise SystemExit(f"Refusing to write a shard to {out_dir}, which holds the working directory")
+    if out_dir.exists() and not out_dir.is_dir():
+        raise SystemExit(f"Refusing to write a shard to {out_dir}, which is not a directory")
+    if out_dir.exists() and any(out_dir.iterdir()) and not (out_dir / SHARD_MANIFEST_NAME).exists():
+        raise SystemExit(
+            f"Refusing to write a shard to {out_dir}, which is neither empty nor an earlier shard"
+        )
+
+def build_shard(
+    shard, count, out_dir, basepath, jobs=1, fingerprint=False, srcset=False,
+    timings_path=SHARD_TIMINGS_PATH, **options
+) -> list:
+    # Renders shard of count shards of the pages into out_dir and writes its
+    # shard manifest there; merge_shards puts the shards back together. Static
+    # files are only hashed here, for the asset and image tables pages need,
+    # and are written by the merge. Nothing in .cache/ is written apart from
+    # the AST cache, so shards can run side by side in one checkout.
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    check_shard_dir(out_dir)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+
+    pages = discover_pages(CONTENT_DIR, out_dir)
+    sources = [str(src) for src, _ in pages]
+    mine = set(partition_sources(sources, count, load_timings(timings_path))[shard - 1])
+    pages = [(src, dest) for src, dest in pages if str(src) in mine]
+
+    hashes = AssetHashes.load(ASSET_HASHES_PATH)
+    if fingerprint:
+        options["assets"] = asset_table(STATIC_DIR, hashes)
+    options["images"] = process_images(
+        STATIC_DIR, None, hashes, ImageCache.load(IMAGE_CACHE_PATH), srcset and variants_available()
+    )
+
+    results = render_pages(pages, TEMPLATE_PATH, basepath, jobs, **options)
+    manifest = ShardManifest(
+        out_dir, shard, count, sources_digest(sources),
+        shard_options(basepath, fingerprint, srcset, options),
+    )
+    for (src, dest), (error, info) in zip(pages, results):
+        if error is not None:
+            logger.error("Error generating %s: %s", src, error)
+            manifest.failed.append(str(src))
+            continue
+        manifest.pages[str(src)] = {
+            "dest": dest.relative_to(out_dir).as_posix(),
+            "hash": hash_file(dest),
+            "title": info["title"],
+            "bytes": info["bytes"],
+            "seconds": round(info["duration"], 6),
+            "assets": info["assets"],
+            "images": info["images"],
+        }
+    manifest.save()
+
+    logger.info(
+        "Rendered shard %d/%d: %d of %d pages in %.2fs",
+        shard, count, len(manifest.pages), len(sources), time.perf_counter() - start,
+    )
+    if options.get("ast_cache") is not None:
+        options["ast_cache"].prune()
+    if options.get("highlighter") is not None:
+        options["highlighter"].prune()
+    return manifest.failed
+
+def merge_shards(
+    shard_dirs, sections=SECTIONS, site_url=None, compress=False, jobs=1,
+    changed_files=CHANGED_FILES_PATH,
+) -> None:
+    # Checks that the shards add up to the whole site and assembles docs/
+    # from them the way a full build would, manifest and dependency graph
+    # included, so incremental builds can pick up from the merged site. The
+    # page timings are kept to balance the next sharded build.
+    shards = [ShardManifest.load(shard_dir) for shard_dir in shard_dirs]
+    sources = [str(src) for src, _ in discover_pages(CONTENT_DIR, OUTPUT_DIR)]
+    problems = check_shards(shards, sources)
+    problems.extend(
+        f"{shard.root} is the output directory itself"
+        for shard in shards if shard.root.resolve() == Path(OUTPUT_DIR).resolve()
+    )
+    if problems:
+        raise SystemExit("Shards don't add up to the site:\n  " + "\n  ".join(problems))
+
+    options = shards[0].options
+    basepath = options["basepath"]
+    manifest = fresh_manifest()
+    graph = DependencyGraph(DEPGRAPH_PATH)
+    changes = ChangeSet(OUTPUT_DIR)
+
+    static_options, _ = update_static(
+        manifest, graph, options["fingerprint"], options["srcset"], jobs, changes
+    )
+    set_build_options(
+        graph, basepath, options["variables"], options["fingerprint"], options["minify"],
+        options.get("highlight", False),
+    )
+
+    site_index = SiteIndex(OUTPUT_DIR)
+    timings = {}
+    for shard in shards:
+        for src, entry in sorted(shard.pages.items()):
+            dest = Path(OUTPUT_DIR) / entry["dest"]
+            # compared rather than linked, so unchanged pages keep their mtime
+            changes.record(dest, write_if_changed(dest, (shard.root / entry["dest"]).read_bytes()))
+            inputs = manifest.page_inputs(src, TEMPLATE_PATH, basepath, options["variables"])
+            record_page(
+                manifest, graph, Path(src), dest, inputs, TEMPLATE_PATH, entry["title"],
+                entry["assets"], entry["images"],
+            )
+            site_index.add(Path(src), dest, entry["title"], os.stat(src).st_mtime, entry["bytes"])
+            timings[src] = entry["seconds"]
+
+    generate_site_files(
+        site_index, CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, basepath, sections, site_url,
+        graph, options["variables"], static_options.get("assets"), options["minify"], changes,
+    )
+    manifest.save()
+    graph.save()
+    save_timings(SHARD_TIMINGS_PATH, timings)
+    remove_unknown_outputs(changes, compress)
+    compress_outputs(compress, jobs, changes=changes)
+    save_changes(changes, changed_files)
+
+    logger.info("Merged %d shards into %s: %d pages", len(shards), OUTPUT_DIR, len(timings))
+
+def _is_within(path, directory) -> bool:
+    return Path(path).is_relative_to(directory)
+
+def rebuild_changes(
+    changed, removed, basepath, sections=SECTIONS, site_url=None, fingerprint=False,
+    srcset=False, **options
+) -> None:
+    # Called by the watcher with the source paths that changed since the
+    # last poll. Only the affected static files and pages are touched: the
+    # changed markdown files themselves plus every page the dependency graph
+    # says read one of the changed files, such as all pages for the template.
+    manifest = BuildManifest.load(MANIFEST_PATH)
+    graph = DependencyGraph.load(DEPGRAPH_PATH)
+
+    for path in sorted(removed):
+        if _is_within(path, STATIC_DIR):
+            name = os.path.relpath(path, STATIC_DIR)
+            manifest.static.pop(name, None)
+            remove_stale_outputs([os.path.join(OUTPUT_DIR, name)], OUTPUT_DIR)
+        elif _is_within(path, CONTENT_DIR):
+            dest = forget_page(manifest, graph, path)
+            if dest is not None:
+                remove_stale_outputs([dest], OUTPUT_DIR)
+
+    for path in sorted(changed):
+        if _is_within(path, STATIC_DIR):
+            name = os.path.relpath(path, STATIC_DIR)
+            dest = os.path.join(OUTPUT_DIR, name)
+            action = sync_file(path, dest)
+            if action != "skipped":
+                logger.info("%s %s to %s", action.capitalize(), path, dest)
+            # hash unknown, so the next build lists it as modified
+            manifest.static[name] = None
+
+    # pages pointing at an asset or image whose content changed need its new
+    # name or dimensions
+    static_options, changed_static = update_static(manifest, graph, fingerprint, srcset, sync=False)
+    options.update(static_options)
+    set_build_options(
+        graph, basepath, options.get("variables"), fingerprint, options.get("minify", False),
+        options.get("highlighter") is not None,
+    )
+
+    sources = {
+        path
+        for path in changed
+        if _is_within(path, CONTENT_DIR) and Path(path).suffix.lower() == ".md"
+    }
+    sources_by_dest = {entry["dest"]: source for source, entry in manifest.pages.items()}
+    for output in graph.dependents(changed | removed | set(changed_static)):
+        if output in sources_by_dest:
+            sources.add(sources_by_dest[output])
+
+    for path in sorted(sources):
+        dest = Path(OUTPUT_DIR) / Path(path).relative_to(CONTENT_DIR).with_suffix(".html")
+        inputs = manifest.page_inputs(path, TEMPLATE_PATH, basepath, options.get("variables"))
+        try:
+            info = generate_page(path, TEMPLATE_PATH, dest, basepath, **options)
+        except Exception as e:
+            logger.error("Error generating %s: %s: %s", path, type(e).__name__, e)
+            continue
+        record_page(
+            manifest, graph, path, dest, inputs, TEMPLATE_PATH, info["title"], info["assets"],
+            info["images"],
+        )
+
+    # section pages listing a changed title are regenerated, the rest stay
+    site_index = load_site_index(manifest, graph, OUTPUT_DIR)
+    generate_site_files(
+        site_index, CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, basepath, sections, site_url,
+        graph, options.get("variables"), options.get("assets"), options.get("minify", False),
+    )
+
+    manifest.save()
+    graph.save()
 
-    project_root = os.path.dirname(__file__)
+def serve_main(argv):
+    args = parse_serve_args(argv)
+    setup_logging(args)
+    options = {**site_options(args), **page_options(args)}
 
-    dest_path = "docs/index.html"
-    static_dest_dir = "docs"
-    static_dir = "static"
+    build_site(args.basepath, incremental=True, **options)
+    flush_logs()
 
-    if os.path.exists(dest_path):
-        shutil.rmtree(static_dest_dir)
+    watch_paths = None
+    if args.watch:
+        watch_paths = [CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH]
 
-    copy_directory_recursive(static_dir, static_dest_dir)
+    def on_change(changed, removed):
+        rebuild_changes(changed, removed, args.basepath, **options)
+        flush_logs()
+
+    serve(OUTPUT_DIR, args.port, watch_paths, on_change, args.interval)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] == "serve":
+        serve_main(argv[1:])
+        return
+    if argv and argv[0] == "merge":
+        merge_main(argv[1:])
+        return
+
+    args = parse_args(argv)
+    setup_logging(args)
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.shard:
+        try:
+            shard, count = parse_shard(args.shard)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        options = site_options(args)
+        out_dir = args.out or SHARD_OUT_DIR.format(shard)
+        failed = build_shard(
+            shard, count, out_dir, args.basepath, jobs, options["fingerprint"], options["srcset"],
+            args.shard_timings, **page_options(args)
+        )
+        flush_logs()
+        if failed:
+            raise SystemExit(f"{len(failed)} page(s) failed to generate")
+        return
+    report = BuildProfile() if args.profile else None
+    failed = build_site(
+        args.basepath, args.incremental, jobs, report, compress=args.compress,
+        changed_files=args.changed_files, **site_options(args), **page_options(args)
+    )
+    flush_logs()
 
-    from_path = "content"
-    template_path = "template.html"
+    if report is not None:
+        report.print_summary(args.profile_top)
+        report.write_json(args.profile_output, args.profile_top)
+        logger.info("Wrote %s", args.profile_output)
+        flush_logs()
 
-    generate_pages_recursive(from_path, template_path, static_dest_dir, basepath)
-#    generate_page(from_path, template_path, dest_path)
+    if failed:
+        raise SystemExit(f"{len(failed)} page(s) failed to generate")
 
-main()
+if __name__ == "__main__":
+    main()
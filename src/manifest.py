@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+from pathlib import Path
+
+MANIFEST_VERSION = 2
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, chunk_size=1 << 16) -> str:
+    # hash in chunks so large sources never have to sit in memory twice
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """On-disk record of what every generated page was built from.
+
+    Each entry is keyed by the markdown source path and stores the output
+    path plus the hashes of the inputs that went into it, so a later build
+    can tell which pages are already up to date.
+    """
+
+    def __init__(self, path, pages=None, static=None, assets=None):
+        self.path = Path(path)
+        self.pages = pages if pages is not None else {}
+        # relative path -> content hash (or None) of the files last synced
+        # from static/
+        self.static = dict(static or {})
+        # relative paths of the fingerprinted copies of static files
+        self.assets = set(assets or ())
+        self.seen = set()
+        self._template_hashes = {}
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+
+        return cls(path, data.get("pages", {}), data.get("static", {}), data.get("assets", []))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "pages": self.pages,
+            "static": self.static,
+            "assets": sorted(self.assets),
+        }
+
+        # write to a temporary file first so an interrupted build never
+        # leaves a half written manifest behind
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def template_hash(self, template_path) -> str:
+        key = str(template_path)
+        if key not in self._template_hashes:
+            self._template_hashes[key] = hash_file(template_path)
+        return self._template_hashes[key]
+
+    def page_inputs(self, source, template_path, basepath, variables=None) -> dict:
+        return {
+            "source_hash": hash_file(source),
+            "template_hash": self.template_hash(template_path),
+            "basepath": basepath,
+            "variables": variables or {},
+        }
+
+    def is_current(self, source, dest, inputs) -> bool:
+        key = str(source)
+        self.seen.add(key)
+
+        entry = self.pages.get(key)
+        if entry is None or entry["dest"] != str(dest):
+            return False
+
+        if not Path(dest).exists():
+            return False
+
+        return all(entry.get(name) == value for name, value in inputs.items())
+
+    def record(self, source, dest, inputs):
+        key = str(source)
+        self.seen.add(key)
+        self.pages[key] = {"dest": str(dest), **inputs}
+
+    def forget(self, source):
+        entry = self.pages.pop(str(source), None)
+        return None if entry is None else entry["dest"]
+
+    def missing(self) -> list[tuple[str, str]]:
+        # (source, dest) of every entry not visited during this build, which
+        # all belong to deleted sources
+        return [(key, self.pages[key]["dest"]) for key in sorted(set(self.pages) - self.seen)]
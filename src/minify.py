@@ -0,0 +1,74 @@
+import re
+
+# whitespace inside these elements is content and is never touched
+PRESERVE_PATTERN = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>", re.DOTALL | re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<[^<>]+>")
+ATTRIBUTE_PATTERN = re.compile(r'(\s[\w:-]+)="([^"]*)"')
+# attribute values that parse the same without quotes; a trailing slash is
+# kept quoted so href=/blog/> never reads as a self-closing tag
+UNQUOTED_VALUE_PATTERN = re.compile(r"[^\s\"'=<>`]*[^\s\"'=<>`/]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+VOID_TAG_PATTERN = re.compile(r"<(area|base|br|col|embed|hr|img|input|link|meta|source|track|wbr)\b([^<>]*?)\s*/>", re.IGNORECASE)
+
+
+def format_attribute(key, value) -> str:
+    if UNQUOTED_VALUE_PATTERN.fullmatch(value):
+        return f"{key}={value}"
+    return f'{key}="{value}"'
+
+
+def _minify_tag(match) -> str:
+    return ATTRIBUTE_PATTERN.sub(
+        lambda attribute: format_attribute(attribute.group(1), attribute.group(2)), match.group()
+    )
+
+
+def _collapse(text) -> str:
+    # Runs of whitespace with a line break between two tags (or a tag and
+    # the edge of the text) are indentation and go away; any other run
+    # becomes one space, which renders the same.
+    def replace(match):
+        if "\n" in match.group():
+            before = text[match.start() - 1] if match.start() else ""
+            after = text[match.end()] if match.end() < len(text) else ""
+            if before in (">", "") and after in ("<", ""):
+                return ""
+        return " "
+
+    text = WHITESPACE_PATTERN.sub(replace, text)
+    text = VOID_TAG_PATTERN.sub(r"<\1\2>", text)
+    return TAG_PATTERN.sub(_minify_tag, text)
+
+
+def minify_markup(text) -> str:
+    """Minify a fragment of HTML such as the static text of a template.
+
+    Indentation between tags is removed, other whitespace is collapsed,
+    attribute quotes are dropped where the value allows it and void tags
+    lose their trailing slash. pre, textarea, script and style elements
+    are copied unchanged.
+    """
+    parts = []
+    pos = 0
+    for match in PRESERVE_PATTERN.finditer(text):
+        parts.append(_collapse(text[pos:match.start()]))
+        parts.append(match.group())
+        pos = match.end()
+    parts.append(_collapse(text[pos:]))
+    return "".join(parts)
+
+
+class Minifier:
+    """Minify mode of the serializer, passed to write_html and render.
+
+    Node attributes are written through attribute(), and saved counts the
+    bytes minification took off the output so far.
+    """
+
+    def __init__(self):
+        self.saved = 0
+
+    def attribute(self, key, value) -> str:
+        pair = format_attribute(key, value)
+        self.saved += len(key) + len(value) + 3 - len(pair)
+        return pair
@@ -0,0 +1,237 @@
+import os
+import queue
+import threading
+
+from pathlib import Path
+
+# statuses of a changed output, as in git diff --name-status
+ADDED = "A"
+MODIFIED = "M"
+DELETED = "D"
+
+
+def _tmp_path(path) -> Path:
+    # unique per process and thread, since writer threads share a process
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _same_content(path, data) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except FileNotFoundError:
+        return False
+
+
+def _same_files(first, second, chunk_size=1 << 16) -> bool:
+    if os.path.getsize(first) != os.path.getsize(second):
+        return False
+    with open(first, "rb") as a, open(second, "rb") as b:
+        while True:
+            chunk = a.read(chunk_size)
+            if chunk != b.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+def write_if_changed(path, data) -> str | None:
+    """Write data (str or bytes) to path unless path already holds exactly it.
+
+    Returns ADDED or MODIFIED when the file was written and None when it
+    was left alone, mtime and all. Comparing costs a stat, plus a read when
+    the sizes match. The new content goes to a temporary file that replaces
+    path, so readers never see a partial file.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    path = Path(path)
+    existed = os.path.lexists(path)
+    if existed and _same_content(path, data):
+        return None
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return MODIFIED if existed else ADDED
+
+
+def replace_if_changed(tmp_path, path) -> str | None:
+    # write_if_changed for content already written to tmp_path, such as a
+    # streamed page; tmp_path is gone afterwards either way
+    path = Path(path)
+    existed = os.path.lexists(path)
+    if existed and _same_files(tmp_path, path):
+        os.unlink(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    return MODIFIED if existed else ADDED
+
+
+def temporary_path(path) -> Path:
+    # where to write content meant for replace_if_changed(tmp, path)
+    return _tmp_path(path)
+
+
+class SpooledPage:
+    """A page on its way from the thread rendering it to the one writing it.
+
+    Rendering calls write() with the page a piece at a time. Pieces are
+    kept in memory until they add up to chunk_size characters, which most
+    pages never do, so the renderer does no file I/O at all. A page that
+    grows past that is streamed to a temporary file beside path by a
+    thread of its own, fed through a queue of at most max_chunks chunks,
+    so however large the page, little of it is in memory at once. The
+    renderer calls close() when done, or discard() if rendering failed,
+    and then finish() puts the page in place, usually in a writer thread.
+    """
+
+    def __init__(self, path, chunk_size=256 * 1024, max_chunks=4):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self._parts = []
+        self._size = 0
+        # set once the page outgrows one chunk
+        self._queue = None
+        self._thread = None
+        self._tmp_path = None
+        self._error = None
+        self._closed = False
+
+    def write(self, text) -> None:
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._queue is None:
+            self._queue = queue.Queue(self.max_chunks)
+            self._tmp_path = _tmp_path(self.path)
+            self._thread = threading.Thread(target=self._drain, name="page-spool", daemon=True)
+            self._thread.start()
+        self._queue.put("".join(self._parts))
+        self._parts = []
+        self._size = 0
+
+    def _drain(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._tmp_path, "w") as f:
+                while (chunk := self._queue.get()) is not None:
+                    f.write(chunk)
+        except BaseException as e:
+            self._error = e
+            # keep taking chunks so the renderer never blocks on a full queue
+            while self._queue.get() is not None:
+                pass
+
+    def close(self) -> None:
+        if self._queue is not None and not self._closed:
+            if self._parts:
+                self._flush()
+            self._queue.put(None)
+        self._closed = True
+
+    def discard(self) -> None:
+        self.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._tmp_path.unlink(missing_ok=True)
+        self._parts = []
+
+    def finish(self) -> tuple[int, str | None]:
+        # Returns the size of the page in bytes and its write_if_changed
+        # status
+        if self._queue is None:
+            data = "".join(self._parts).encode()
+            self._parts = []
+            return len(data), write_if_changed(self.path, data)
+
+        self._thread.join()
+        if self._error is not None:
+            self._tmp_path.unlink(missing_ok=True)
+            raise self._error
+        return os.path.getsize(self._tmp_path), replace_if_changed(self._tmp_path, self.path)
+
+
+class ChangeSet:
+    """Every output of one build under root, and which of them changed.
+
+    Whatever writes or keeps an output records it: status None for an
+    output left as it was, or ADDED, MODIFIED or DELETED. write() saves the
+    changes as "STATUS<tab>path" lines, the list a deploy script needs to
+    upload only what changed. Recording is thread safe.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        # relative paths of everything this build produced
+        self.outputs = set()
+        # relative path -> status, for outputs that changed
+        self.changes = {}
+        self._lock = threading.Lock()
+
+    def _name(self, path) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def record(self, path, status=None) -> None:
+        name = self._name(path)
+        with self._lock:
+            if status == DELETED:
+                self.outputs.discard(name)
+                if self.changes.get(name) == ADDED:
+                    # added and removed again within the build
+                    del self.changes[name]
+                    return
+            else:
+                self.outputs.add(name)
+            if status is not None:
+                self.changes[name] = status
+
+    def remove_unknown(self, sibling_suffixes=()) -> list[str]:
+        # Deletes every file under root that no producer recorded, for full
+        # builds, which must leave nothing of older builds behind. Files
+        # named like an output plus one of sibling_suffixes are kept.
+        # Returns the deleted relative paths.
+        removed = []
+        for dirpath, _, filenames in os.walk(self.root, topdown=False):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = self._name(path)
+                if name in self.outputs or any(
+                    name.endswith(suffix) and name[: -len(suffix)] in self.outputs
+                    for suffix in sibling_suffixes
+                ):
+                    continue
+                os.unlink(path)
+                self.record(path, DELETED)
+                removed.append(name)
+            if dirpath != str(self.root) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        return removed
+
+    def counts(self) -> dict:
+        counts = {ADDED: 0, MODIFIED: 0, DELETED: 0}
+        for status in self.changes.values():
+            counts[status] += 1
+        return counts
+
+    def write(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(
+            "".join(f"{status}\t{name}\n" for name, status in sorted(self.changes.items()))
+        )
+        os.replace(tmp_path, path)
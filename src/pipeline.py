@@ -0,0 +1,74 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _error(exc) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def run_pipeline(jobs, read, render, write, executor, readers=4, writers=4, max_pending=32) -> list:
+    """Run every job through read, render and write with the stages overlapped.
+
+    read(job) runs in a pool of reader threads, render(job, data) is
+    submitted to executor (a process pool for CPU bound rendering) and
+    write(job, rendered) runs in a pool of writer threads, so disk reads
+    and writes of some jobs happen while others render. A job holds one of
+    max_pending slots from the start of its read to the end of its write;
+    once all slots are taken no more reads start, which caps the memory
+    spent on read and rendered data however far one stage falls behind.
+
+    Returns an (error, result of write) pair per job, in the order given,
+    with error None or a "Type: message" string from the stage that failed.
+    """
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    slots = threading.BoundedSemaphore(max_pending)
+    finished = threading.Condition()
+    remaining = len(jobs)
+
+    def finish(index, error, result=None):
+        nonlocal remaining
+        results[index] = (error, result)
+        slots.release()
+        with finished:
+            remaining -= 1
+            finished.notify()
+
+    with ThreadPoolExecutor(readers, "read") as read_pool, ThreadPoolExecutor(writers, "write") as write_pool:
+
+        def on_write(index, future):
+            if future.exception() is not None:
+                finish(index, _error(future.exception()))
+            else:
+                finish(index, None, future.result())
+
+        def on_render(index, job, future):
+            if future.exception() is not None:
+                finish(index, _error(future.exception()))
+                return
+            write_pool.submit(write, job, future.result()).add_done_callback(
+                lambda write_future: on_write(index, write_future)
+            )
+
+        def on_read(index, job, future):
+            if future.exception() is not None:
+                finish(index, _error(future.exception()))
+                return
+            try:
+                render_future = executor.submit(render, job, future.result())
+            except Exception as e:
+                finish(index, _error(e))
+                return
+            render_future.add_done_callback(lambda render_future: on_render(index, job, render_future))
+
+        for index, job in enumerate(jobs):
+            slots.acquire()
+            read_pool.submit(read, job).add_done_callback(
+                lambda future, index=index, job=job: on_read(index, job, future)
+            )
+
+        with finished:
+            finished.wait_for(lambda: remaining == 0)
+
+    return results
@@ -0,0 +1,111 @@
+import json
+import time
+
+from contextlib import contextmanager
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTimer:
+    """Stand-in used when profiling is off; every stage is a shared no-op."""
+
+    timings = None
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+
+NULL_TIMER = NullTimer()
+
+
+class StageTimer:
+    """Accumulates wall time per named stage for a single page."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class BuildProfile:
+    """Aggregates per-stage and per-page timings across a whole build."""
+
+    def __init__(self):
+        self.stages = {}
+        self.pages = {}
+        # compress.compress_directory stats, when the build compressed output
+        self.compression = None
+        # bytes minifying took off the generated pages
+        self.bytes_saved = 0
+
+    def add(self, stage, seconds, count=1):
+        total, calls = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (total + seconds, calls + count)
+
+    def add_page(self, page, timings):
+        for stage, seconds in timings.items():
+            self.add(stage, seconds)
+        self.pages[str(page)] = timings
+
+    def slowest_pages(self, count):
+        return sorted(self.pages.items(), key=lambda item: -sum(item[1].values()))[:count]
+
+    def print_summary(self, top=10):
+        total = sum(seconds for seconds, _ in self.stages.values())
+        print(f"{'stage':<14} {'total':>10} {'share':>7} {'calls':>8} {'mean':>10}")
+        for stage, (seconds, calls) in sorted(self.stages.items(), key=lambda item: -item[1][0]):
+            share = seconds / total if total else 0.0
+            print(
+                f"{stage:<14} {seconds * 1000:>8.1f}ms {share:>7.1%} "
+                f"{calls:>8} {seconds / calls * 1000:>8.3f}ms"
+            )
+
+        if self.pages:
+            print(f"Slowest {min(top, len(self.pages))} of {len(self.pages)} pages:")
+            for page, timings in self.slowest_pages(top):
+                stages = ", ".join(
+                    f"{stage} {seconds * 1000:.1f}ms"
+                    for stage, seconds in sorted(timings.items(), key=lambda item: -item[1])
+                )
+                print(f"{sum(timings.values()) * 1000:>9.1f}ms  {page}  ({stages})")
+
+        if self.bytes_saved:
+            print(f"Minifying saved {self.bytes_saved / 1024:.1f} KB")
+
+        if self.compression:
+            print(f"Compression of {self.compression['bytes'] / 1024:.1f} KB in {self.compression['files']} files:")
+            for fmt, size in self.compression["formats"].items():
+                ratio = size / self.compression["bytes"] if self.compression["bytes"] else 1.0
+                print(f"{fmt:<14} {size / 1024:>8.1f}KB {ratio:>7.1%}")
+
+    def to_json(self, top=10) -> dict:
+        return {
+            "stages": {
+                stage: {"seconds": seconds, "calls": calls}
+                for stage, (seconds, calls) in self.stages.items()
+            },
+            "pages": {page: sum(timings.values()) for page, timings in sorted(self.pages.items())},
+            "slowest": [
+                {"page": page, "seconds": sum(timings.values()), "stages": timings}
+                for page, timings in self.slowest_pages(top)
+            ],
+            "compression": self.compression,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def write_json(self, path, top=10):
+        with open(path, "w") as f:
+            json.dump(self.to_json(top), f, indent=2)
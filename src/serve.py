@@ -0,0 +1,173 @@
+import os
+import re
+import threading
+import time
+
+from assets import FINGERPRINT_LENGTH, IMMUTABLE_CACHE_CONTROL
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from log import flush_logs, logger
+
+FINGERPRINTED_PATH = re.compile(r"\.[0-9a-f]{%d}\.[^./]+$" % FINGERPRINT_LENGTH)
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = """<script>
+new EventSource("%s?v=%d").onmessage = function () { location.reload(); };
+</script>"""
+
+
+class ReloadNotifier:
+    """Build version counter that browsers wait on for live reload."""
+
+    def __init__(self):
+        self.version = 0
+        self._condition = threading.Condition()
+
+    def bump(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    notifier = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        # fingerprinted names change whenever their content does, so they
+        # can be cached for good, the way a CDN in front of docs/ would
+        if code == 200 and FINGERPRINTED_PATH.search(self.path.split("?", 1)[0]):
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == LIVE_RELOAD_PATH:
+            self._stream_reloads()
+            return
+
+        file_path = self.translate_path(self.path)
+        if os.path.isdir(file_path) and path.endswith("/"):
+            file_path = os.path.join(file_path, "index.html")
+
+        if self.notifier is None or not file_path.endswith(".html") or not os.path.isfile(file_path):
+            super().do_GET()
+            return
+
+        with open(file_path, "rb") as f:
+            body = f.read()
+
+        # the script is only added to responses, the files on disk stay clean
+        script = (LIVE_RELOAD_SCRIPT % (LIVE_RELOAD_PATH, self.notifier.version)).encode()
+        head, sep, tail = body.rpartition(b"</body>")
+        body = head + script + sep + tail if sep else body + script
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_reloads(self):
+        query = self.path.partition("?")[2]
+        try:
+            version = int(query.partition("v=")[2] or self.notifier.version)
+        except ValueError:
+            version = self.notifier.version
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        try:
+            while True:
+                current = self.notifier.wait(version, timeout=15)
+                if current != version:
+                    self.wfile.write(b"data: reload\n\n")
+                    self.wfile.flush()
+                    return
+                # keep idle connections from being dropped by the browser
+                self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def snapshot(paths) -> dict:
+    # path -> (mtime, size) for every file under the watched paths
+    files = {}
+    for root in paths:
+        if os.path.isfile(root):
+            stat = os.stat(root)
+            files[root] = (stat.st_mtime_ns, stat.st_size)
+            continue
+
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def diff_snapshots(old, new):
+    changed = {path for path, signature in new.items() if old.get(path) != signature}
+    removed = set(old) - set(new)
+    return changed, removed
+
+
+def serve(directory, port, watch_paths=None, on_change=None, interval=0.5):
+    """Serve directory over HTTP, rebuilding and reloading on source changes.
+
+    When watch_paths is given they are polled every interval seconds and
+    on_change(changed, removed) is called with the sets of paths that were
+    modified or deleted, after which connected browsers reload.
+    """
+    notifier = ReloadNotifier() if watch_paths else None
+
+    class Handler(LiveReloadHandler):
+        pass
+
+    Handler.notifier = notifier
+
+    def handler(*args, **kwargs):
+        return Handler(*args, directory=directory, **kwargs)
+
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Serving %s at http://localhost:%d/", directory, port)
+    flush_logs()
+
+    try:
+        if not watch_paths:
+            thread.join()
+            return
+
+        logger.info("Watching %s for changes", ", ".join(watch_paths))
+        flush_logs()
+        files = snapshot(watch_paths)
+        while True:
+            time.sleep(interval)
+            current = snapshot(watch_paths)
+            changed, removed = diff_snapshots(files, current)
+            files = current
+            if changed or removed:
+                on_change(changed, removed)
+                notifier.bump()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from manifest import hash_file
+
+SHARD_VERSION = 1
+SHARD_MANIFEST_NAME = "shard.json"
+
+
+def parse_shard(text) -> tuple[int, int]:
+    # "2/4" -> (2, 4); shards are numbered from 1
+    index, sep, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Bad shard {text!r}, expected K/N") from None
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Bad shard {text!r}, expected K/N with 1 <= K <= N")
+    return index, count
+
+
+def sources_digest(sources) -> str:
+    # identifies the set of sources a shard was partitioned from
+    return hashlib.sha256("\n".join(sorted(str(source) for source in sources)).encode()).hexdigest()
+
+
+def _hash_shard(source, count) -> int:
+    digest = hashlib.sha256(str(source).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def partition_sources(sources, count, timings=None) -> list[list[str]]:
+    """Split sources into count shards, the same way on every machine.
+
+    Without timings every source goes to the shard its path hashes to.
+    With the seconds each source took in an earlier build, the shards are
+    balanced by greedy bin packing, slowest source first. Sources missing
+    from timings are estimated from their size at the average rate of the
+    timed ones. Every shard must be given the same timings.
+    """
+    sources = sorted(str(source) for source in sources)
+    shards = [[] for _ in range(count)]
+    if not timings:
+        for source in sources:
+            shards[_hash_shard(source, count)].append(source)
+        return shards
+
+    sizes = {source: os.path.getsize(source) for source in sources}
+    timed = [source for source in sources if source in timings]
+    timed_bytes = sum(sizes[source] for source in timed)
+    rate = sum(timings[source] for source in timed) / timed_bytes if timed_bytes else 1.0
+
+    def cost(source):
+        return timings[source] if source in timings else sizes[source] * rate
+
+    loads = [0.0] * count
+    for source in sorted(sources, key=lambda source: (-cost(source), source)):
+        shard = min(range(count), key=lambda index: (loads[index], index))
+        shards[shard].append(source)
+        loads[shard] += cost(source)
+    return [sorted(shard) for shard in shards]
+
+
+def load_timings(path) -> dict:
+    try:
+        data = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_timings(path, timings) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(timings, indent=1, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+class ShardManifest:
+    """What one shard of a sharded build rendered, written next to its output.
+
+    pages maps each source to its output path (relative to the shard's
+    output directory), the hash of that output and what the merge step
+    needs to index it: title, mtime, size, seconds and the asset and image
+    URLs it references.
+    """
+
+    def __init__(self, root, index, count, digest, options, pages=None, failed=None):
+        self.root = Path(root)
+        self.index = index
+        self.count = count
+        self.digest = digest
+        self.options = options
+        self.pages = pages if pages is not None else {}
+        self.failed = failed if failed is not None else []
+
+    @classmethod
+    def load(cls, root):
+        root = Path(root)
+        data = json.loads((root / SHARD_MANIFEST_NAME).read_text())
+        if data.get("version") != SHARD_VERSION:
+            raise ValueError(f"{root / SHARD_MANIFEST_NAME} has an unknown version")
+        return cls(
+            root, data["shard"], data["count"], data["sources"], data["options"],
+            data["pages"], data["failed"],
+        )
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": SHARD_VERSION,
+            "shard": self.index,
+            "count": self.count,
+            "sources": self.digest,
+            "options": self.options,
+            "pages": self.pages,
+            "failed": self.failed,
+        }
+        path = self.root / SHARD_MANIFEST_NAME
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        os.replace(tmp_path, path)
+
+
+def check_shards(shards, sources) -> list[str]:
+    """Return every reason the shards don't add up to a build of sources.
+
+    The shards must be numbered 1..N for one N, have been partitioned from
+    the same sources with the same options, cover every source exactly
+    once without failures, and still have the outputs they recorded.
+    """
+    problems = []
+    if not shards:
+        return ["no shards given"]
+
+    count = shards[0].count
+    indexes = sorted(shard.index for shard in shards)
+    if indexes != list(range(1, count + 1)):
+        problems.append(f"expected shards 1..{count}, got {indexes}")
+    for shard in shards:
+        if shard.count != count:
+            problems.append(f"{shard.root} is shard {shard.index}/{shard.count}, not of {count}")
+        if shard.options != shards[0].options:
+            problems.append(f"{shard.root} was built with different options")
+        if shard.digest != sources_digest(sources):
+            problems.append(f"{shard.root} was partitioned from different sources")
+        for source in shard.failed:
+            problems.append(f"{source} failed in {shard.root}")
+
+    owners = {}
+    for shard in shards:
+        for source, entry in shard.pages.items():
+            if source in owners:
+                problems.append(f"{source} is in both {owners[source]} and {shard.root}")
+            owners[source] = shard.root
+            path = shard.root / entry["dest"]
+            if not path.exists() or hash_file(path) != entry["hash"]:
+                problems.append(f"{path} is missing or changed")
+
+    failed = {source for shard in shards for source in shard.failed}
+    for source in sorted(set(map(str, sources)) - set(owners) - failed):
+        problems.append(f"{source} is in no shard")
+    return problems
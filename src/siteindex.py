@@ -0,0 +1,132 @@
+import datetime
+import os
+
+from typing import NamedTuple
+from xml.sax.saxutils import escape, quoteattr
+
+from htmlnode import LeafNode, ParentNode, leaf_node
+from outputs import replace_if_changed, temporary_path
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+
+
+class PageEntry(NamedTuple):
+    source: str
+    dest: str
+    # root relative, "/blog/tom/" for docs/blog/tom/index.html
+    url: str
+    title: str
+    # of the markdown source, as a unix timestamp
+    mtime: float
+    # of the generated page, in bytes
+    size: int
+
+
+def page_url(dest, root) -> str:
+    relative = os.path.relpath(dest, root).replace(os.sep, "/")
+    if relative == "index.html":
+        return "/"
+    if relative.endswith("/index.html"):
+        return "/" + relative[: -len("index.html")]
+    return "/" + relative
+
+
+class SiteIndex:
+    """Metadata of every generated page, collected during the page pass.
+
+    sitemap.xml, the feed and section index pages are all written from
+    here, so none of them needs another walk over content/ or docs/.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.pages = {}
+
+    def add(self, source, dest, title, mtime, size) -> PageEntry:
+        entry = PageEntry(str(source), str(dest), page_url(dest, self.root), title, mtime, size)
+        self.pages[entry.source] = entry
+        return entry
+
+    def entries(self) -> list[PageEntry]:
+        return sorted(self.pages.values(), key=lambda entry: entry.url)
+
+    def has_output(self, dest) -> bool:
+        dest = str(dest)
+        return any(entry.dest == dest for entry in self.pages.values())
+
+    def section(self, directory) -> list[PageEntry]:
+        # every page under directory, newest first
+        prefix = os.path.join(str(directory), "")
+        entries = [entry for entry in self.pages.values() if entry.source.startswith(prefix)]
+        return sorted(entries, key=lambda entry: (-entry.mtime, entry.url))
+
+
+def section_node(title, entries) -> ParentNode:
+    items = [
+        ParentNode("li", [LeafNode("a", entry.title, {"href": entry.url})])
+        for entry in entries
+    ]
+    return ParentNode("div", [ParentNode("h1", [leaf_node(None, title)]), ParentNode("ul", items)])
+
+
+def _iso_time(timestamp) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+def _replace_with(path, write_document) -> str | None:
+    # Streams write_document(f) to a file beside path, which then replaces
+    # path if it differs; returns the outputs.replace_if_changed status
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, "w") as f:
+            write_document(f)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return replace_if_changed(tmp_path, path)
+
+
+def write_sitemap(path, entries, base_url) -> str | None:
+    # base_url is the absolute URL of the site root, without a trailing
+    # slash; returns the outputs.replace_if_changed status
+    def write_document(f):
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<urlset xmlns="{SITEMAP_NAMESPACE}">\n')
+        for entry in entries:
+            f.write(
+                f"  <url><loc>{escape(base_url + entry.url)}</loc>"
+                f"<lastmod>{_iso_time(entry.mtime)[:10]}</lastmod></url>\n"
+            )
+        f.write("</urlset>\n")
+
+    return _replace_with(path, write_document)
+
+
+def write_feed(path, entries, base_url, title, feed_url) -> str | None:
+    # entries are written in the order given, newest first by convention;
+    # returns the outputs.replace_if_changed status
+    updated = max((entry.mtime for entry in entries), default=0)
+
+    def write_document(f):
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write(f'<feed xmlns="{ATOM_NAMESPACE}">\n')
+        f.write(f"  <title>{escape(title)}</title>\n")
+        f.write(f"  <author><name>{escape(title)}</name></author>\n")
+        f.write(f"  <id>{escape(base_url)}/</id>\n")
+        f.write(f"  <link href={quoteattr(base_url + '/')}/>\n")
+        f.write(f'  <link rel="self" href={quoteattr(feed_url)}/>\n')
+        f.write(f"  <updated>{_iso_time(updated)}</updated>\n")
+        for entry in entries:
+            url = base_url + entry.url
+            f.write("  <entry>\n")
+            f.write(f"    <title>{escape(entry.title)}</title>\n")
+            f.write(f"    <id>{escape(url)}</id>\n")
+            f.write(f"    <link href={quoteattr(url)}/>\n")
+            f.write(f"    <updated>{_iso_time(entry.mtime)}</updated>\n")
+            f.write("  </entry>\n")
+        f.write("</feed>\n")
+
+    return _replace_with(path, write_document)
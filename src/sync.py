@@ -0,0 +1,143 @@
+import os
+import shutil
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from log import logger
+from outputs import ADDED, DELETED, MODIFIED
+
+
+def _is_current(src_stat, dst) -> bool:
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+
+    return (
+        dst_stat.st_size == src_stat.st_size
+        and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+    )
+
+
+def _copy_file(src, dst) -> None:
+    # copy_file_range keeps the copy inside the kernel and lets filesystems
+    # that support it (btrfs, xfs) share extents instead of copying bytes
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+
+    shutil.copyfile(src, dst)
+
+
+def sync_file(src, dst, link=True) -> str:
+    """Make dst a copy of src unless it already matches by size and mtime.
+
+    Returns "skipped", "linked" or "copied". Hard links are tried first
+    since they cost no I/O at all; copies keep the source mtime so the
+    next sync can skip them.
+    """
+    src_stat = os.stat(src)
+    if _is_current(src_stat, dst):
+        return "skipped"
+
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    if os.path.lexists(dst):
+        os.unlink(dst)
+
+    if link:
+        try:
+            os.link(src, dst)
+            return "linked"
+        except OSError:
+            pass
+
+    _copy_file(src, dst)
+    shutil.copystat(src, dst)
+    return "copied"
+
+
+def remove_empty_parents(path, root) -> None:
+    root = os.path.abspath(root)
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent != root and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+def list_files(root) -> list[str]:
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            files.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(files)
+
+
+def sync_directory(
+    src, dst, previous=None, link=True, max_workers=None, changes=None, hashes=None
+) -> dict:
+    """Mirror every file under src into dst.
+
+    Returns the relative path of every file mapped to its content hash from
+    hashes (an assets.AssetHashes of src), or to None without hashes.
+    previous is what the last sync into dst returned; files in it that no
+    longer exist under src are deleted. Anything else already in dst, such
+    as generated pages, is left alone.
+
+    Every file, and whether it was added, modified or deleted, is recorded
+    in changes (an outputs.ChangeSet). A file counts as modified when its
+    hash differs from the one in previous, or either is unknown; dst can't
+    tell, since a hard linked dst still matches its source by size and
+    mtime right after the source was edited in place.
+    """
+    files = list_files(src)
+    previous = previous or {}
+
+    def sync_one(name):
+        dst_path = os.path.join(dst, name)
+        existed = changes is not None and os.path.lexists(dst_path)
+        action = sync_file(os.path.join(src, name), dst_path, link)
+        digest = hashes.get(src, name) if hashes is not None else None
+        if changes is not None:
+            if not existed:
+                status = ADDED
+            elif digest is None or previous.get(name) != digest:
+                status = MODIFIED
+            else:
+                status = None
+            changes.record(dst_path, status)
+        return action, digest
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(sync_one, files))
+
+    counts = {"linked": 0, "copied": 0, "skipped": 0, "removed": 0}
+    for name, (action, _) in zip(files, results):
+        counts[action] += 1
+        if action != "skipped":
+            logger.debug("%s %s to %s", action.capitalize(), name, os.path.join(dst, name))
+
+    for name in sorted(set(previous) - set(files)):
+        path = os.path.join(dst, name)
+        if os.path.lexists(path):
+            logger.debug("Removing %s", path)
+            os.unlink(path)
+            counts["removed"] += 1
+            if changes is not None:
+                changes.record(path, DELETED)
+        remove_empty_parents(path, dst)
+
+    logger.info(
+        "Synced %s to %s: %d linked, %d copied, %d unchanged, %d removed",
+        src, dst, counts["linked"], counts["copied"], counts["skipped"], counts["removed"],
+    )
+    return {name: digest for name, (_, digest) in zip(files, results)}
@@ -0,0 +1,140 @@
+import os
+import re
+
+from pathlib import Path
+from minify import minify_markup
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+URL_ATTRIBUTE_PATTERN = re.compile(r'\b(href|src)="([^"]*)"')
+
+
+def url_rewriter(basepath, assets=None, used=None):
+    """Return the function every href/src URL of a page is passed through.
+
+    Root relative URLs are first looked up in assets, a table of asset
+    paths to their fingerprinted paths, and then moved under the basepath.
+    The paths of assets that were looked up are added to used, when given.
+    Returns None when no URL would ever change.
+    """
+    if basepath == "/" and not assets:
+        return None
+
+    def rewrite_url(url):
+        # only root relative URLs move; "//host/..." is protocol relative
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+
+        if assets:
+            end = len(url)
+            for separator in "?#":
+                index = url.find(separator)
+                if index != -1 and index < end:
+                    end = index
+            fingerprinted = assets.get(url[:end])
+            if fingerprinted is not None:
+                if used is not None:
+                    used.add(url[:end])
+                url = fingerprinted + url[end:]
+
+        if basepath != "/":
+            url = basepath + url[1:]
+        return url
+
+    return rewrite_url
+
+
+class Template:
+    """A template parsed once into static text and named placeholder slots.
+
+    Placeholders look like ``{{ Name }}``. Rendering walks the parsed
+    segments and writes each one straight to the output, so the page is
+    never rebuilt with string replaces. href/src URLs in the template text
+    are rewritten (see url_rewriter) once, when the template is compiled;
+    URLs inside rendered nodes are rewritten as they are written. With
+    minify the static text is minified once as well (see minify_markup),
+    and saved is the number of bytes that took off every render.
+    """
+
+    def __init__(self, source, basepath="/", assets=None, minify=False):
+        self.basepath = basepath
+        self.minify = minify
+        self.saved = 0
+        self.rewrite_url = url_rewriter(basepath, assets)
+        # asset paths referenced by the template text itself
+        self.assets = set()
+        self.segments = []
+        self.slots = set()
+
+        rewrite_static = url_rewriter(basepath, assets, self.assets)
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > pos:
+                self._add_static(source[pos:match.start()], rewrite_static)
+            self.segments.append((match.group(1), match.group()))
+            self.slots.add(match.group(1))
+            pos = match.end()
+
+        if pos < len(source):
+            self._add_static(source[pos:], rewrite_static)
+
+    def _add_static(self, text, rewrite_url):
+        if rewrite_url is not None:
+            text = URL_ATTRIBUTE_PATTERN.sub(
+                lambda match: f'{match.group(1)}="{rewrite_url(match.group(2))}"', text
+            )
+        if self.minify:
+            minified = minify_markup(text)
+            self.saved += len(text.encode()) - len(minified.encode())
+            text = minified
+        self.segments.append((None, text))
+
+    def render(self, write, variables, rewrite_url=None, image_attributes=None, minifier=None):
+        # Values may be plain strings or nodes with write_html(); nodes are
+        # streamed rather than converted to a string first. Placeholders
+        # without a value are written back unchanged. rewrite_url replaces
+        # the template's own URL rewriter for the nodes of this render, and
+        # image_attributes and minifier are passed on to them.
+        rewrite_url = rewrite_url or self.rewrite_url
+        if minifier is not None:
+            minifier.saved += self.saved
+        for name, text in self.segments:
+            if name is None or name not in variables:
+                write(text)
+                continue
+
+            value = variables[name]
+            if hasattr(value, "write_html"):
+                value.write_html(write, rewrite_url, image_attributes, minifier)
+            else:
+                write(str(value))
+
+    def render_to_string(self, variables) -> str:
+        parts = []
+        self.render(parts.append, variables)
+        return "".join(parts)
+
+
+_template_cache = {}
+
+
+def load_template(path, basepath="/", assets=None, minify=False) -> Template:
+    # Compiled templates are cached per path, basepath, asset table and minify
+    # mode for the life of the process, so a build (or each worker in a pool) parses the
+    # template once. The cache entry is dropped as soon as the file's mtime or
+    # size changes.
+    path = Path(path)
+    stat = os.stat(path)
+    key = (str(path.resolve()), basepath, assets.digest if assets else None, minify)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with open(path, "r") as template_file:
+        template = Template(template_file.read(), basepath, assets, minify)
+
+    _template_cache[key] = (signature, template)
+    return template
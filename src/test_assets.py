@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from assets import AssetHashes, asset_table, fingerprint_assets, fingerprinted_name
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "tom.png").write_bytes(b"png")
+        self.docs = self.root / "docs"
+        self.hashes_path = self.root / "assets.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("images/tom.png", "3f9a1c2b77"), "images/tom.3f9a1c2b.png")
+        self.assertEqual(fingerprinted_name("LICENSE", "3f9a1c2b77"), "LICENSE.3f9a1c2b")
+
+    def test_fingerprint_assets(self):
+        hashes = AssetHashes(self.hashes_path)
+        table, written = fingerprint_assets(self.static, self.docs, hashes)
+
+        css = table["/index.css"]
+        self.assertRegex(css, r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertEqual((self.docs / css[1:]).read_text(), "body {}")
+        self.assertEqual(written, {css[1:], table["/images/tom.png"][1:]})
+
+        # a changed file gets a new name and its old copy is removed
+        (self.static / "index.css").write_text("body { margin: 0 }")
+        new_table, new_written = fingerprint_assets(self.static, self.docs, hashes, written)
+        self.assertNotEqual(new_table["/index.css"], css)
+        self.assertFalse((self.docs / css[1:]).exists())
+        self.assertEqual(new_table["/images/tom.png"], table["/images/tom.png"])
+
+    def test_hidden_and_extensionless_files_are_not_fingerprinted(self):
+        (self.static / ".DS_Store").write_bytes(b"junk")
+        (self.static / "images" / ".DS_Store").write_bytes(b"junk")
+        (self.static / ".well-known").mkdir()
+        (self.static / ".well-known" / "security.txt").write_text("Contact: tom")
+        (self.static / "LICENSE").write_text("MIT")
+
+        hashes = AssetHashes(self.hashes_path)
+        table, written = fingerprint_assets(self.static, self.docs, hashes)
+        self.assertEqual(sorted(table), ["/images/tom.png", "/index.css"])
+        self.assertEqual(len(written), 2)
+        self.assertEqual(sorted(os.listdir(self.docs)), ["images", table["/index.css"][1:]])
+        self.assertEqual(asset_table(self.static, hashes), table)
+
+    def test_hashes_are_cached_by_size_and_mtime(self):
+        hashes = AssetHashes(self.hashes_path)
+        fingerprint_assets(self.static, self.docs, hashes)
+        self.assertEqual(hashes.hashed, 2)
+        hashes.save()
+
+        reloaded = AssetHashes.load(self.hashes_path)
+        fingerprint_assets(self.static, self.docs, reloaded)
+        self.assertEqual(reloaded.hashed, 0)
+
+        stat = (self.static / "index.css").stat()
+        os.utime(self.static / "index.css", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        fingerprint_assets(self.static, self.docs, reloaded)
+        self.assertEqual(reloaded.hashed, 1)
+
+if __name__ == "__main__":
+    unittest.main()
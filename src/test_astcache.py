@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from astcache import ASTCache, data_to_node, node_to_data
+from blocktype import markdown_to_html_node
+
+MARKDOWN = """# Title
+
+Some **bold** text with a [link](/blog) and ![an image](/images/tom.png)
+
+![Block image](/images/rivendell.png)
+
+- one
+- two
+"""
+
+class TestASTCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp.name) / "ast"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        node = markdown_to_html_node("# Title\n\nSome **bold** text with a [link](/blog)\n\n- one\n- two")
+        self.assertEqual(data_to_node(node_to_data(node)).to_html(), node.to_html())
+
+    def test_get_hits_after_put(self):
+        cache = ASTCache(self.cache_dir)
+        self.assertIsNone(cache.get(MARKDOWN))
+        first = markdown_to_html_node(MARKDOWN)
+        cache.put(MARKDOWN, first)
+
+        second = ASTCache(self.cache_dir).get(MARKDOWN)
+        self.assertEqual(node_to_data(first), node_to_data(second))
+
+    def test_prune_evicts_least_recently_used(self):
+        cache = ASTCache(self.cache_dir)
+        for markdown in ("# Old\n\nold page", "# New\n\nnew page"):
+            cache.put(markdown, markdown_to_html_node(markdown))
+
+        old_path = cache._path("# Old\n\nold page")
+        os.utime(old_path, ns=(0, 0))
+        new_size = cache._path("# New\n\nnew page").stat().st_size
+
+        cache.max_bytes = new_size
+        self.assertEqual(cache.prune(), 1)
+        self.assertIsNone(cache.get("# Old\n\nold page"))
+        self.assertIsNotNone(cache.get("# New\n\nnew page"))
+
+if __name__ == "__main__":
+    unittest.main()
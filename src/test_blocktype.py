@@ -1,6 +1,9 @@
+import random
+import re
 import unittest
 
 from blocktype import *
+from minify import Minifier
 
 class TestBlockType(unittest.TestCase):
 
@@ -26,6 +29,89 @@ This is another paragraph with _italic_ text and `code` here
         expected_result = BlockType.CODE
 
         self.assertEqual(result, expected_result)
+    def test_block_types(self):
+        cases = {
+            "## Heading": BlockType.HEADING,
+            "####### not a heading": BlockType.PARAGRAPH,
+            "```\ncode\n```": BlockType.CODE,
+            "> one\n> two": BlockType.QUOTE,
+            "- one\n- two": BlockType.UNORDERED_LIST,
+            "1. one\n2. two\n3. three": BlockType.ORDERED_LIST,
+            "1. one\n3. three": BlockType.PARAGRAPH,
+            "10. ten": BlockType.PARAGRAPH,
+            "![alt](/image.png)": BlockType.IMAGE,
+            "![alt](/image.png)\ntext": BlockType.PARAGRAPH,
+            "": BlockType.PARAGRAPH,
+        }
+        for block, expected in cases.items():
+            self.assertEqual(block_to_block_type(block), expected, block)
+
+    def test_block_types_match_regex_classifier(self):
+        def regex_classifier(block):
+            if re.match(r'^#{1,6} ', block):
+                return BlockType.HEADING
+            if re.match(r'^```.*```$', block, re.DOTALL):
+                return BlockType.CODE
+            lines = block.split('\n')
+            if all(line.startswith('>') for line in lines):
+                return BlockType.QUOTE
+            if all(line.startswith('- ') for line in lines):
+                return BlockType.UNORDERED_LIST
+            if all(re.match(f'^{i}\\. ', line) for i, line in enumerate(lines, 1)):
+                return BlockType.ORDERED_LIST
+            if len(lines) == 1 and re.match(r"^!\[.*\]\(.*\)$", lines[0].strip()):
+                return BlockType.IMAGE
+            return BlockType.PARAGRAPH
+
+        pieces = ["#", "# ", "```", ">", "- ", "-", "1. ", "2. ", "3. ", "10. ", "![a](b)", "x", " ", "\n"]
+        rng = random.Random(4321)
+        for _ in range(5000):
+            block = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(block_to_block_type(block), regex_classifier(block), repr(block))
+
+    def test_fenced_code_is_verbatim(self):
+        markdown = "```python\nif a < b and snake_case_name:\n\n    print(\"**not bold**\")\n```"
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            '<div><pre><code class="language-python">if a &lt; b and snake_case_name:\n\n'
+            '    print("**not bold**")\n</code></pre></div>',
+        )
+        self.assertEqual(parse_fence("``` one _line ```"), (None, "one _line"))
+        self.assertEqual(markdown_to_html_node("```\n```").to_html(), "<div><pre><code></code></pre></div>")
+
+    def test_heading_ids_are_unique(self):
+        outline = Outline()
+        html = markdown_to_html_node("# Tom's **House**\n\n## Setup\n\n## Setup\n\n### Setup", outline).to_html()
+        self.assertEqual(
+            html,
+            '<div><h1 id="toms-house">Tom\'s <b>House</b></h1><h2 id="setup">Setup</h2>'
+            '<h2 id="setup-1">Setup</h2><h3 id="setup-2">Setup</h3></div>',
+        )
+        self.assertEqual(outline.headings[0], (1, "toms-house", "Tom's House"))
+        self.assertEqual(slugify("Über_alles & Co-op"), "über_alles--co-op")
+        self.assertEqual(slugify("Ǆ 2 Ωmega"), "ǆ-2-ωmega")
+        self.assertEqual(slugify("!?"), "section")
+
+    def test_table_of_contents(self):
+        outline = Outline()
+        tree = markdown_to_html_node("# Title\n\n## One\n\n### One a\n\ntext\n\n## Two", outline)
+        self.assertEqual(
+            outline.to_html_node().to_html(),
+            '<nav class="toc"><ul><li><a href="#one">One</a><ul><li><a href="#one-a">One a</a></li>'
+            '</ul></li><li><a href="#two">Two</a></li></ul></nav>',
+        )
+        self.assertEqual(Outline.from_tree(tree).headings, outline.headings)
+        self.assertIsNone(Outline().to_html_node())
+
+        # a heading nests under the closest shallower one, however many
+        # levels it skips
+        outline = Outline()
+        markdown_to_html_node("## A\n\n#### B\n\n### C\n\n## D", outline)
+        self.assertEqual(
+            outline.to_html_node().to_html(None, None, Minifier()),
+            '<nav class=toc><ul><li><a href=#a>A</a><ul><li><a href=#b>B</a></li><li><a href=#c>C</a></li>'
+            '</ul></li><li><a href=#d>D</a></li></ul></nav>',
+        )
 
 if __name__ == "__main__":
     unittest.main()
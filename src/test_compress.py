@@ -0,0 +1,56 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from compress import CompressionState, compress_directory, remove_compressed
+
+class TestCompressDirectory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "docs"
+        (self.root / "blog").mkdir(parents=True)
+        self.page = self.root / "blog" / "index.html"
+        self.page.write_text("<p>Tom Bombadil</p>\n" * 100)
+        (self.root / "tiny.css").write_text("p { color: red; }")
+        (self.root / "tom.png").write_bytes(b"\x89PNG" * 200)
+        self.state = CompressionState(Path(self.tmp.name) / "compress.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compresses_text_files(self):
+        stats = compress_directory(self.root, self.state, formats=["gzip"])
+
+        self.assertEqual((stats["files"], stats["compressed"]), (1, 1))
+        self.assertLess(stats["formats"]["gzip"], stats["bytes"])
+        self.assertEqual(gzip.decompress((self.root / "blog" / "index.html.gz").read_bytes()), self.page.read_bytes())
+        self.assertFalse((self.root / "tiny.css.gz").exists())
+        self.assertFalse((self.root / "tom.png.gz").exists())
+
+    def test_unchanged_files_are_skipped(self):
+        compress_directory(self.root, self.state, formats=["gzip"])
+        self.state.save()
+
+        state = CompressionState.load(self.state.path)
+        self.assertEqual(compress_directory(self.root, state, formats=["gzip"])["compressed"], 0)
+
+        self.page.write_text("<p>Goldberry</p>\n" * 100)
+        self.assertEqual(compress_directory(self.root, state, formats=["gzip"])["compressed"], 1)
+        self.assertEqual(gzip.decompress((self.root / "blog" / "index.html.gz").read_bytes()), self.page.read_bytes())
+
+    def test_stale_siblings_are_removed(self):
+        compress_directory(self.root, self.state, formats=["gzip"])
+        os.unlink(self.page)
+        compress_directory(self.root, self.state, formats=["gzip"])
+        self.assertFalse((self.root / "blog" / "index.html.gz").exists())
+
+    def test_remove_compressed(self):
+        compress_directory(self.root, self.state, formats=["gzip"])
+        remove_compressed(self.root, self.state)
+        self.assertFalse((self.root / "blog" / "index.html.gz").exists())
+        self.assertEqual(self.state.entries, {})
+
+if __name__ == "__main__":
+    unittest.main()
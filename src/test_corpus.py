@@ -0,0 +1,30 @@
+import tempfile
+import unittest
+
+from blocktype import markdown_to_html_node
+from corpus import CorpusGenerator, parse_block_mix
+
+class TestCorpus(unittest.TestCase):
+    def test_documents_are_deterministic(self):
+        self.assertEqual(CorpusGenerator(seed=7).document(30), CorpusGenerator(seed=7).document(30))
+        self.assertNotEqual(CorpusGenerator(seed=7).document(30), CorpusGenerator(seed=8).document(30))
+
+    def test_documents_render(self):
+        generator = CorpusGenerator(seed=3, link_density=1.0, image_density=1.0)
+        for _ in range(20):
+            html = markdown_to_html_node(generator.document(40)).to_html()
+            self.assertTrue(html.startswith('<div><h1 id="'))
+
+    def test_write_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = CorpusGenerator(seed=1).write_corpus(tmp, pages=12, blocks_per_page=5, depth=3)
+            self.assertEqual(len(paths), 12)
+            self.assertTrue(all(path.read_text().startswith("# ") for path in paths))
+
+    def test_parse_block_mix(self):
+        self.assertEqual(parse_block_mix("paragraph=3,code=1"), {"paragraph": 3.0, "code": 1.0})
+        with self.assertRaises(ValueError):
+            parse_block_mix("table=1")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from depgraph import DependencyGraph, title_key
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.source = self.root / "tom.md"
+        self.source.write_text("# Tom\n\nbody")
+        self.template = self.root / "template.html"
+        self.template.write_text("{{ Content }}")
+        self.graph_path = self.root / "depgraph.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_recorded_output_is_current_after_reload(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.record("tom.html", [self.source, self.template])
+        graph.save()
+
+        reloaded = DependencyGraph.load(self.graph_path)
+        self.assertTrue(reloaded.is_current("tom.html"))
+        self.assertFalse(reloaded.is_current("other.html"))
+
+    def test_changed_file_is_stale(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.record("tom.html", [self.source, self.template])
+        self.template.write_text("<main>{{ Content }}</main>")
+
+        self.assertFalse(DependencyGraph(self.graph_path, graph.edges).is_current("tom.html"))
+
+    def test_title_change_invalidates_listing_only(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.set_value(title_key(self.source), "Tom")
+        graph.record("tom.html", [self.source])
+        graph.record("blog/index.html", [title_key(self.source)])
+
+        self.assertFalse(graph.set_value(title_key(self.source), "Tom"))
+        self.assertTrue(graph.is_current("blog/index.html"))
+
+        self.assertTrue(graph.set_value(title_key(self.source), "Tom Bombadil"))
+        self.assertFalse(graph.is_current("blog/index.html"))
+        self.assertTrue(graph.is_current("tom.html"))
+
+    def test_forgotten_value_is_stale(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.set_value(title_key(self.source), "Tom")
+        graph.record("blog/index.html", [title_key(self.source)])
+        graph.forget_value(title_key(self.source))
+        self.assertFalse(graph.is_current("blog/index.html"))
+
+    def test_dependents(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.record("tom.html", [self.source, self.template])
+        graph.record("home.html", [self.template])
+        self.assertEqual(graph.dependents([self.source]), {"tom.html"})
+        self.assertEqual(graph.dependents([self.template]), {"tom.html", "home.html"})
+
+        graph.forget("tom.html")
+        self.assertEqual(graph.dependents([self.template]), {"home.html"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from blocktype import markdown_to_html_node
+from highlight import Highlighter, highlighting_available
+
+MARKDOWN = "```python\nprint(\"<Tom>\")\n```\n\n```\nplain <code>\n```\n\n```klingon\nqapla'\n```"
+
+@unittest.skipUnless(highlighting_available(), "needs Pygments")
+class TestHighlighter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp.name) / "highlight"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_code_with_a_known_language_is_highlighted(self):
+        highlighter = Highlighter(self.cache_dir)
+        tree = markdown_to_html_node(MARKDOWN)
+        python, plain, unknown = [highlighter.apply(block).to_html() for block in tree.children]
+
+        self.assertTrue(python.startswith('<pre class="highlight"><code class="language-python">'))
+        self.assertIn('<span class="nb">print</span>', python)
+        self.assertIn("&lt;Tom&gt;", python)
+        self.assertEqual(plain, "<pre><code>plain &lt;code&gt;\n</code></pre>")
+        self.assertEqual(unknown, '<pre><code class="language-klingon">qapla\'\n</code></pre>')
+
+    def test_snippets_are_highlighted_once(self):
+        highlighter = Highlighter(self.cache_dir)
+        markup = highlighter.highlight("x = 1\n", "python")
+        self.assertEqual(highlighter.highlight("x = 1\n", "python"), markup)
+        self.assertEqual(highlighter.tokenized, 1)
+
+        # another process, or the next build, reads it from the directory
+        other = Highlighter(self.cache_dir)
+        self.assertEqual(other.highlight("x = 1\n", "python"), markup)
+        self.assertEqual(other.tokenized, 0)
+        self.assertIsNone(other.highlight("x = 1\n", "klingon"))
+
+if __name__ == "__main__":
+    unittest.main()
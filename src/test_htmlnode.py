@@ -1,6 +1,8 @@
+import pickle
+import random
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes, split_nodes_delimiter
+from htmlnode import HTMLNode, LeafNode, ParentNode, SharedLeafNode, leaf_node, text_node_to_html_node, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes, split_nodes_delimiter
 from textnode import TextNode, TextType
 
 class TestHTMLNode(unittest.TestCase):
@@ -52,6 +54,15 @@ class TestHTMLNode(unittest.TestCase):
         node = LeafNode("a", "Im a link!", {"href": "https://google.com"})
         self.assertEqual(node.to_html(), '<a href="https://google.com">Im a link!</a>')
 
+    def test_image_is_void_element(self):
+        node = text_node_to_html_node(TextNode("Tom", TextType.IMAGE, "/tom.png"))
+        self.assertEqual(node.to_html(), '<img src="/tom.png" alt="Tom">')
+
+        parent = ParentNode("p", [node])
+        self.assertEqual(
+            parent.to_html(lambda url: "/site" + url, lambda src: {"width": "10", "loading": "lazy"}),
+            '<p><img src="/site/tom.png" alt="Tom" width="10" loading="lazy"></p>',
+        )
 
     def test_to_html_with_children(self):
         child_node = LeafNode("span", "child")
@@ -77,6 +88,47 @@ class TestHTMLNode(unittest.TestCase):
 
         self.assertEqual(parent_node.to_html(),"<span><span>parent</span></span>")
 
+    def test_write_html_streams_chunks(self):
+        parent_node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "Hi "), LeafNode("a", "there", {"href": "/x"})]),
+            LeafNode("b", "bold"),
+        ])
+        chunks = []
+        parent_node.write_html(chunks.append)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), '<div><p>Hi <a href="/x">there</a></p><b>bold</b></div>')
+        self.assertEqual(parent_node.to_html(), ''.join(chunks))
+
+    def test_write_html_missing_tag(self):
+        with self.assertRaises(ValueError):
+            ParentNode(None, [LeafNode(None, "x")]).write_html(lambda chunk: None)
+
+    def test_nodes_use_slots(self):
+        for node in [HTMLNode(), LeafNode("b", "x"), ParentNode("p", []), TextNode("x", TextType.TEXT)]:
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_leaf_attributes_alias_props(self):
+        node = LeafNode("a", "link", {"href": "/"})
+        self.assertIs(node.attributes, node.props)
+        node.attributes = {"href": "/blog"}
+        self.assertEqual(node.props, {"href": "/blog"})
+
+    def test_short_leaves_are_shared(self):
+        first = text_node_to_html_node(TextNode(" and ", TextType.TEXT))
+        second = text_node_to_html_node(TextNode(" and ", TextType.TEXT))
+        self.assertIs(first, second)
+        self.assertIsInstance(first, SharedLeafNode)
+        self.assertIsNot(leaf_node("b", "and"), first)
+        self.assertIsNot(leaf_node("a", "x", {"href": "/"}), leaf_node("a", "x", {"href": "/"}))
+        self.assertNotIsInstance(leaf_node(None, "long " * 20), SharedLeafNode)
+
+    def test_shared_leaves_are_immutable(self):
+        node = leaf_node("b", "bold")
+        with self.assertRaises(AttributeError):
+            node.value = "changed"
+        self.assertEqual(node.to_html(), "<b>bold</b>")
+        self.assertIs(pickle.loads(pickle.dumps(node)), node)
+
     def test_extract_markdown_images(self):
         matches = extract_markdown_images(
             "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png)"
@@ -140,6 +192,41 @@ class TestHTMLNode(unittest.TestCase):
             nodes,
         ) 
 
+    def test_text_to_textnodes_matches_split_pipeline(self):
+        def split_pipeline(text):
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_image(nodes)
+            return split_nodes_link(nodes)
+
+        def parse(parser, text):
+            try:
+                return parser(text)
+            except Exception as e:
+                return str(e)
+
+        pieces = ["a", " ", "*", "**", "_", "`", "!", "[", "]", "(", ")", "![i](u)", "[l](v)", "[](x)"]
+        rng = random.Random(1234)
+        for _ in range(5000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 16)))
+            self.assertEqual(parse(text_to_textnodes, text), parse(split_pipeline, text), text)
+
+    def test_text_to_textnodes_unbalanced(self):
+        for text in ["**bold", "a _b `c_ d`", "`a_b`", "_a**b**c_"]:
+            with self.assertRaises(Exception):
+                text_to_textnodes(text)
+
+    def test_text_to_textnodes_nested_delimiters_are_literal(self):
+        self.assertListEqual(
+            [
+                TextNode("x ", TextType.TEXT),
+                TextNode("a_b `c`", TextType.BOLD),
+                TextNode("d`e", TextType.ITALIC),
+            ],
+            text_to_textnodes("x **a_b `c`**_d`e_"),
+        )
 
 if __name__ == "__main__":
     unittest.main()
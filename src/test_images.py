@@ -0,0 +1,105 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from pathlib import Path
+from assets import AssetHashes
+from images import ImageCache, image_annotator, image_size, process_images, variants_available
+
+def png_header(width, height):
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + struct.pack(">II", width, height) + bytes(17)
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "image"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, data):
+        self.path.write_bytes(data)
+        return image_size(self.path)
+
+    def test_png(self):
+        self.assertEqual(self.size_of(png_header(928, 468)), (928, 468))
+
+    def test_gif(self):
+        self.assertEqual(self.size_of(b"GIF89a" + struct.pack("<HH", 40, 30) + bytes(20)), (40, 30))
+
+    def test_jpeg(self):
+        app0 = b"\xff\xe0" + struct.pack(">H", 16) + bytes(14)
+        sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 388, 1026) + bytes(10)
+        self.assertEqual(self.size_of(b"\xff\xd8" + app0 + sof), (1026, 388))
+
+    def test_webp(self):
+        vp8x = b"RIFF" + bytes(4) + b"WEBPVP8X" + bytes(8) + (99).to_bytes(3, "little") + (49).to_bytes(3, "little")
+        self.assertEqual(self.size_of(vp8x), (100, 50))
+
+    def test_unknown_format(self):
+        self.assertIsNone(self.size_of(b"<svg></svg>"))
+
+class TestProcessImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.src = self.root / "static"
+        (self.src / "images").mkdir(parents=True)
+        (self.src / "images" / "tom.png").write_bytes(png_header(928, 468))
+        (self.src / "index.css").write_text("p {}")
+        self.dst = self.root / "docs"
+        self.dst.mkdir()
+        self.hashes = AssetHashes(self.root / "assets.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sizes_are_cached_by_hash(self):
+        cache = ImageCache(self.root / "images.json")
+        table = process_images(self.src, self.dst, self.hashes, cache)
+        self.assertEqual(table, {"/images/tom.png": {"width": 928, "height": 468, "variants": []}})
+        self.assertEqual(cache.read, 1)
+        cache.save()
+
+        cache = ImageCache.load(self.root / "images.json")
+        process_images(self.src, self.dst, self.hashes, cache)
+        self.assertEqual(cache.read, 0)
+
+    def test_annotator(self):
+        images = {"/images/tom.png": {"width": 928, "height": 468, "variants": [["/images/tom.480w.1234abcd.png", 480]]}}
+        used = set()
+        image_attributes = image_annotator(images, lambda url: "/site" + url, used)
+
+        self.assertEqual(
+            image_attributes("/images/tom.png"),
+            {
+                "width": "928",
+                "height": "468",
+                "srcset": "/site/images/tom.480w.1234abcd.png 480w, /site/images/tom.png 928w",
+                "sizes": "(max-width: 928px) 100vw, 928px",
+                "loading": "lazy",
+                "decoding": "async",
+            },
+        )
+        self.assertEqual(image_attributes("https://example.com/x.png"), {"loading": "lazy", "decoding": "async"})
+        self.assertEqual(used, {"/images/tom.png"})
+
+    @unittest.skipUnless(variants_available(), "srcset variants need Pillow")
+    def test_variants(self):
+        from PIL import Image
+
+        Image.new("RGB", (1000, 500)).save(self.src / "images" / "tom.png")
+        cache = ImageCache(self.root / "images.json")
+        table = process_images(self.src, self.dst, self.hashes, cache, variants=True, max_workers=1)
+
+        variants = table["/images/tom.png"]["variants"]
+        self.assertEqual([width for _, width in variants], [480, 960])
+        with Image.open(self.dst / variants[0][0][1:]) as variant:
+            self.assertEqual(variant.size, (480, 240))
+
+        process_images(self.src, self.dst, self.hashes, cache)
+        self.assertFalse(os.path.exists(self.dst / variants[0][0][1:]))
+
+if __name__ == "__main__":
+    unittest.main()
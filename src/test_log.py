@@ -0,0 +1,37 @@
+import json
+import logging
+import tempfile
+import unittest
+
+from pathlib import Path
+from log import configure_logging, events_enabled, flush_logs, log_event, logger
+
+class TestLogging(unittest.TestCase):
+    def tearDown(self):
+        configure_logging(logging.WARNING)
+
+    def test_event_log_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "events.jsonl"
+            configure_logging(logging.WARNING, path)
+            self.assertTrue(events_enabled())
+
+            log_event("page_finished", source="content/index.md", bytes=120)
+            log_event("page_started", source="content/index.md", time=1.5)
+            flush_logs()
+
+            records = [json.loads(line) for line in path.read_text().splitlines()]
+            self.assertEqual(records[0]["event"], "page_finished")
+            self.assertEqual(records[0]["bytes"], 120)
+            self.assertEqual(records[1]["time"], 1.5)
+
+            configure_logging(logging.WARNING)
+            self.assertFalse(events_enabled())
+
+    def test_quiet_level_drops_info(self):
+        configure_logging(logging.WARNING)
+        self.assertFalse(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.isEnabledFor(logging.ERROR))
+
+if __name__ == "__main__":
+    unittest.main()
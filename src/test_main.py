@@ -0,0 +1,112 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from depgraph import DependencyGraph, title_key
+from main import discover_pages, generate_page, generate_pages_recursive, generate_site_files, render_pages
+from siteindex import SiteIndex
+
+class TestPageDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        (self.content / "blog" / "tom").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home\n\nWelcome")
+        (self.content / "blog" / "tom" / "index.md").write_text("# Tom\n\nA **post**")
+        (self.content / "blog" / "notes.txt").write_text("not markdown")
+        self.template = self.root / "template.html"
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+        self.docs = self.root / "docs"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_discover_pages(self):
+        pages = discover_pages(self.content, self.docs)
+        self.assertEqual(
+            pages,
+            [
+                (self.content / "blog" / "tom" / "index.md", self.docs / "blog" / "tom" / "index.html"),
+                (self.content / "index.md", self.docs / "index.html"),
+            ],
+        )
+
+    def test_render_pages_in_parallel(self):
+        pages = discover_pages(self.content, self.docs)
+        results = render_pages(pages, self.template, "/", jobs=2)
+        self.assertEqual([error for error, _ in results], [None, None])
+        self.assertEqual([info["title"] for _, info in results], ["Tom", "Home"])
+        self.assertEqual(
+            (self.docs / "blog" / "tom" / "index.html").read_text(),
+            '<title>Tom</title><div><h1 id="tom">Tom</h1><p>A <b>post</b></p></div>',
+        )
+
+    def test_render_pages_reports_errors_per_page(self):
+        (self.content / "index.md").write_text("# Home\n\nUnclosed **bold")
+        pages = discover_pages(self.content, self.docs)
+        results = render_pages(pages, self.template, "/", jobs=2)
+        self.assertEqual(results[0][0], None)
+        self.assertEqual(results[1], ("Exception: Invalid Markdown Syntax", None))
+        self.assertFalse((self.docs / "index.html").exists())
+
+    def test_pages_rendered_in_process_match_worker_pages(self):
+        pages = discover_pages(self.content, self.docs)
+        render_pages(pages, self.template, "/", jobs=2)
+        expected = {dest: dest.read_text() for _, dest in pages}
+
+        results = render_pages(pages, self.template, "/", jobs=1)
+        self.assertEqual([info["status"] for _, info in results], [None, None])
+        (self.content / "index.md").write_text("# Home\n\nWelcome back")
+        results = render_pages(pages, self.template, "/", jobs=1)
+        self.assertEqual([info["status"] for _, info in results], [None, "M"])
+        self.assertEqual(results[1][1]["bytes"], (self.docs / "index.html").stat().st_size)
+        self.assertEqual(
+            (self.docs / "blog" / "tom" / "index.html").read_text(),
+            expected[self.docs / "blog" / "tom" / "index.html"],
+        )
+        # nothing is left behind of the files pages were streamed to
+        self.assertEqual(
+            sorted(path.name for path in self.docs.rglob("*")), ["blog", "index.html", "index.html", "tom"]
+        )
+    def test_streamed_page_matches_buffered_page(self):
+        source = self.content / "blog" / "tom" / "index.md"
+        source.write_text("# Tom\n\nA **post**\n\n```\nx = 1\n\n    y = 2\n```\n\n- one\n- two\n")
+        generate_page(source, self.template, self.docs / "buffered.html", "/")
+        info = generate_page(source, self.template, self.docs / "streamed.html", "/", stream_threshold=0)
+        self.assertEqual(info["title"], "Tom")
+        self.assertEqual(
+            (self.docs / "streamed.html").read_text(),
+            (self.docs / "buffered.html").read_text(),
+        )
+    def test_toc_template_variable(self):
+        self.template.write_text("{{ Toc }}{{ Content }}")
+        source = self.content / "blog" / "tom" / "index.md"
+        source.write_text("# Tom\n\n## Songs\n\nHey dol!")
+        generate_page(source, self.template, self.docs / "tom.html", "/")
+        self.assertEqual(
+            (self.docs / "tom.html").read_text(),
+            '<nav class="toc"><ul><li><a href="#songs">Songs</a></li></ul></nav>'
+            '<div><h1 id="tom">Tom</h1><h2 id="songs">Songs</h2><p>Hey dol!</p></div>',
+        )
+
+    def test_section_index_follows_titles(self):
+        graph = DependencyGraph(self.root / "depgraph.json")
+        site_index = SiteIndex(self.docs)
+        generate_pages_recursive(
+            self.content, self.template, self.docs, "/", graph=graph, site_index=site_index
+        )
+        generate_site_files(
+            site_index, self.content, self.template, self.docs, "/", graph=graph,
+            site_url="https://example.com",
+        )
+        section = self.docs / "blog" / "index.html"
+        self.assertIn('<a href="/blog/tom/">Tom</a>', section.read_text())
+        self.assertTrue((self.docs / "sitemap.xml").exists())
+        self.assertTrue(graph.is_current(section))
+
+        graph.set_value(title_key(self.content / "blog" / "tom" / "index.md"), "Tom Bombadil")
+        self.assertFalse(graph.is_current(section))
+
+if __name__ == "__main__":
+    unittest.main()
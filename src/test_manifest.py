@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from manifest import BuildManifest, hash_file
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.source = self.root / "index.md"
+        self.source.write_text("# Title\n\nbody")
+        self.template = self.root / "template.html"
+        self.template.write_text("<p>{{ Content }}</p>")
+        self.dest = self.root / "index.html"
+        self.dest.write_text("<p>built</p>")
+        self.manifest_path = self.root / "manifest.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_new_manifest_is_stale(self):
+        manifest = BuildManifest(self.manifest_path)
+        inputs = manifest.page_inputs(self.source, self.template, "/")
+        self.assertFalse(manifest.is_current(self.source, self.dest, inputs))
+
+    def test_recorded_page_is_current_after_reload(self):
+        manifest = BuildManifest(self.manifest_path)
+        inputs = manifest.page_inputs(self.source, self.template, "/")
+        manifest.record(self.source, self.dest, inputs)
+        manifest.save()
+
+        reloaded = BuildManifest.load(self.manifest_path)
+        inputs = reloaded.page_inputs(self.source, self.template, "/")
+        self.assertTrue(reloaded.is_current(self.source, self.dest, inputs))
+
+    def test_changed_inputs_are_stale(self):
+        manifest = BuildManifest(self.manifest_path)
+        inputs = manifest.page_inputs(self.source, self.template, "/")
+        manifest.record(self.source, self.dest, inputs)
+
+        changed_basepath = manifest.page_inputs(self.source, self.template, "/blog/")
+        self.assertFalse(manifest.is_current(self.source, self.dest, changed_basepath))
+
+        self.source.write_text("# Title\n\nnew body")
+        changed_source = manifest.page_inputs(self.source, self.template, "/")
+        self.assertFalse(manifest.is_current(self.source, self.dest, changed_source))
+
+    def test_missing_output_is_stale(self):
+        manifest = BuildManifest(self.manifest_path)
+        inputs = manifest.page_inputs(self.source, self.template, "/")
+        manifest.record(self.source, self.dest, inputs)
+        self.dest.unlink()
+        self.assertFalse(manifest.is_current(self.source, self.dest, inputs))
+
+    def test_missing(self):
+        pages = {
+            "kept.md": {"dest": "kept.html"},
+            "gone.md": {"dest": "gone.html"},
+        }
+        manifest = BuildManifest(self.manifest_path, pages)
+        manifest.seen.add("kept.md")
+        self.assertEqual(manifest.missing(), [("gone.md", "gone.html")])
+        self.assertEqual(manifest.forget("gone.md"), "gone.html")
+        self.assertEqual(list(manifest.pages), ["kept.md"])
+
+    def test_corrupt_manifest_loads_empty(self):
+        self.manifest_path.write_text("{not json")
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertEqual(manifest.pages, {})
+
+    def test_hash_file(self):
+        self.assertEqual(hash_file(self.source), hash_file(self.source))
+        self.assertNotEqual(hash_file(self.source), hash_file(self.template))
+
+if __name__ == "__main__":
+    unittest.main()
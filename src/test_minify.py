@@ -0,0 +1,45 @@
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from minify import Minifier, minify_markup
+from template import Template
+
+class TestMinify(unittest.TestCase):
+    def test_indentation_between_tags_is_removed(self):
+        self.assertEqual(
+            minify_markup('<html>\n  <head>\n    <meta charset="utf-8" />\n  </head>\n</html>\n'),
+            "<html><head><meta charset=utf-8></head></html>",
+        )
+
+    def test_inline_whitespace_is_collapsed(self):
+        self.assertEqual(minify_markup("<p>Tom   <b>Bombadil</b>\n  sings</p>"), "<p>Tom <b>Bombadil</b> sings</p>")
+
+    def test_pre_is_left_alone(self):
+        text = "<div>\n  <pre><code>\n  indented  code\n</code></pre>\n</div>"
+        self.assertEqual(minify_markup(text), "<div><pre><code>\n  indented  code\n</code></pre></div>")
+
+    def test_quotes_kept_where_needed(self):
+        self.assertEqual(
+            minify_markup('<a href="/blog/" title="Tom Bombadil" class="">x</a>'),
+            '<a href="/blog/" title="Tom Bombadil" class="">x</a>',
+        )
+
+    def test_minifier_counts_saved_bytes(self):
+        minifier = Minifier()
+        node = ParentNode("p", [LeafNode("a", "Tom", {"href": "/tom", "title": "Tom Bombadil"})])
+        self.assertEqual(node.to_html(minifier=minifier), '<p><a href=/tom title="Tom Bombadil">Tom</a></p>')
+        self.assertEqual(minifier.saved, 2)
+
+    def test_template_minify(self):
+        source = '<body>\n  <link href="/index.css" />\n  <article>{{ Content }}</article>\n</body>\n'
+        template = Template(source, minify=True)
+        minifier = Minifier()
+        parts = []
+        template.render(parts.append, {"Content": LeafNode("p", "Tom")}, minifier=minifier)
+
+        html = "".join(parts)
+        self.assertEqual(html, "<body><link href=/index.css><article><p>Tom</p></article></body>")
+        self.assertEqual(minifier.saved, len(source) - len("{{ Content }}") + len("<p>Tom</p>") - len(html))
+
+if __name__ == "__main__":
+    unittest.main()
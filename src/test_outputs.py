@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from outputs import (
+    ADDED,
+    DELETED,
+    MODIFIED,
+    ChangeSet,
+    SpooledPage,
+    replace_if_changed,
+    temporary_path,
+    write_if_changed,
+)
+
+class TestWriteIfChanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_content_is_not_written(self):
+        path = self.root / "blog" / "index.html"
+        self.assertEqual(write_if_changed(path, "<p>Tom</p>"), ADDED)
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+        self.assertIsNone(write_if_changed(path, b"<p>Tom</p>"))
+        self.assertEqual(path.stat().st_mtime_ns, 1_000_000_000)
+
+        self.assertEqual(write_if_changed(path, "<p>Bombadil</p>"), MODIFIED)
+        self.assertEqual(path.read_text(), "<p>Bombadil</p>")
+        self.assertEqual(os.listdir(path.parent), ["index.html"])
+
+    def test_replace_if_changed_drops_identical_file(self):
+        path = self.root / "index.html"
+        path.write_text("same")
+        tmp_path = temporary_path(path)
+        tmp_path.write_text("same")
+        self.assertIsNone(replace_if_changed(tmp_path, path))
+        self.assertFalse(tmp_path.exists())
+
+        tmp_path.write_text("different")
+        self.assertEqual(replace_if_changed(tmp_path, path), MODIFIED)
+        self.assertEqual(path.read_text(), "different")
+
+class TestSpooledPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def spool(self, path, pieces, chunk_size):
+        page = SpooledPage(path, chunk_size, max_chunks=1)
+        for piece in pieces:
+            page.write(piece)
+        page.close()
+        return page
+
+    def test_small_page_stays_in_memory(self):
+        path = self.root / "blog" / "index.html"
+        page = self.spool(path, ["<p>", "Tom", "</p>"], 64)
+        self.assertFalse(path.parent.exists())
+        self.assertEqual(page.finish(), (10, ADDED))
+        self.assertIsNone(self.spool(path, ["<p>Tom</p>"], 64).finish()[1])
+
+    def test_large_page_is_streamed(self):
+        path = self.root / "blog" / "index.html"
+        pieces = [f"<p>Tom {i}</p>" for i in range(1000)]
+        page = self.spool(path, pieces, 8)
+        self.assertEqual(page.finish(), (len("".join(pieces)), ADDED))
+        self.assertEqual(path.read_text(), "".join(pieces))
+        self.assertEqual(os.listdir(path.parent), ["index.html"])
+
+        self.assertIsNone(self.spool(path, pieces, 8).finish()[1])
+        self.assertEqual(os.listdir(path.parent), ["index.html"])
+
+    def test_discard_leaves_nothing_behind(self):
+        path = self.root / "index.html"
+        page = SpooledPage(path, 8, max_chunks=1)
+        for i in range(100):
+            page.write(f"<p>Tom {i}</p>")
+        page.discard()
+        self.assertEqual(os.listdir(self.root), [])
+
+class TestChangeSet(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = Path(self.tmp.name) / "docs"
+        (self.docs / "old").mkdir(parents=True)
+        for name in ("index.html", "index.html.gz", "old/page.html", "old/page.html.gz"):
+            (self.docs / name).write_text(name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_remove_unknown_keeps_outputs_and_their_siblings(self):
+        changes = ChangeSet(self.docs)
+        changes.record(self.docs / "index.html")
+        changes.record(self.docs / "blog.html", ADDED)
+
+        removed = changes.remove_unknown((".gz",))
+        self.assertEqual(sorted(removed), ["old/page.html", "old/page.html.gz"])
+        self.assertTrue((self.docs / "index.html.gz").exists())
+        self.assertFalse((self.docs / "old").exists())
+        self.assertEqual(changes.counts(), {ADDED: 1, MODIFIED: 0, DELETED: 2})
+
+    def test_write_lists_changes(self):
+        changes = ChangeSet(self.docs)
+        changes.record(self.docs / "index.html", MODIFIED)
+        changes.record(self.docs / "old" / "page.html", DELETED)
+        changes.record(self.docs / "unchanged.html")
+        # added and removed again in one build: nothing for a deploy to do
+        changes.record(self.docs / "tmp.html", ADDED)
+        changes.record(self.docs / "tmp.html", DELETED)
+
+        path = Path(self.tmp.name) / "changed-files.txt"
+        changes.write(path)
+        self.assertEqual(path.read_text(), "M\tindex.html\nD\told/page.html\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import run_pipeline
+
+class TestPipeline(unittest.TestCase):
+    def test_results_keep_job_order(self):
+        def read(job):
+            time.sleep(0.001 * (job % 3))
+            return job * 10
+
+        with ThreadPoolExecutor(2) as executor:
+            results = run_pipeline(range(20), read, lambda job, data: data + 1, lambda job, data: (job, data), executor)
+        self.assertEqual(results, [(None, (job, job * 10 + 1)) for job in range(20)])
+
+    def test_stage_errors_are_reported_per_job(self):
+        def render(job, data):
+            if job == 1:
+                raise ValueError("bad page")
+            return data
+
+        def write(job, data):
+            if job == 2:
+                raise OSError("disk full")
+            return data
+
+        with ThreadPoolExecutor(1) as executor:
+            results = run_pipeline([0, 1, 2], lambda job: job, render, write, executor)
+        self.assertEqual(results, [(None, 0), ("ValueError: bad page", None), ("OSError: disk full", None)])
+
+    def test_pending_jobs_are_bounded(self):
+        lock = threading.Lock()
+        pending = peak = 0
+
+        def read(job):
+            nonlocal pending, peak
+            with lock:
+                pending += 1
+                peak = max(peak, pending)
+            return job
+
+        def write(job, data):
+            nonlocal pending
+            # a slow disk: readers have to wait for writes to catch up
+            time.sleep(0.002)
+            with lock:
+                pending -= 1
+            return data
+
+        with ThreadPoolExecutor(1) as executor:
+            results = run_pipeline(range(30), read, lambda job, data: data, write, executor, max_pending=3)
+        self.assertEqual([result for _, result in results], list(range(30)))
+        self.assertLessEqual(peak, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from profiler import NULL_TIMER, BuildProfile, StageTimer
+
+class TestProfiler(unittest.TestCase):
+    def test_stage_timer_accumulates(self):
+        timer = StageTimer()
+        with timer.stage("parse"):
+            pass
+        with timer.stage("parse"):
+            pass
+        with timer.stage("write"):
+            pass
+        self.assertEqual(set(timer.timings), {"parse", "write"})
+        self.assertGreaterEqual(timer.timings["parse"], 0.0)
+
+    def test_null_timer_records_nothing(self):
+        with NULL_TIMER.stage("parse"):
+            pass
+        self.assertIsNone(NULL_TIMER.timings)
+
+    def test_stage_timer_records_on_error(self):
+        timer = StageTimer()
+        with self.assertRaises(ValueError):
+            with timer.stage("parse"):
+                raise ValueError("bad")
+        self.assertIn("parse", timer.timings)
+
+    def test_build_profile(self):
+        profile = BuildProfile()
+        profile.add_page("a.md", {"parse": 0.5, "write": 0.1})
+        profile.add_page("b.md", {"parse": 0.2, "write": 0.1})
+        profile.add("static sync", 0.3)
+
+        self.assertEqual(profile.stages["parse"], (0.7, 2))
+        self.assertEqual([page for page, _ in profile.slowest_pages(1)], ["a.md"])
+
+        report = profile.to_json(top=1)
+        self.assertEqual(report["stages"]["static sync"], {"seconds": 0.3, "calls": 1})
+        self.assertAlmostEqual(report["pages"]["b.md"], 0.3)
+        self.assertEqual(report["slowest"][0]["page"], "a.md")
+
+if __name__ == "__main__":
+    unittest.main()
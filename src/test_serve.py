@@ -0,0 +1,38 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from pathlib import Path
+from serve import ReloadNotifier, diff_snapshots, snapshot
+
+class TestWatch(unittest.TestCase):
+    def test_snapshot_diff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "blog").mkdir()
+            (root / "index.md").write_text("# Home")
+            (root / "blog" / "post.md").write_text("# Post")
+            before = snapshot([tmp])
+
+            (root / "index.md").write_text("# Home page")
+            (root / "blog" / "post.md").unlink()
+            (root / "new.md").write_text("# New")
+            changed, removed = diff_snapshots(before, snapshot([tmp]))
+
+            self.assertEqual(changed, {os.path.join(tmp, "index.md"), os.path.join(tmp, "new.md")})
+            self.assertEqual(removed, {os.path.join(tmp, "blog", "post.md")})
+
+    def test_snapshot_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "index.md").write_text("# Home")
+            self.assertEqual(diff_snapshots(snapshot([tmp]), snapshot([tmp])), (set(), set()))
+
+    def test_notifier_wakes_waiters(self):
+        notifier = ReloadNotifier()
+        threading.Timer(0.05, notifier.bump).start()
+        self.assertEqual(notifier.wait(0, timeout=5), 1)
+        self.assertEqual(notifier.wait(1, timeout=0.01), 1)
+
+if __name__ == "__main__":
+    unittest.main()
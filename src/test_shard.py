@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+from shard import ShardManifest, check_shards, parse_shard, partition_sources
+
+MAIN = Path(__file__).resolve().parent / "main.py"
+
+class TestPartition(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.sources = []
+        for index in range(12):
+            source = self.root / f"page{index}.md"
+            source.write_text("# Page\n\n" + "text " * (index + 1) * 50)
+            self.sources.append(str(source))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+    def test_hash_partition_is_deterministic(self):
+        shards = partition_sources(self.sources, 3)
+        self.assertEqual(shards, partition_sources(list(reversed(self.sources)), 3))
+        self.assertEqual(sorted(source for shard in shards for source in shard), sorted(self.sources))
+
+    def test_timings_balance_shards(self):
+        timings = {source: 1.0 for source in self.sources}
+        timings[self.sources[0]] = 6.0
+        shards = partition_sources(self.sources, 2, timings)
+
+        loads = [sum(timings[source] for source in shard) for shard in shards]
+        self.assertEqual(sorted(loads), [8.0, 9.0])
+
+    def test_missing_shard_is_reported(self):
+        first = ShardManifest(self.root / "shard1", 1, 2, "digest", {})
+        problems = check_shards([first], self.sources[:1])
+        self.assertIn("expected shards 1..2, got [1]", problems)
+        self.assertIn(f"{self.sources[0]} is in no shard", problems)
+
+class TestShardedBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        for name in ("index", "blog/tom/index", "blog/goldberry/index", "contact/index"):
+            path = self.root / "content" / f"{name}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"# {name}\n\nSome **text**")
+        (self.root / "static").mkdir()
+        (self.root / "static" / "index.css").write_text("p {}")
+        (self.root / "template.html").write_text("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_main(self, *args):
+        return subprocess.run(
+            [sys.executable, str(MAIN), *args, "-q"], cwd=self.root, capture_output=True, text=True
+        )
+
+    def test_shards_merge_into_a_full_build(self):
+        self.assertEqual(self.run_main("/").returncode, 0)
+        full = {
+            path.relative_to(self.root / "docs"): path.read_bytes()
+            for path in (self.root / "docs").rglob("*") if path.is_file()
+        }
+
+        shards = [
+            subprocess.Popen(
+                [sys.executable, str(MAIN), "-q", "/", "--shard", f"{k}/3", "--out", f"shards/{k}"],
+                cwd=self.root,
+            )
+            for k in (1, 2, 3)
+        ]
+        self.assertEqual([shard.wait() for shard in shards], [0, 0, 0])
+
+        incomplete = self.run_main("merge", "shards/1", "shards/2")
+        self.assertNotEqual(incomplete.returncode, 0)
+        self.assertIn("expected shards 1..3", incomplete.stderr)
+
+        self.assertEqual(self.run_main("merge", "shards/1", "shards/2", "shards/3").returncode, 0)
+        merged = {
+            path.relative_to(self.root / "docs"): path.read_bytes()
+            for path in (self.root / "docs").rglob("*") if path.is_file()
+        }
+        self.assertEqual(merged, full)
+        self.assertTrue(os.path.exists(self.root / ".cache" / "shard-timings.json"))
+
+    def test_shard_never_deletes_the_site(self):
+        self.assertEqual(self.run_main("/").returncode, 0)
+        (self.root / "src").mkdir()
+        (self.root / "src" / "main.py").write_text("# the code")
+        for out in (".", "docs", "..", "content", "content/blog", "docs/blog", "src", ".cache"):
+            refused = self.run_main("/", "--shard", "1/2", "--out", out)
+            self.assertNotEqual(refused.returncode, 0, out)
+            self.assertIn("Refusing to write a shard", refused.stderr)
+        self.assertTrue((self.root / "docs" / "index.html").exists())
+        self.assertTrue((self.root / "content" / "blog" / "tom" / "index.md").exists())
+        self.assertTrue((self.root / "src" / "main.py").exists())
+        self.assertTrue((self.root / ".cache" / "manifest.json").exists())
+
+        # without --out, shards go to .cache/shard-K, ready to merge, and
+        # replace the shard written there before
+        for k in (1, 2, 1):
+            self.assertEqual(self.run_main("/", "--shard", f"{k}/2").returncode, 0)
+        merged = self.run_main("merge", ".cache/shard-1", ".cache/shard-2")
+        self.assertEqual(merged.returncode, 0, merged.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
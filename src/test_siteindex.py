@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from pathlib import Path
+from siteindex import ATOM_NAMESPACE, SITEMAP_NAMESPACE, SiteIndex, page_url, section_node, write_feed, write_sitemap
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.index = SiteIndex("docs")
+        self.index.add("content/index.md", "docs/index.html", "Home", 100.0, 10)
+        self.index.add("content/blog/tom/index.md", "docs/blog/tom/index.html", "Tom & Co", 300.0, 20)
+        self.index.add("content/blog/old.md", "docs/blog/old.html", "Old", 200.0, 30)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_page_url(self):
+        self.assertEqual(page_url("docs/index.html", "docs"), "/")
+        self.assertEqual(page_url("docs/blog/tom/index.html", "docs"), "/blog/tom/")
+        self.assertEqual(page_url("docs/blog/old.html", "docs"), "/blog/old.html")
+
+    def test_section_is_newest_first(self):
+        self.assertEqual([entry.title for entry in self.index.section("content/blog")], ["Tom & Co", "Old"])
+        self.assertEqual(self.index.section("content/bl"), [])
+        self.assertTrue(self.index.has_output("docs/blog/old.html"))
+
+    def test_section_node(self):
+        html = section_node("Blog", self.index.section("content/blog")).to_html()
+        self.assertEqual(
+            html,
+            '<div><h1>Blog</h1><ul><li><a href="/blog/tom/">Tom & Co</a></li>'
+            '<li><a href="/blog/old.html">Old</a></li></ul></div>',
+        )
+
+    def test_write_sitemap(self):
+        path = self.root / "sitemap.xml"
+        self.assertEqual(write_sitemap(path, self.index.entries(), "https://example.com/site"), "A")
+        self.assertIsNone(write_sitemap(path, self.index.entries(), "https://example.com/site"))
+        self.assertEqual(os.listdir(self.root), ["sitemap.xml"])
+        locs = [loc.text for loc in ET.parse(path).iter(f"{{{SITEMAP_NAMESPACE}}}loc")]
+        self.assertEqual(
+            locs,
+            [
+                "https://example.com/site/",
+                "https://example.com/site/blog/old.html",
+                "https://example.com/site/blog/tom/",
+            ],
+        )
+
+    def test_write_feed(self):
+        path = self.root / "feed.xml"
+        entries = self.index.section("content/blog")
+        write_feed(path, entries, "https://example.com", "Home", "https://example.com/feed.xml")
+        feed = ET.parse(path).getroot()
+        titles = [title.text for title in feed.iter(f"{{{ATOM_NAMESPACE}}}title")]
+        self.assertEqual(titles, ["Home", "Tom & Co", "Old"])
+        self.assertEqual(feed.find(f"{{{ATOM_NAMESPACE}}}updated").text, "1970-01-01T00:05:00+00:00")
+
+if __name__ == "__main__":
+    unittest.main()
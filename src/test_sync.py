@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from assets import AssetHashes
+from outputs import ADDED, MODIFIED, ChangeSet
+from sync import sync_directory, sync_file
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmp.name) / "static"
+        self.dst = Path(self.tmp.name) / "docs"
+        (self.src / "images").mkdir(parents=True)
+        (self.src / "index.css").write_text("body {}")
+        (self.src / "images" / "tom.png").write_bytes(b"\x89PNG tom")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sync_file_skips_matching_files(self):
+        src = self.src / "index.css"
+        dst = self.dst / "index.css"
+        self.assertEqual(sync_file(src, dst), "linked")
+        self.assertEqual(sync_file(src, dst), "skipped")
+        self.assertEqual(dst.read_text(), "body {}")
+
+    def test_sync_file_copy_keeps_mtime(self):
+        src = self.src / "index.css"
+        dst = self.dst / "index.css"
+        self.assertEqual(sync_file(src, dst, link=False), "copied")
+        self.assertFalse(os.path.samefile(src, dst))
+        self.assertEqual(sync_file(src, dst, link=False), "skipped")
+
+        src.write_text("body { color: red }")
+        self.assertEqual(sync_file(src, dst, link=False), "copied")
+        self.assertEqual(dst.read_text(), "body { color: red }")
+
+    def test_sync_directory_prunes_only_previous_files(self):
+        synced = sync_directory(self.src, self.dst)
+        self.assertEqual(set(synced), {"index.css", os.path.join("images", "tom.png")})
+
+        (self.dst / "index.html").write_text("generated page")
+        (self.src / "images" / "tom.png").unlink()
+        synced = sync_directory(self.src, self.dst, synced)
+
+        self.assertEqual(set(synced), {"index.css"})
+        self.assertFalse((self.dst / "images").exists())
+        self.assertTrue((self.dst / "index.html").exists())
+
+    def test_edit_of_linked_source_is_a_change(self):
+        hashes = AssetHashes(Path(self.tmp.name) / "hashes.json")
+        changes = ChangeSet(self.dst)
+        synced = sync_directory(self.src, self.dst, changes=changes, hashes=hashes)
+        self.assertEqual(changes.changes, {"index.css": ADDED, "images/tom.png": ADDED})
+
+        changes = ChangeSet(self.dst)
+        synced = sync_directory(self.src, self.dst, synced, changes=changes, hashes=hashes)
+        self.assertEqual(changes.changes, {})
+
+        # edited in place, docs/index.css is the same inode and looks current
+        with open(self.src / "index.css", "a") as f:
+            f.write("p {}")
+        changes = ChangeSet(self.dst)
+        sync_directory(self.src, self.dst, synced, changes=changes, hashes=hashes)
+        self.assertEqual(changes.changes, {"index.css": MODIFIED})
+        self.assertEqual((self.dst / "index.css").read_text(), "body {}p {}")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from htmlnode import LeafNode, ParentNode
+from assets import AssetTable
+from template import Template, load_template, url_rewriter
+
+class TestTemplate(unittest.TestCase):
+    def test_render_variables(self):
+        template = Template("<title>{{ Title }}</title><p>{{Author}}</p>")
+        self.assertEqual(template.slots, {"Title", "Author"})
+        self.assertEqual(
+            template.render_to_string({"Title": "Home", "Author": "Tolkien"}),
+            "<title>Home</title><p>Tolkien</p>",
+        )
+
+    def test_missing_variable_is_left_in_place(self):
+        template = Template("<p>{{ Missing }}</p>")
+        self.assertEqual(template.render_to_string({}), "<p>{{ Missing }}</p>")
+
+    def test_render_streams_nodes(self):
+        template = Template("<article>{{ Content }}</article>")
+        content = ParentNode("div", [LeafNode("b", "bold")])
+        chunks = []
+        template.render(chunks.append, {"Content": content})
+        self.assertEqual(chunks, ["<article>", "<div>", "<b>bold</b>", "</div>", "</article>"])
+
+    def test_basepath_rewrites_template_and_content(self):
+        template = Template('<link href="/index.css" />{{ Content }}', "/site/")
+        content = ParentNode("p", [
+            LeafNode("a", "home", {"href": "/"}),
+            LeafNode("a", "boot", {"href": "https://boot.dev"}),
+            LeafNode(None, 'text mentioning href="/ stays'),
+        ])
+        self.assertEqual(
+            template.render_to_string({"Content": content}),
+            '<link href="/site/index.css" /><p><a href="/site/">home</a>'
+            '<a href="https://boot.dev">boot</a>text mentioning href="/ stays</p>',
+        )
+
+    def test_url_rewriter(self):
+        assets = AssetTable({"/index.css": "/index.3f9a1c2b.css"})
+        used = set()
+        rewrite_url = url_rewriter("/site/", assets, used)
+        self.assertEqual(rewrite_url("/index.css?v=2"), "/site/index.3f9a1c2b.css?v=2")
+        self.assertEqual(rewrite_url("/blog/"), "/site/blog/")
+        self.assertEqual(rewrite_url("//cdn.example.com/x.css"), "//cdn.example.com/x.css")
+        self.assertEqual(rewrite_url("images/tom.png"), "images/tom.png")
+        self.assertEqual(used, {"/index.css"})
+        self.assertIsNone(url_rewriter("/"))
+
+    def test_template_urls_use_fingerprinted_assets(self):
+        assets = AssetTable({"/index.css": "/index.3f9a1c2b.css", "/tom.png": "/tom.1234abcd.png"})
+        template = Template('<link href="/index.css" />{{ Content }}', "/", assets)
+        self.assertEqual(template.assets, {"/index.css"})
+        content = ParentNode("p", [LeafNode("img", "x", {"src": "/tom.png"})])
+        self.assertEqual(
+            template.render_to_string({"Content": content}),
+            '<link href="/index.3f9a1c2b.css" /><p><img src="/tom.1234abcd.png">x</img></p>',
+        )
+
+    def test_load_template_is_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "template.html"
+            path.write_text("<p>{{ Title }}</p>")
+            first = load_template(path, "/")
+            self.assertIs(load_template(path, "/"), first)
+            self.assertIsNot(load_template(path, "/blog/"), first)
+
+            path.write_text("<h1>{{ Title }}</h1>")
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertEqual(load_template(path, "/").render_to_string({"Title": "x"}), "<h1>x</h1>")
+
+if __name__ == "__main__":
+    unittest.main()
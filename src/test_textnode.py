@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from textnode import TextNode, TextType, TextNodeDelimiter, markdown_to_blocks
+from textnode import TextNode, TextType, TextNodeDelimiter, markdown_to_blocks, read_blocks
 from htmlnode import text_node_to_html_node, split_nodes_delimiter
 
 class TestTextNode(unittest.TestCase):
@@ -106,6 +107,20 @@ class TestTextNode(unittest.TestCase):
             ],
         )
 
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "Intro\n\n```\ndef f():\n\n    return 1\n```\n\nAfter"
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["Intro", "```\ndef f():\n\n    return 1\n```", "After"],
+        )
+
+    def test_read_blocks_from_file(self):
+        md = "# Title\n\n  First   \n  block\n\n\n\n``` one line ```\n\n- a\n- b\n"
+        blocks = read_blocks(io.StringIO(md))
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(list(blocks), ["First\nblock", "``` one line ```", "- a\n- b"])
+        self.assertEqual(list(read_blocks(io.StringIO(md))), markdown_to_blocks(md))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -14,6 +14,8 @@ class TextNodeDelimiter(Enum):
     CODE = "`"
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -28,20 +30,42 @@ class TextNode:
         text_type = self.text_type
         return f"TextNode({self.text}, {text_type}, {self.url})"
 
+FENCE = "```"
+
+def read_blocks(lines):
+    """Yield the blocks of a markdown document one at a time.
+
+    lines is any iterable of lines, such as an open file, so a document
+    never has to be held in memory as a whole. Blocks are separated by
+    empty lines and have their lines stripped, except inside fenced code
+    where lines are kept as written and blank lines don't end the block.
+    """
+    block = []
+    fenced = False
+    for line in lines:
+        if fenced:
+            line = line.rstrip()
+            block.append(line)
+            if line.lstrip().startswith(FENCE):
+                fenced = False
+            continue
+
+        if line == "" or line == "\n":
+            if block:
+                yield "\n".join(block)
+                block = []
+            continue
+
+        stripped = line.strip()
+        if stripped == "":
+            continue
+        # a fence closed on its own line ("``` code ```") doesn't open one
+        if stripped.startswith(FENCE) and FENCE not in stripped[3:]:
+            fenced = True
+        block.append(stripped)
+
+    if block:
+        yield "\n".join(block)
+
 def markdown_to_blocks(markdown):
-    new_blocks = []
-
-    split_markdown = markdown.split("\n\n")
-    for item in split_markdown:
-        line = item.split("\n")
-        stripped_lines = []
-        for l in line:
-            stripped = l.strip()
-            if stripped != "":
-                stripped_lines.append(stripped)
-            
-        result = "\n".join(stripped_lines)
-        if result != "":
-            new_blocks.append(result)
-
-    return new_blocks
+    return list(read_blocks(markdown.split("\n")))